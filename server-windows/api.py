@@ -4,15 +4,31 @@
 API路由定义
 """
 
-from fastapi import FastAPI, HTTPException, Header
+from fastapi import FastAPI, HTTPException, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, ValidationError
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 from datetime import datetime
+import asyncio
+import json
 import logging
+import os
+import time
 
+import startup
 from config import config
-from database import db
+from database import db, decode_cursor
+from async_db import adb
+from event_bus import EventFilter, Subscription, bus
+from export import create_encoder
+from cache import etag_matches, response_cache
+from metrics import REGISTRY, CallbackCounter, Gauge, Histogram
+from partitions import PartitionMaintainer
+from server import register_service_metrics, usb_service
+from change_feed import ChangeFeed
+import monitor_service
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +48,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 冷数据归档与保留策略（后台定期执行）
+partition_maintainer = PartitionMaintainer(db)
+
+# embedded: 本进程启动USB监控（只能单个工作进程）
+# external: USB监控在独立的监控进程中运行(monitor_service.py)，本进程只读取和接收上报，可以多个工作进程
+MONITOR_MODE = os.environ.get('USB_MONITOR_MODE') or str(config.get('monitor_mode', 'embedded'))
+
+# external模式下追踪其他进程写入的事件和数据版本号（应用启动时创建）
+change_feed: Optional[ChangeFeed] = None
+
+# 接口指标
+REQUEST_SECONDS = Histogram('usbmon_http_request_seconds', '接口响应耗时（到开始返回响应为止）',
+                            ['method', 'route', 'status'])
+Gauge('usbmon_sse_subscribers', '实时推送订阅者数', lambda: bus.get_stats()['subscribers'])
+Gauge('usbmon_db_executor_inflight', '数据库线程池中进行中的查询数', lambda: adb.get_stats()['inflight'])
+CallbackCounter('usbmon_response_cache_hits_total', '响应缓存命中次数', lambda: response_cache.hits)
+CallbackCounter('usbmon_response_cache_misses_total', '响应缓存未命中次数', lambda: response_cache.misses)
+if MONITOR_MODE != 'external':
+    register_service_metrics(usb_service)
+
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """按路由模板记录接口耗时（未匹配的路径归为unmatched，避免标签无限增长）"""
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get('route')
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            request.method, getattr(route, 'path', 'unmatched'), str(status)
+        )
+
 
 # ==================== 数据模型 ====================
 
@@ -71,23 +124,144 @@ def verify_api_key(authorization: str = Header(..., alias="Authorization")):
     return True
 
 
+class LineTooLong(ValueError):
+    """NDJSON单行超过batch_max_line_bytes"""
+
+
+async def iter_ndjson(stream: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[Tuple[int, object]]:
+    """逐行解析NDJSON请求体，产出(序号, 解析结果或异常)
+    
+    每块数据按偏移逐行扫描，块处理完才截掉已解析的部分，避免每行都复制一次缓冲区。
+    某一行超过max_line_bytes时产出LineTooLong并停止读取，缓冲区不会无限增长。
+    """
+    buffer = b''
+    index = 0
+    async for chunk in stream:
+        buffer += chunk
+        start = 0
+        while True:
+            pos = buffer.find(b'\n', start)
+            if pos < 0:
+                break
+            if pos - start > max_line_bytes:
+                yield index, LineTooLong(f"单行超过{max_line_bytes}字节")
+                return
+            line = buffer[start:pos].strip()
+            start = pos + 1
+            if line:
+                yield index, _parse_json_line(line)
+                index += 1
+        buffer = buffer[start:]
+        if len(buffer) > max_line_bytes:
+            yield index, LineTooLong(f"单行超过{max_line_bytes}字节")
+            return
+    if buffer.strip():
+        yield index, _parse_json_line(buffer.strip())
+
+
+async def read_body(request: Request, max_bytes: int) -> bytes:
+    """边读边检查大小，请求体超过max_bytes时返回413（不等整个请求体读完）"""
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"请求体超过{max_bytes}字节")
+    return bytes(body)
+
+
+def _parse_json_line(line: bytes) -> object:
+    """解析单行JSON，失败时返回异常对象"""
+    try:
+        return json.loads(line)
+    except ValueError as e:
+        return e
+
+
+def publish_written(events: List[Dict], ids: List[int]):
+    """本进程写入的事件推送给订阅者；external模式下统一由ChangeFeed推送，避免重复"""
+    if change_feed is None:
+        bus.publish(events, ids)
+
+
+async def monitor_stats(name: str, local: Callable[[], Dict]) -> Dict:
+    """监控服务指标：embedded模式直接读取，external模式取监控进程最近一次心跳"""
+    if MONITOR_MODE != 'external':
+        return local()
+    status = await adb.run(monitor_service.read_status)
+    if status is None:
+        return {'running': False}
+    return status['stats'].get(name, {})
+
+
+def insert_event_chunk(chunk: List[Dict], indexes: List[int]) -> List[Dict]:
+    """单事务写入一块事件；整块失败时逐条写入以定位错误"""
+    try:
+        ids = db.insert_events(chunk)
+        publish_written(chunk, ids)
+        return [{"index": i, "status": "ok", "id": event_id} for i, event_id in zip(indexes, ids)]
+    except Exception as e:
+        logger.error(f"批量写入事件失败，改为逐条写入: {e}")
+    
+    results = []
+    for i, event in zip(indexes, chunk):
+        try:
+            event_id = db.insert_events([event])[0]
+            publish_written([event], [event_id])
+            results.append({"index": i, "status": "ok", "id": event_id})
+        except Exception as e:
+            results.append({"index": i, "status": "error", "error": str(e)})
+    return results
+
+
+async def cached_response(request: Request, name: str, table: str,
+                          compute: Callable[[], Awaitable]) -> Response:
+    """带缓存和ETag的JSON响应：数据未变时直接返回缓存，客户端ETag一致时返回304"""
+    version = db.data_version(table)  # 计算前读取，计算期间有写入则下次失效
+    entry = response_cache.get(name, version)
+    if entry is None:
+        entry = response_cache.put(name, version, await compute())
+    
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get('if-none-match'), entry.etag):
+        response_cache.record_not_modified()
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
 # ==================== API路由 ====================
 
 @app.get("/api/ping")
-def ping():
+async def ping():
     """健康检查"""
-    from server import usb_service  # type: ignore
+    if MONITOR_MODE == 'external':
+        status = await adb.run(monitor_service.read_status)
+        monitoring = bool(status and status['alive'])
+    else:
+        monitoring = usb_service.is_running()
     return {
         "status": "ok",
         "timestamp": datetime.now().isoformat(),
-        "usb_monitoring": usb_service.is_running()
+        "usb_monitoring": monitoring,
+        "monitor_mode": MONITOR_MODE
     }
 
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus格式指标（external模式下只有本工作进程的指标，监控进程的指标在monitor_metrics_port导出）"""
+    return Response(content=REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.get("/api/debug/drives")
-def debug_drives():
+async def debug_drives():
     """调试：查看所有驱动器检测状态"""
-    from server import usb_service  # type: ignore
+    devices = await monitor_stats('devices', usb_service.get_device_stats)
+    # 缓存未命中时需要WMI查询，放到线程池执行
+    return await run_in_threadpool(_debug_drives, set(devices.get('drives', [])))
+
+
+def _debug_drives(monitoring: set) -> Dict:
+    """枚举所有驱动器的检测状态（monitoring为正在监控的驱动器）"""
     import win32api
     import win32file
     
@@ -116,7 +290,8 @@ def debug_drives():
                     "type": drive_type_names.get(drive_type, "UNKNOWN"),
                     "type_code": drive_type,
                     "is_usb": is_usb,
-                    "is_monitoring": letter in usb_service.file_monitors
+                    "is_monitoring": letter in monitoring,
+                    "cache": usb_service.drive_cache.get_entry(letter)
                 })
             except Exception as e:
                 drives_info.append({
@@ -127,37 +302,366 @@ def debug_drives():
     return {
         "drives": drives_info,
         "usb_count": sum(1 for d in drives_info if d.get('is_usb')),
-        "monitoring_count": len(usb_service.file_monitors)
+        "monitoring_count": len(monitoring),
+        "cache_stats": usb_service.drive_cache.get_stats()
+    }
+
+
+@app.get("/api/debug/monitors")
+async def debug_monitors():
+    """调试：查看各驱动器的通知数、溢出次数与对账找回数，以及共用的复用线程/工作线程池"""
+    return {
+        "monitors": await monitor_stats('monitors', usb_service.get_monitor_stats),
+        "hub": await monitor_stats('hub', usb_service.get_hub_stats)
     }
 
 
+@app.get("/api/debug/logins")
+async def debug_logins():
+    """调试：查看等待登录的驱动器、暂存的事件数和当前登录会话"""
+    return await monitor_stats('logins', usb_service.get_login_stats)
+
+
+@app.get("/api/debug/startup")
+async def debug_startup(top: int = 30):
+    """调试：查看启动各阶段耗时和导入最慢的模块（需以main.py启动才有模块耗时）"""
+    return startup.get_report(top)
+
+
+@app.get("/api/debug/writer")
+async def debug_writer():
+    """调试：查看事件写入队列深度与批量指标"""
+    return await monitor_stats('writer', usb_service.get_writer_stats)
+
+
+@app.get("/api/debug/devices")
+async def debug_devices():
+    """调试：查看设备插拔检测方式与枚举次数"""
+    return await monitor_stats('devices', usb_service.get_device_stats)
+
+
+@app.get("/api/debug/db")
+async def debug_db():
+    """调试：查看数据库线程池负载"""
+    return adb.get_stats()
+
+
+@app.get("/api/debug/partitions")
+async def debug_partitions():
+    """调试：查看主库时间范围、归档月份与解压缓存"""
+    return await adb.get_partition_stats()
+
+
+@app.get("/api/debug/stream")
+async def debug_stream():
+    """调试：查看实时推送订阅者与丢弃数"""
+    return bus.get_stats()
+
+
+@app.get("/api/debug/feed")
+async def debug_feed():
+    """调试：查看监控进程心跳和本工作进程的变更追踪（external模式）"""
+    return {
+        "mode": MONITOR_MODE,
+        "pid": os.getpid(),
+        "monitor": await adb.run(monitor_service.read_status) if MONITOR_MODE == 'external' else None,
+        "feed": change_feed.get_stats() if change_feed else {'running': False}
+    }
+
+
+@app.get("/api/debug/cache")
+async def debug_cache():
+    """调试：查看响应缓存命中率"""
+    return response_cache.get_stats()
+
+
 @app.get("/api/events")
-def get_events(
+async def get_events(
     limit: int = 100,
+    after: Optional[str] = None,
     machine_name: Optional[str] = None,
+    username: Optional[str] = None,
+    drive_letter: Optional[str] = None,
+    action: Optional[str] = None,
+    start_time: Optional[str] = None,
+    end_time: Optional[str] = None,
+    is_folder: Optional[bool] = None,
     authorization: str = Header(..., alias="Authorization")
 ):
-    """获取事件列表"""
+    """获取事件列表（游标分页，next_cursor传回after获取下一页；limit限制在1~1000之间）"""
     try:
         verify_api_key(authorization)
-        events = db.get_events(limit, machine_name)
-        return {"events": events}
+        return await adb.get_events_page(
+            max(1, min(limit, 1000)), after,
+            machine_name=machine_name,
+            username=username,
+            drive_letter=drive_letter,
+            action=action,
+            start_time=start_time,
+            end_time=end_time,
+            is_folder=is_folder
+        )
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"获取事件失败: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/events/search")
+async def search_events(
+    q: str,
+    limit: int = 50,
+    after: Optional[str] = None,
+    sort: str = 'rank',
+    machine_name: Optional[str] = None,
+    username: Optional[str] = None,
+    drive_letter: Optional[str] = None,
+    action: Optional[str] = None,
+    start_time: Optional[str] = None,
+    end_time: Optional[str] = None,
+    is_folder: Optional[bool] = None,
+    authorization: str = Header(..., alias="Authorization")
+):
+    """全文检索文件名、路径和文件夹内的文件名
+    
+    q: 空格分隔的词（AND），每个词按子串匹配（不足3个字符时较慢），双引号为短语，OR表示或。
+    sort: rank按相关度（默认），recent按时间倒序。next_cursor传回after获取下一页。
+    """
+    try:
+        verify_api_key(authorization)
+        return await adb.search_events(
+            q, max(1, min(limit, 500)), after,
+            sort=sort,
+            machine_name=machine_name,
+            username=username,
+            drive_letter=drive_letter,
+            action=action,
+            start_time=start_time,
+            end_time=end_time,
+            is_folder=is_folder
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"检索事件失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/events/export")
+async def export_events(
+    format: str = 'csv',
+    after: Optional[str] = None,
+    max_rows: Optional[int] = None,
+    chunk_size: int = 5000,
+    include_cursor: bool = False,
+    machine_name: Optional[str] = None,
+    username: Optional[str] = None,
+    drive_letter: Optional[str] = None,
+    action: Optional[str] = None,
+    start_time: Optional[str] = None,
+    end_time: Optional[str] = None,
+    is_folder: Optional[bool] = None,
+    authorization: str = Header(..., alias="Authorization")
+):
+    """流式导出事件（csv / columnar），过滤条件与事件列表相同
+    
+    沿游标逐批查询、逐批返回，内存占用与导出总量无关。中断后用after续传：
+    csv可加include_cursor=true在每行附带游标；columnar每个数据块和结束块都带有next_cursor。
+    """
+    verify_api_key(authorization)
+    filters = {
+        'machine_name': machine_name,
+        'username': username,
+        'drive_letter': drive_letter,
+        'action': action,
+        'start_time': start_time,
+        'end_time': end_time,
+        'is_folder': is_folder
+    }
+    try:
+        encoder = create_encoder(format, filters, include_cursor)
+        if after:
+            decode_cursor(after)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    chunk_size = max(1, min(chunk_size, 20000))
+    
+    async def body() -> AsyncIterator[bytes]:
+        yield encoder.begin()
+        cursor, total = after, 0
+        try:
+            while max_rows is None or total < max_rows:
+                limit = chunk_size if max_rows is None else min(chunk_size, max_rows - total)
+                page = await adb.get_events_page(limit, cursor, **filters)
+                if page['events']:
+                    yield encoder.chunk(page['events'], page['next_cursor'])
+                    total += len(page['events'])
+                cursor = page['next_cursor']
+                if not cursor:
+                    break
+        except Exception as e:
+            # 响应头已发出，只能中止输出；客户端凭最后收到的游标续传
+            logger.error(f"导出事件失败: {e}")
+            return
+        yield encoder.end(total, cursor)
+        logger.info(f"📤 导出完成: {total} 条 ({format})")
+    
+    filename = f"events_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{encoder.extension}"
+    return StreamingResponse(
+        body(),
+        media_type=encoder.media_type,
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
+
+@app.get("/api/events/stream")
+async def stream_events(
+    request: Request,
+    after_id: Optional[int] = None,
+    machine_name: Optional[str] = None,
+    username: Optional[str] = None,
+    drive_letter: Optional[str] = None,
+    action: Optional[str] = None,
+    is_folder: Optional[bool] = None,
+    api_key: Optional[str] = None,
+    authorization: Optional[str] = Header(None, alias="Authorization"),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """实时事件推送（Server-Sent Events）
+    
+    浏览器EventSource无法设置请求头，可以用api_key查询参数认证。
+    断线重连时浏览器自动带上Last-Event-ID，也可以用after_id指定起点，
+    先从数据库补发该ID之后的事件，再转为实时推送。
+    """
+    verify_api_key(authorization or f"Bearer {api_key or ''}")
+    
+    resume_id = after_id
+    if last_event_id:
+        try:
+            resume_id = int(last_event_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"无效的Last-Event-ID: {last_event_id}")
+    
+    event_filter = EventFilter(machine_name, username, drive_letter, action, is_folder)
+    # 先订阅再补发，补发期间写入的事件留在队列里，不会漏掉
+    subscription = bus.subscribe(event_filter)
+    return StreamingResponse(
+        _sse_stream(request, subscription, resume_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _sse_message(event: Dict) -> str:
+    """事件 -> SSE消息"""
+    data = json.dumps(event, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {event['id']}\nevent: file_event\ndata: {data}\n\n"
+
+
+async def _sse_stream(request: Request, subscription: Subscription,
+                      resume_id: Optional[int]) -> AsyncIterator[str]:
+    """SSE消息流：补发 -> 实时推送；订阅队列溢出时回数据库追赶"""
+    heartbeat = float(config.get('sse_heartbeat', 15))  # type: ignore
+    catchup_limit = int(config.get('sse_catchup_limit', 1000))  # type: ignore
+    filters = subscription.filter.as_kwargs()
+    last_id = resume_id  # 已发送的最大事件ID
+    floor_id = 0  # 不大于该ID的实时事件已由补发送出
+    need_catchup = resume_id is not None
+    
+    try:
+        yield f"retry: {int(config.get('sse_retry_ms', 3000))}\n\n"  # type: ignore
+        
+        while True:
+            if subscription.lagging:
+                # 队列溢出丢过事件：丢弃队列内容，改从数据库追赶
+                subscription.lagging = False
+                if last_id is None and not subscription.queue.empty():
+                    last_id = subscription.queue.get_nowait()['id'] - 1
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                need_catchup = last_id is not None
+            
+            if need_catchup:
+                need_catchup = False
+                while True:
+                    rows = await adb.get_events_since(last_id, catchup_limit, **filters)
+                    for row in rows:
+                        yield _sse_message(row)
+                        last_id = row['id']
+                    if len(rows) < catchup_limit:
+                        break
+                floor_id = last_id
+            
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keep-alive\n\n"
+                continue
+            
+            if event['id'] <= floor_id:
+                continue
+            yield _sse_message(event)
+            last_id = max(last_id or 0, event['id'])
+    finally:
+        bus.unsubscribe(subscription)
+
+
+@app.get("/api/events/{event_id}/folder_structure")
+async def get_event_folder_structure(
+    event_id: int,
+    authorization: str = Header(..., alias="Authorization")
+):
+    """按需获取某个文件夹拷入事件的完整文件夹结构"""
+    try:
+        verify_api_key(authorization)
+        structure = await adb.get_event_folder_structure(event_id)
+        if structure is None:
+            raise HTTPException(status_code=404, detail="事件不存在")
+        return {"event_id": event_id, "structure": structure}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取文件夹结构失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/snapshots/{snapshot_id}")
+async def get_snapshot(
+    snapshot_id: int,
+    authorization: str = Header(..., alias="Authorization")
+):
+    """获取文件夹结构快照"""
+    try:
+        verify_api_key(authorization)
+        snapshot = await adb.get_snapshot(snapshot_id)
+        if snapshot is None:
+            raise HTTPException(status_code=404, detail="快照不存在")
+        return snapshot
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取快照失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/api/events")
-def post_event(
+async def post_event(
     event: FileEvent,
     authorization: str = Header(..., alias="Authorization")
 ):
     """接收文件事件（外部客户端）"""
     try:
         verify_api_key(authorization)
-        db.insert_event(event.dict())
+        event_data = event.dict()
+        ids = await adb.insert_events([event_data])
+        publish_written([event_data], ids)
         logger.info(f"收到事件: {event.action} - {event.file_name}")
         return {"status": "success"}
     except HTTPException:
@@ -167,13 +671,108 @@ def post_event(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/events/batch")
+async def post_events_batch(
+    request: Request,
+    authorization: str = Header(..., alias="Authorization")
+):
+    """批量接收文件事件（JSON数组，或Content-Type为application/x-ndjson的流式请求体）
+    
+    每条事件单独校验，合法事件按batch_chunk_size分块、每块一个事务写入，
+    返回逐条结果。超过batch_max_events条时：JSON数组直接返回413、不写入任何事件；
+    NDJSON停止读取，返回已处理部分的结果并标记truncated。JSON数组请求体不超过
+    batch_max_body_bytes，NDJSON每行不超过batch_max_line_bytes（超过时同样截断）。
+    """
+    verify_api_key(authorization)
+    
+    chunk_size = int(config.get('batch_chunk_size', 1000))  # type: ignore
+    max_events = int(config.get('batch_max_events', 100000))  # type: ignore
+    content_type = request.headers.get('content-type', '')
+    
+    if 'ndjson' in content_type or 'jsonl' in content_type:
+        items = iter_ndjson(request.stream(), int(config.get('batch_max_line_bytes', 16777216)))  # type: ignore
+    else:
+        body = await read_body(request, int(config.get('batch_max_body_bytes', 134217728)))  # type: ignore
+        try:
+            payload = json.loads(body)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"请求体不是合法JSON: {e}")
+        if not isinstance(payload, list):
+            raise HTTPException(status_code=400, detail="请求体必须是事件数组")
+        if len(payload) > max_events:
+            raise HTTPException(status_code=413, detail=f"单次最多提交{max_events}条事件")
+        items = _iter_list(payload)
+    
+    results: List[Dict] = []
+    chunk: List[Dict] = []
+    chunk_indexes: List[int] = []
+    total = 0
+    truncated = False
+    
+    try:
+        async for index, raw in items:
+            if total >= max_events:
+                truncated = True
+                break
+            total += 1
+            
+            if isinstance(raw, LineTooLong):
+                results.append({"index": index, "status": "error", "error": str(raw)})
+                truncated = True
+                break
+            if isinstance(raw, Exception):
+                results.append({"index": index, "status": "error", "error": f"JSON解析失败: {raw}"})
+                continue
+            if not isinstance(raw, dict):
+                results.append({"index": index, "status": "error", "error": "事件必须是JSON对象"})
+                continue
+            try:
+                event = FileEvent(**raw)
+            except ValidationError as e:
+                results.append({"index": index, "status": "error", "error": str(e)})
+                continue
+            
+            chunk.append(event.dict())
+            chunk_indexes.append(index)
+            if len(chunk) >= chunk_size:
+                results.extend(await adb.run(insert_event_chunk, chunk, chunk_indexes))
+                chunk, chunk_indexes = [], []
+        
+        if chunk:
+            results.extend(await adb.run(insert_event_chunk, chunk, chunk_indexes))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"批量处理事件失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    results.sort(key=lambda r: r["index"])
+    accepted = sum(1 for r in results if r["status"] == "ok")
+    if truncated:
+        logger.warning(f"批量事件超过上限（{max_events} 条或单行大小），其余部分未读取")
+    logger.info(f"批量收到事件: {accepted}/{total} 条写入成功")
+    return {
+        "status": "success",
+        "total": total,
+        "accepted": accepted,
+        "rejected": total - accepted,
+        "truncated": truncated,
+        "results": results
+    }
+
+
+async def _iter_list(payload: list) -> AsyncIterator[Tuple[int, object]]:
+    """把已解析的JSON数组包装成与NDJSON一致的异步迭代器"""
+    for index, raw in enumerate(payload):
+        yield index, raw
+
+
 @app.get("/api/stats")
-def get_statistics(authorization: str = Header(..., alias="Authorization")):
+async def get_statistics(request: Request, authorization: str = Header(..., alias="Authorization")):
     """获取统计信息"""
     try:
         verify_api_key(authorization)
-        stats = db.get_statistics()
-        return stats
+        return await cached_response(request, 'stats', 'events', adb.get_statistics)
     except HTTPException:
         raise
     except Exception as e:
@@ -181,15 +780,38 @@ def get_statistics(authorization: str = Header(..., alias="Authorization")):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/api/stats/timeline")
+async def get_stats_timeline(
+    granularity: str = 'day',
+    start_time: Optional[str] = None,
+    end_time: Optional[str] = None,
+    username: Optional[str] = None,
+    action: Optional[str] = None,
+    authorization: str = Header(..., alias="Authorization")
+):
+    """按天/小时获取事件数趋势"""
+    try:
+        verify_api_key(authorization)
+        if granularity not in ('day', 'hour'):
+            raise HTTPException(status_code=400, detail="granularity只能是day或hour")
+        timeline = await adb.get_stats_timeline(granularity, start_time, end_time, username, action)
+        return {"granularity": granularity, "timeline": timeline}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"获取统计趋势失败: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/api/auth")
-def authenticate(
+async def authenticate(
     auth: AuthRequest,
     authorization: str = Header(..., alias="Authorization")
 ):
     """用户认证"""
     try:
         verify_api_key(authorization)
-        user = db.get_user(auth.username)
+        user = await adb.get_user(auth.username)
         
         if not user:
             return {"success": False, "message": "用户不存在"}
@@ -210,13 +832,11 @@ def authenticate(
 
 
 @app.get("/api/users")
-def get_users(authorization: str = Header(..., alias="Authorization")):
+async def get_users(request: Request, authorization: str = Header(..., alias="Authorization")):
     """获取用户列表"""
     try:
         verify_api_key(authorization)
-        users = db.get_all_users()
-        usernames = [u['username'] for u in users]
-        return {"users": usernames}
+        return await cached_response(request, 'users', 'users', _list_usernames)
     except HTTPException:
         raise
     except Exception as e:
@@ -224,19 +844,38 @@ def get_users(authorization: str = Header(..., alias="Authorization")):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+async def _list_usernames() -> Dict:
+    """用户名列表（/api/users响应体）"""
+    users = await adb.get_all_users()
+    return {"users": [u['username'] for u in users]}
+
+
 # ==================== 应用生命周期 ====================
 
 @app.on_event("startup")
 def startup_event():
     """应用启动"""
-    from server import usb_service  # type: ignore
-    usb_service.start()
-    logger.info("✅ USB监控服务已启动")
+    global change_feed
+    startup.mark('server_started')
+    if MONITOR_MODE == 'external':
+        # USB监控和分区维护由监控进程负责，本进程只追踪它写入的事件
+        change_feed = ChangeFeed(db, bus.publish_rows)
+        change_feed.start()
+        logger.info(f"✅ API工作进程已启动 (pid: {os.getpid()}, USB监控在独立进程中运行)")
+    else:
+        usb_service.start()
+        partition_maintainer.start()
+        logger.info("✅ USB监控服务已启动")
+    startup.finish()
 
 
 @app.on_event("shutdown")
 def shutdown_event():
     """应用关闭"""
-    from server import usb_service  # type: ignore
-    usb_service.stop()
-    logger.info("❌ USB监控服务已停止")
+    if change_feed is not None:
+        change_feed.stop(timeout=5)
+    else:
+        usb_service.stop()
+        partition_maintainer.stop()
+        logger.info("❌ USB监控服务已停止")
+    adb.close()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步数据库访问 - 在专用线程池中执行DatabaseManager的同步查询
+"""
+
+import asyncio
+import functools
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from config import config
+from database import DatabaseManager, db
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncDatabase:
+    """DatabaseManager的异步包装
+    
+    查询在固定大小的专用线程池中执行（每个线程复用自己的SQLite连接），
+    不占用uvicorn默认线程池，事件循环只负责等待结果。
+    """
+    
+    def __init__(self, database: DatabaseManager, max_workers: Optional[int] = None):
+        self.database = database
+        self.max_workers = max_workers or int(config.get('db_executor_workers', 4))  # type: ignore
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        
+        # 指标
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0  # 等待结果时被取消（如客户端断开），线程池中的查询仍会执行完
+        self.max_inflight = 0
+    
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix='AsyncDB'
+                    )
+        return self._executor
+    
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """在数据库线程池中执行任意同步函数（无论成功、失败还是被取消都计入指标）"""
+        loop = asyncio.get_running_loop()
+        self.submitted += 1
+        self.max_inflight = max(self.max_inflight, self._inflight())
+        outcome = 'failed'
+        try:
+            result = await loop.run_in_executor(self._get_executor(), functools.partial(func, *args, **kwargs))
+            outcome = 'completed'
+            return result
+        except asyncio.CancelledError:
+            outcome = 'cancelled'
+            raise
+        finally:
+            if outcome == 'completed':
+                self.completed += 1
+            elif outcome == 'cancelled':
+                self.cancelled += 1
+            else:
+                self.failed += 1
+    
+    def _inflight(self) -> int:
+        return self.submitted - self.completed - self.failed - self.cancelled
+    
+    async def insert_event(self, event_data: Dict):
+        await self.run(self.database.insert_event, event_data)
+    
+    async def insert_events(self, events: List[Dict]) -> List[int]:
+        return await self.run(self.database.insert_events, events)
+    
+    async def get_events_page(self, limit: int = 100, after: Optional[str] = None, **filters) -> Dict:
+        return await self.run(self.database.get_events_page, limit, after, **filters)
+    
+    async def search_events(self, query: str, limit: int = 50, after: Optional[str] = None, **kwargs) -> Dict:
+        return await self.run(self.database.search_events, query, limit, after, **kwargs)
+    
+    async def get_events_since(self, after_id: int, limit: int = 1000, **filters) -> List[Dict]:
+        return await self.run(self.database.get_events_since, after_id, limit, **filters)
+    
+    async def get_event_folder_structure(self, event_id: int) -> Optional[List[Dict]]:
+        return await self.run(self.database.get_event_folder_structure, event_id)
+    
+    async def get_snapshot(self, snapshot_id: int) -> Optional[Dict]:
+        return await self.run(self.database.get_snapshot, snapshot_id)
+    
+    async def get_statistics(self) -> Dict:
+        return await self.run(self.database.get_statistics)
+    
+    async def get_stats_timeline(self, *args, **kwargs) -> List[Dict]:
+        return await self.run(self.database.get_stats_timeline, *args, **kwargs)
+    
+    async def get_user(self, username: str) -> Optional[Dict]:
+        return await self.run(self.database.get_user, username)
+    
+    async def get_all_users(self) -> List[Dict]:
+        return await self.run(self.database.get_all_users)
+    
+    async def get_partition_stats(self) -> Dict:
+        return await self.run(self.database.get_partition_stats)
+    
+    def get_stats(self) -> Dict:
+        """线程池指标"""
+        return {
+            'workers': self.max_workers,
+            'inflight': self._inflight(),
+            'max_inflight': self.max_inflight,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'cancelled': self.cancelled
+        }
+    
+    def close(self):
+        """关闭线程池（等待进行中的查询完成）"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True)
+
+
+# 全局异步数据库实例
+adb = AsyncDatabase(db)
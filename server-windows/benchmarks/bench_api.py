@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+接口基准（进程内）：直接以ASGI方式调用FastAPI应用，不经过网络和uvicorn
+
+只衡量路由、校验、序列化和数据库访问本身的开销:
+    python benchmarks/bench_api.py --seed 100000 --requests 500 --concurrency 1,16
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Dict, Optional, Tuple
+
+from common import make_event, percentile, report, temp_dir
+
+from config import config
+
+
+async def asgi_request(app, method: str, path: str, headers: Optional[Dict[str, str]] = None,
+                       body: bytes = b'') -> Tuple[int, Dict[str, str], bytes]:
+    """发送一个ASGI HTTP请求，返回 (状态码, 响应头, 响应体)"""
+    path, _, query = path.partition('?')
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode('utf-8'),
+        'query_string': query.encode('utf-8'),
+        'root_path': '',
+        'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in (headers or {}).items()],
+        'client': ('127.0.0.1', 0),
+        'server': ('127.0.0.1', 80),
+    }
+    request_sent = False
+    response_done = asyncio.Event()
+    status = 0
+    response_headers: Dict[str, str] = {}
+    chunks = []
+    
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        # 响应结束前客户端一直保持连接
+        await response_done.wait()
+        return {'type': 'http.disconnect'}
+    
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+            response_headers.update({k.decode('latin-1'): v.decode('latin-1') for k, v in message.get('headers', [])})
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                response_done.set()
+    
+    await app(scope, receive, send)
+    return status, response_headers, b''.join(chunks)
+
+
+async def bench_route(app, name: str, method: str, path: str, headers: Dict[str, str],
+                      body_fn, total: int, concurrency: int) -> dict:
+    """concurrency个协程共发送total个请求"""
+    latencies = []
+    errors = 0
+    counter = 0
+    
+    async def client():
+        nonlocal counter, errors
+        while counter < total:
+            n = counter
+            counter += 1
+            start = time.perf_counter()
+            status, _, _ = await asgi_request(app, method, path, headers, body_fn(n) if body_fn else b'')
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors += 1
+    
+    start = time.perf_counter()
+    await asyncio.gather(*[client() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return {
+        'route': name,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000
+    }
+
+
+async def run(seed: int, total: int, levels) -> list:
+    import api
+    from database import db
+    
+    for start in range(0, seed, 10000):
+        db.insert_events([make_event(i) for i in range(start, min(seed, start + 10000))])
+    db.add_user('bench_user', 'bench')
+    
+    auth = {'Authorization': f"Bearer {config.get('api_key', '')}"}
+    _, stats_headers, _ = await asgi_request(api.app, 'GET', '/api/stats', auth)
+    
+    def post_body(n: int) -> bytes:
+        event = make_event(seed + n)
+        event.pop('login_id')
+        return json.dumps(event, ensure_ascii=False).encode('utf-8')
+    
+    post_headers = {**auth, 'Content-Type': 'application/json'}
+    routes = [
+        ('GET /api/ping', 'GET', '/api/ping', {}, None),
+        ('GET /api/events', 'GET', '/api/events?limit=50', auth, None),
+        ('GET /api/events?action=USB*', 'GET', '/api/events?limit=50&action=USB*', auth, None),
+        ('GET /api/stats', 'GET', '/api/stats', auth, None),
+        ('GET /api/stats (304)', 'GET', '/api/stats', {**auth, 'If-None-Match': stats_headers.get('etag', '')}, None),
+        ('GET /api/stats/timeline', 'GET', '/api/stats/timeline?granularity=hour', auth, None),
+        ('GET /api/users', 'GET', '/api/users', auth, None),
+        ('POST /api/events', 'POST', '/api/events', post_headers, post_body),
+    ]
+    
+    results = []
+    for concurrency in levels:
+        for name, method, path, headers, body_fn in routes:
+            results.append(await bench_route(api.app, name, method, path, headers, body_fn, total, concurrency))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='进程内接口基准')
+    parser.add_argument('--seed', type=int, default=100000, help='预先写入的事件数')
+    parser.add_argument('--requests', type=int, default=500, help='每个接口、每个并发级别的请求数')
+    parser.add_argument('--concurrency', default='1,16', help='逗号分隔的并发数')
+    parser.add_argument('--json', help='结果输出JSON文件')
+    args = parser.parse_args()
+    
+    levels = [int(c) for c in args.concurrency.split(',') if c.strip()]
+    with temp_dir() as work_dir:
+        # 必须在导入api/database之前切换到临时数据库
+        config.config['database'] = str(work_dir / 'bench_api.db')
+        results = asyncio.run(run(args.seed, args.requests, levels))
+    
+    report('api_inprocess', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多工作进程API基准：USB监控在独立进程中运行(monitor_mode=external)时，
+API以1/2/4/8个uvicorn工作进程运行的读请求吞吐
+
+每个工作进程数各启动一次uvicorn（临时数据库，预先写入--seed条事件），
+用load_api的仪表盘轮询组合压测；--write-rate大于0时，本进程（模拟监控进程）
+同时按该速率写入事件，各工作进程经ChangeFeed追踪、响应缓存随之失效。记录:
+    rps / p50_ms / p99_ms   读请求吞吐与延迟
+    speedup                 相对1个工作进程的吞吐倍数
+    written                 压测期间监控进程写入的事件数
+
+用法:
+    python benchmarks/bench_api_workers.py --workers 1,2,4,8 --concurrency 64 --requests 5000
+"""
+
+import argparse
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import fastapi, uvicorn  # noqa: F401  未安装时在启动子进程前直接报错
+
+from common import SERVER_DIR, make_event, report, temp_dir
+
+from config import config
+from database import DatabaseManager
+from load_api import free_port, run_level
+
+# uvicorn工作进程导入的应用模块：先改配置再导入api（每个工作进程各自执行一遍）
+APP_MODULE = '''
+import sys
+sys.path.insert(0, {server_dir!r})
+from config import config
+config.config['database'] = {db_path!r}
+config.config['monitor_mode'] = 'external'
+import api
+app = api.app
+'''
+
+
+def start_server(app_dir: str, port: int, workers: int) -> subprocess.Popen:
+    """启动多工作进程的uvicorn并等待接口可用"""
+    process = subprocess.Popen([
+        sys.executable, '-m', 'uvicorn', 'bench_app:app', '--app-dir', app_dir,
+        '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers), '--log-level', 'warning'
+    ], cwd=str(SERVER_DIR))
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/api/ping', timeout=1) as response:
+                if response.status == 200:
+                    return process
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError('后端子进程启动失败')
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('等待后端启动超时')
+
+
+def stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def seed(manager: DatabaseManager, count: int, batch_size: int = 5000):
+    for start in range(0, count, batch_size):
+        manager.insert_events([make_event(i) for i in range(start, min(count, start + batch_size))])
+
+
+class MonitorWriter(threading.Thread):
+    """模拟监控进程：按固定速率写入事件（每0.1秒一批）"""
+    
+    def __init__(self, manager: DatabaseManager, rate: float):
+        super().__init__(daemon=True)
+        self.manager = manager
+        self.rate = rate
+        self.written = 0
+        self._stop_event = threading.Event()
+    
+    def run(self):
+        carry = 0.0
+        while not self._stop_event.wait(0.1):
+            carry += self.rate * 0.1
+            count = int(carry)
+            if count:
+                carry -= count
+                self.manager.insert_events([make_event(self.written + i) for i in range(count)])
+                self.written += count
+    
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多工作进程API吞吐基准')
+    parser.add_argument('--workers', default='1,2,4,8', help='逗号分隔的工作进程数')
+    parser.add_argument('--concurrency', default='64', help='逗号分隔的并发客户端数')
+    parser.add_argument('--requests', type=int, default=5000, help='每个并发级别的请求数')
+    parser.add_argument('--warmup', type=int, default=200, help='每次启动后预热的请求数')
+    parser.add_argument('--seed', type=int, default=100000, help='预写入的事件数')
+    parser.add_argument('--write-rate', type=float, default=0, help='压测期间监控进程每秒写入的事件数')
+    parser.add_argument('--api-key', default=str(config.get('api_key', '')))
+    parser.add_argument('--json', help='结果输出JSON文件')
+    args = parser.parse_args()
+    
+    worker_counts = [int(w) for w in args.workers.split(',') if w.strip()]
+    levels = [int(c) for c in args.concurrency.split(',') if c.strip()]
+    
+    results = []
+    with temp_dir() as work_dir:
+        db_path = work_dir / 'api_workers.db'
+        manager = DatabaseManager(db_path)
+        seed(manager, args.seed)
+        (work_dir / 'bench_app.py').write_text(
+            APP_MODULE.format(server_dir=str(SERVER_DIR), db_path=str(db_path)), encoding='utf-8'
+        )
+        
+        baseline = {}
+        for workers in worker_counts:
+            port = free_port()
+            process = start_server(str(work_dir), port, workers)
+            base_url = f'http://127.0.0.1:{port}'
+            writer = MonitorWriter(manager, args.write_rate) if args.write_rate > 0 else None
+            try:
+                if args.warmup:
+                    run_level(base_url, args.api_key, max(levels), args.warmup)
+                if writer:
+                    writer.start()
+                for concurrency in levels:
+                    row = {'workers': workers, **run_level(base_url, args.api_key, concurrency, args.requests)}
+                    baseline.setdefault(concurrency, row['rps'])
+                    row['speedup'] = row['rps'] / baseline[concurrency] if baseline[concurrency] else 0.0
+                    row['written'] = writer.written if writer else 0
+                    results.append(row)
+            finally:
+                if writer:
+                    writer.stop()
+                stop_server(process)
+        manager.close_all()
+    
+    report('api_workers', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
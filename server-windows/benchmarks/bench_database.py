@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库并发读写基准：每次调用新建连接+回滚日志 vs 连接池+WAL
+
+用法:
+    python benchmarks/bench_database.py --writers 8 --inserts 500 --readers 4
+"""
+
+import argparse
+import sqlite3
+import threading
+
+from common import Timer, make_event, report, temp_dir
+
+from database import DatabaseManager
+
+
+class LegacyDatabaseManager(DatabaseManager):
+    """旧实现：每次调用都新建连接，使用默认回滚日志"""
+    
+    journal_mode = 'DELETE'
+    
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_file, timeout=self.busy_timeout_ms / 1000.0)
+        conn.row_factory = sqlite3.Row
+        return conn
+    
+    def release_connection(self, conn):
+        conn.close()
+
+
+def run_scenario(manager_cls, db_path, writers: int, inserts: int, readers: int) -> dict:
+    """并发写入同时持续读取，返回吞吐量"""
+    manager = manager_cls(db_path)
+    done = threading.Event()
+    read_counts = [0] * readers
+    errors = []
+    
+    def writer(worker_id: int):
+        try:
+            for i in range(inserts):
+                manager.insert_event(make_event(worker_id * inserts + i))
+        except Exception as e:
+            errors.append(e)
+    
+    def reader(worker_id: int):
+        try:
+            while not done.is_set():
+                manager.get_events(100)
+                manager.get_statistics()
+                read_counts[worker_id] += 1
+        except Exception as e:
+            errors.append(e)
+    
+    reader_threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    writer_threads = [threading.Thread(target=writer, args=(i,)) for i in range(writers)]
+    
+    for t in reader_threads:
+        t.start()
+    with Timer() as timer:
+        for t in writer_threads:
+            t.start()
+        for t in writer_threads:
+            t.join()
+    done.set()
+    for t in reader_threads:
+        t.join()
+    manager.close_all()
+    
+    total_inserts = writers * inserts
+    return {
+        'scenario': manager_cls.__name__,
+        'journal': manager_cls.journal_mode,
+        'inserts': total_inserts,
+        'seconds': timer.elapsed,
+        'inserts_per_sec': total_inserts / timer.elapsed if timer.elapsed else 0.0,
+        'reads_per_sec': sum(read_counts) / timer.elapsed if timer.elapsed else 0.0,
+        'errors': len(errors)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据库并发读写基准')
+    parser.add_argument('--writers', type=int, default=8, help='写线程数')
+    parser.add_argument('--inserts', type=int, default=500, help='每个写线程插入条数')
+    parser.add_argument('--readers', type=int, default=4, help='读线程数')
+    parser.add_argument('--json', help='结果输出JSON文件')
+    args = parser.parse_args()
+    
+    results = []
+    for manager_cls in (LegacyDatabaseManager, DatabaseManager):
+        with temp_dir() as tmp:
+            results.append(run_scenario(
+                manager_cls, tmp / 'bench.db', args.writers, args.inserts, args.readers
+            ))
+    
+    report('database_concurrency', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
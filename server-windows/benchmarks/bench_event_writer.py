@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+事件写入基准：逐条同步写入 vs 写入队列批量落库（模拟一次拖入大量文件）
+
+用法:
+    python benchmarks/bench_event_writer.py --events 50000
+"""
+
+import argparse
+
+from common import Timer, make_event, report, temp_dir
+
+from database import DatabaseManager
+from event_writer import EventWriter
+
+
+def bench_sync(db_path, count: int) -> dict:
+    """生产者线程内逐条insert_event"""
+    manager = DatabaseManager(db_path)
+    with Timer() as timer:
+        for i in range(count):
+            manager.insert_event(make_event(i))
+    manager.close_all()
+    return {
+        'mode': 'sync',
+        'events': count,
+        'producer_seconds': timer.elapsed,
+        'total_seconds': timer.elapsed,
+        'events_per_sec': count / timer.elapsed,
+        'batches': count,
+        'max_queue_depth': 0
+    }
+
+
+def bench_writer(db_path, count: int, batch_size: int) -> dict:
+    """生产者只入队，写线程批量落库"""
+    manager = DatabaseManager(db_path)
+    writer = EventWriter(manager, batch_size=batch_size, queue_size=max(count, 1))
+    writer.start()
+    with Timer() as total:
+        with Timer() as producer:
+            for i in range(count):
+                writer.put(make_event(i))
+        writer.stop()
+    stats = writer.get_stats()
+    manager.close_all()
+    return {
+        'mode': f'writer(batch={batch_size})',
+        'events': count,
+        'producer_seconds': producer.elapsed,
+        'total_seconds': total.elapsed,
+        'events_per_sec': count / total.elapsed,
+        'batches': stats['batches_written'],
+        'max_queue_depth': stats['max_queue_depth']
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='事件写入基准')
+    parser.add_argument('--events', type=int, default=50000, help='事件数量')
+    parser.add_argument('--batch-size', type=int, default=500, help='写入器批量大小')
+    parser.add_argument('--json', help='结果输出JSON文件')
+    args = parser.parse_args()
+    
+    results = []
+    with temp_dir() as tmp:
+        results.append(bench_sync(tmp / 'sync.db', args.events))
+    with temp_dir() as tmp:
+        results.append(bench_writer(tmp / 'writer.db', args.events, args.batch_size))
+    
+    report('event_writer', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件夹拷入处理基准：只扫描结构，以及FileMonitor边扫描边写结构日志
+
+用法:
+    python benchmarks/bench_folder_log.py --width 8 --depth 3 --files 40
+"""
+
+import argparse
+
+from common import Timer, report, temp_dir
+from bench_scanner import make_tree
+
+from scanner import FolderScanner
+from server import FileMonitor
+
+
+def main():
+    parser = argparse.ArgumentParser(description='文件夹拷入处理基准')
+    parser.add_argument('--width', type=int, default=8, help='每层子目录数')
+    parser.add_argument('--depth', type=int, default=3, help='目录深度')
+    parser.add_argument('--files', type=int, default=40, help='每个目录的文件数')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数（取最快一次）')
+    parser.add_argument('--json', help='结果输出JSON文件')
+    args = parser.parse_args()
+    
+    results = []
+    with temp_dir() as tmp:
+        root = tmp / 'tree'
+        root.mkdir()
+        total_files = make_tree(str(root), args.width, args.depth, args.files)
+        log_dir = tmp / 'logs'
+        log_dir.mkdir()
+        
+        monitor = FileMonitor('X', lambda event: None, root_path=str(tmp))
+        monitor._folder_log_path = lambda name: log_dir / f'{name}.txt'
+        
+        cases = [
+            ('FolderScanner.scan', lambda: FolderScanner().scan(str(root))),
+            ('_scan_and_log_folder', lambda: monitor._scan_and_log_folder('tree', str(root))),
+        ]
+        for name, fn in cases:
+            best = None
+            for _ in range(args.repeat):
+                with Timer() as timer:
+                    fn()
+                best = timer.elapsed if best is None else min(best, timer.elapsed)
+            results.append({
+                'case': name,
+                'files': total_files,
+                'seconds': best,
+                'files_per_sec': total_files / best if best else 0.0,
+                'log_bytes': (log_dir / 'tree.txt').stat().st_size if (log_dir / 'tree.txt').exists() else 0
+            })
+    
+    report('folder_log', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备检测空闲开销基准：0.5秒轮询 vs 设备事件驱动
+
+两种模式都使用模拟设备源（驱动器集合相同、走同一条_monitor_loop），区别只在于
+监控循环是被定时器唤醒还是被插拔通知唤醒。--probe-ms模拟每次枚举驱动器的开销
+（Windows上_is_usb_drive对固定磁盘会新建WMI连接并遍历分区关联，通常几十毫秒）。
+
+用法:
+    python benchmarks/bench_idle_cpu.py --seconds 10 --probe-ms 20
+"""
+
+import argparse
+import threading
+import time
+
+from common import Timer, report, temp_dir
+
+from database import DatabaseManager
+from device_watch import SimulatedDeviceWatcher
+from event_writer import EventWriter
+from multiplexer import MonitorHub
+from server import USBMonitorService
+
+
+class SimulatedPollingWatcher(SimulatedDeviceWatcher):
+    """旧行为：插拔不发通知，只靠固定间隔重新枚举"""
+    
+    def __init__(self, interval: float):
+        super().__init__()
+        self.fallback_interval = interval
+    
+    def notify(self):
+        pass
+
+
+class ProbingService(USBMonitorService):
+    """每次枚举驱动器时消耗probe_ms毫秒CPU，模拟WMI查询"""
+    
+    def __init__(self, watcher, probe_ms: float):
+        super().__init__(device_watcher=watcher)
+        self.probe_ms = probe_ms
+    
+    def _get_usb_drives(self) -> set:
+        deadline = time.thread_time() + self.probe_ms / 1000.0
+        while time.thread_time() < deadline:
+            pass
+        return super()._get_usb_drives()
+
+
+def run_mode(mode: str, watcher, seconds: float, probe_ms: float, work_dir) -> dict:
+    manager = DatabaseManager(work_dir / f'{mode}.db')
+    service = ProbingService(watcher, probe_ms)
+    service.event_writer = EventWriter(manager)
+    service.event_writer.start()
+    service.hub = MonitorHub()
+    service.hub.start()
+    service.running = True
+    service.monitor_thread = threading.Thread(target=service._monitor_loop, daemon=True)
+    service.monitor_thread.start()
+    time.sleep(0.2)
+    
+    # 空闲阶段：没有任何插拔
+    scans_before = service.drive_scans
+    cpu_before = time.process_time()
+    time.sleep(seconds)
+    idle_cpu = time.process_time() - cpu_before
+    idle_scans = service.drive_scans - scans_before
+    
+    # 插入延迟：从插入到开始监控该驱动器
+    drive_root = work_dir / f'{mode}_drive'
+    drive_root.mkdir()
+    with Timer() as arrival:
+        watcher.insert('E', str(drive_root))
+        while 'E' not in service.file_monitors:
+            time.sleep(0.001)
+    
+    service.stop()
+    manager.close_all()
+    return {
+        'mode': mode,
+        'idle_seconds': seconds,
+        'idle_cpu_ms': idle_cpu * 1000,
+        'cpu_percent': idle_cpu / seconds * 100,
+        'drive_scans': idle_scans,
+        'arrival_ms': arrival.elapsed * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='设备检测空闲开销基准')
+    parser.add_argument('--seconds', type=float, default=10.0, help='空闲观测时长（秒）')
+    parser.add_argument('--probe-ms', type=float, default=20.0, help='模拟每次枚举驱动器的CPU开销（毫秒）')
+    parser.add_argument('--interval', type=float, default=0.5, help='轮询模式间隔（秒）')
+    parser.add_argument('--json', help='结果写入JSON文件')
+    args = parser.parse_args()
+    
+    results = []
+    with temp_dir() as work_dir:
+        results.append(run_mode('polling', SimulatedPollingWatcher(args.interval),
+                                args.seconds, args.probe_ms, work_dir))
+        results.append(run_mode('event', SimulatedDeviceWatcher(),
+                                args.seconds, args.probe_ms, work_dir))
+    
+    report('设备检测空闲开销', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
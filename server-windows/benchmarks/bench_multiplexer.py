@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多驱动器并发监控基准：模拟同时插入几十个驱动器，全部由MonitorHub的单个复用线程监控
+
+走完整的USBMonitorService路径：模拟设备源插入drives个驱动器（各为一个临时目录），
+每个驱动器并发拷入files个文件，记录:
+    threads            监控全部驱动器额外占用的线程数（与驱动器数量无关）
+    arrival_ms         从插入到所有驱动器的通知源就绪
+    events_per_sec     拷入事件落库吞吐
+    idle_cpu_percent   全部驱动器空闲时的CPU占用
+    remove_ms          移除全部驱动器到所有通知源关闭
+    hub_stop_ms        停止复用线程、拷贝跟踪器和工作线程池耗时
+    
+    --source inotify  在各驱动器目录真实创建文件，由inotify产生通知（仅Linux）
+    --source replay   每个驱动器回放同一条合成轨迹（轮询方式，不依赖平台）
+
+用法:
+    python benchmarks/bench_multiplexer.py --drives 32 --files 50
+"""
+
+import argparse
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from common import Timer, report, temp_dir
+
+from config import config
+from copy_tracker import CopyCompletionTracker
+from database import DatabaseManager
+from device_watch import SimulatedDeviceWatcher
+from event_writer import EventWriter
+from multiplexer import MonitorHub
+from notify_sources import ACTION_ADDED
+from server import USBMonitorService
+
+
+def wait_until(predicate, timeout: float = 60.0) -> bool:
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def write_files(root, files: int):
+    """模拟拷入：逐个创建文件并写入内容"""
+    for i in range(files):
+        with open(root / f'file_{i}.dat', 'wb') as f:
+            f.write(b'\0' * 4096)
+
+
+def run(source_name: str, drives: int, files: int, workers: int, settle: float, idle: float) -> dict:
+    with temp_dir() as tmp:
+        config.config['notify_backend'] = source_name
+        if source_name == 'replay':
+            trace = tmp / 'trace.jsonl'
+            trace.write_text(''.join(
+                json.dumps({'t': 0, 'action': ACTION_ADDED, 'path': f'file_{i}.dat', 'size': 4096}) + '\n'
+                for i in range(files)
+            ), encoding='utf-8')
+            config.config['notify_replay_trace'] = str(trace)
+            config.config['notify_replay_speed'] = 0
+        
+        manager = DatabaseManager(tmp / 'multiplexer.db')
+        watcher = SimulatedDeviceWatcher()
+        service = USBMonitorService(device_watcher=watcher)
+        service.event_writer = EventWriter(manager, queue_size=max(1000, drives * (files + 2)))
+        service.event_writer.start()
+        threads_before = threading.active_count()
+        service.hub = MonitorHub(workers=workers,
+                                 copy_tracker=CopyCompletionTracker(settle_time=settle, poll_interval=settle / 2))
+        service.hub.start()
+        service.running = True
+        service.monitor_thread = threading.Thread(target=service._monitor_loop, daemon=True)
+        service.monitor_thread.start()
+        time.sleep(0.1)
+        
+        roots = []
+        for i in range(drives):
+            root = tmp / f'drive_{i:02d}'
+            root.mkdir()
+            roots.append(root)
+        
+        # 插入全部驱动器，等待通知源全部注册到复用线程
+        with Timer() as arrival:
+            for i, root in enumerate(roots):
+                watcher.insert(f'D{i:02d}', str(root))
+            wait_until(lambda: service.hub.get_stats()['multiplexer']['sources']
+                       + service.hub.get_stats()['multiplexer']['polled_sources'] >= drives)
+        threads = threading.active_count() - threads_before
+        
+        # 所有驱动器同时拷入
+        writer = service.event_writer
+        expected = drives * (files + 1)  # 每个驱动器一条插入事件
+        with Timer() as burst:
+            if source_name == 'inotify':
+                with ThreadPoolExecutor(max_workers=min(drives, 16)) as pool:
+                    list(pool.map(lambda root: write_files(root, files), roots))
+            wait_until(lambda: writer.events_written + writer.queue.qsize() >= expected, timeout=120)
+        events = writer.events_written + writer.queue.qsize() - drives
+        
+        # 空闲：没有任何文件变化
+        cpu_before = time.process_time()
+        time.sleep(idle)
+        idle_cpu = time.process_time() - cpu_before
+        
+        with Timer() as removal:
+            for i in range(drives):
+                watcher.remove(f'D{i:02d}')
+            wait_until(lambda: not service.file_monitors and service.hub.get_stats()['multiplexer']['sources']
+                       + service.hub.get_stats()['multiplexer']['polled_sources'] == 0)
+        
+        with Timer() as stop:
+            service.hub.stop()
+        service.stop()
+        manager.close_all()
+        
+        return {
+            'source': source_name,
+            'drives': drives,
+            'files_per_drive': files,
+            'workers': workers,
+            'threads': threads,
+            'arrival_ms': arrival.elapsed * 1000,
+            'events': events,
+            'seconds': burst.elapsed,
+            'events_per_sec': events / burst.elapsed if burst.elapsed else 0.0,
+            'idle_cpu_percent': idle_cpu / idle * 100 if idle else 0.0,
+            'remove_ms': removal.elapsed * 1000,
+            'hub_stop_ms': stop.elapsed * 1000
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多驱动器并发监控基准')
+    parser.add_argument('--source', default='inotify', choices=['inotify', 'replay', 'all'])
+    parser.add_argument('--drives', type=int, default=32, help='同时插入的驱动器数')
+    parser.add_argument('--files', type=int, default=50, help='每个驱动器拷入的文件数')
+    parser.add_argument('--workers', type=int, default=4, help='工作线程数')
+    parser.add_argument('--settle', type=float, default=0.05, help='拷贝稳定判定时间（秒）')
+    parser.add_argument('--idle', type=float, default=2.0, help='空闲观测时长（秒）')
+    parser.add_argument('--json', help='结果输出JSON文件')
+    args = parser.parse_args()
+    
+    sources = ['inotify', 'replay'] if args.source == 'all' else [args.source]
+    results = [run(s, args.drives, args.files, args.workers, args.settle, args.idle) for s in sources]
+    report('monitor_multiplexer', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+监控管线端到端吞吐：通知源 -> FileMonitor -> 拷贝完成跟踪 -> 写入队列 -> SQLite
+
+    --source replay   回放合成轨迹（不依赖平台，CI可用）
+    --source inotify  在临时目录真实创建文件，由inotify产生通知（仅Linux）
+
+用法:
+    python benchmarks/bench_pipeline.py --files 2000 --folders 20 --folder-files 50
+"""
+
+import argparse
+import os
+import time
+
+from common import Timer, report, temp_dir
+
+from copy_tracker import CopyCompletionTracker
+from database import DatabaseManager
+from event_writer import EventWriter
+from notify_sources import ACTION_ADDED, InotifyNotificationSource, ReplayNotificationSource
+from server import FileMonitor
+
+
+def make_trace(files: int, folders: int, folder_files: int) -> list:
+    """合成轨迹：files个顶层文件 + folders个各含folder_files个文件的文件夹"""
+    records = []
+    for i in range(files):
+        records.append({'t': 0, 'action': ACTION_ADDED, 'path': f'file_{i}.dat', 'size': 1024})
+    for i in range(folders):
+        records.append({'t': 0, 'action': ACTION_ADDED, 'path': f'folder_{i}', 'is_dir': True})
+        for j in range(folder_files):
+            records.append({'t': 0, 'action': ACTION_ADDED, 'path': f'folder_{i}\\file_{j}.txt', 'size': 256})
+    return records
+
+
+def materialize(root: str, records: list):
+    """按轨迹真实创建文件（inotify模式）"""
+    for record in records:
+        full_path = os.path.join(root, record['path'].replace('\\', os.sep))
+        if record.get('is_dir'):
+            os.makedirs(full_path, exist_ok=True)
+        else:
+            with open(full_path, 'wb') as f:
+                f.truncate(record.get('size', 0))
+
+
+def run(source_name: str, files: int, folders: int, folder_files: int, settle: float) -> dict:
+    with temp_dir() as tmp:
+        root = tmp / 'drive'
+        root.mkdir()
+        manager = DatabaseManager(tmp / 'pipeline.db')
+        writer = EventWriter(manager, queue_size=max(1000, files + folders))
+        writer.start()
+        
+        records = make_trace(files, folders, folder_files)
+        if source_name == 'replay':
+            source = ReplayNotificationSource(str(root), records=records, speed=0)
+        else:
+            source = InotifyNotificationSource(str(root))
+        
+        monitor = FileMonitor('X', writer.put, root_path=str(root), source=source)
+        monitor.copy_tracker = CopyCompletionTracker(settle_time=settle, poll_interval=settle / 2)
+        # 文件夹结构日志写到临时目录
+        monitor._folder_log_path = lambda name: tmp / f'{name}.txt'
+        
+        expected = files + folders
+        with Timer() as timer:
+            monitor.start()
+            if source_name == 'inotify':
+                time.sleep(0.2)  # 等待watch建立
+                materialize(str(root), records)
+            while writer.events_written + writer.queue.qsize() < expected:
+                time.sleep(0.01)
+                if timer.start + 120 < time.perf_counter():
+                    break
+            writer.stop()
+        monitor.stop()
+        manager.close_all()
+        
+        return {
+            'source': source_name,
+            'notifications': len(records),
+            'events': writer.events_written,
+            'seconds': timer.elapsed,
+            'events_per_sec': writer.events_written / timer.elapsed,
+            'notifications_per_sec': len(records) / timer.elapsed,
+            'settle_s': settle
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='监控管线端到端吞吐')
+    parser.add_argument('--source', default='replay', choices=['replay', 'inotify', 'all'])
+    parser.add_argument('--files', type=int, default=2000, help='顶层文件数')
+    parser.add_argument('--folders', type=int, default=20, help='顶层文件夹数')
+    parser.add_argument('--folder-files', type=int, default=50, help='每个文件夹内的文件数')
+    parser.add_argument('--settle', type=float, default=0.05, help='拷贝稳定判定时间（秒）')
+    parser.add_argument('--json', help='结果输出JSON文件')
+    args = parser.parse_args()
+    
+    sources = ['replay', 'inotify'] if args.source == 'all' else [args.source]
+    results = [run(s, args.files, args.folders, args.folder_files, args.settle) for s in sources]
+    report('monitor_pipeline', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
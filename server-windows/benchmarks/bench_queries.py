@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数据库规模基准：逐条/批量插入，以及百万、千万级事件表上的列表查询、统计和全文检索
+
+生成的数据库可以用--data-dir保留，下次直接复用（按行数命名）:
+    python benchmarks/bench_queries.py --rows 1000000,10000000 --data-dir ~/usbmon_bench_data
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from common import Timer, make_event, percentile, report, temp_dir
+
+from database import DatabaseManager
+
+GENERATE_CHUNK = 10000
+
+
+def bench_inserts(work_dir: Path, count: int, batch_size: int) -> list:
+    """insert_event逐条 vs insert_events批量"""
+    results = []
+    
+    manager = DatabaseManager(work_dir / 'insert_single.db')
+    with Timer() as timer:
+        for i in range(count):
+            manager.insert_event(make_event(i))
+    manager.close_all()
+    results.append({
+        'case': 'insert_event',
+        'rows': count,
+        'p50_ms': timer.elapsed / count * 1000,
+        'p99_ms': None,
+        'ops_per_sec': count / timer.elapsed
+    })
+    
+    manager = DatabaseManager(work_dir / 'insert_batch.db')
+    with Timer() as timer:
+        for start in range(0, count, batch_size):
+            manager.insert_events([make_event(i) for i in range(start, min(count, start + batch_size))])
+    manager.close_all()
+    results.append({
+        'case': f'insert_events(batch={batch_size})',
+        'rows': count,
+        'p50_ms': timer.elapsed / count * 1000,
+        'p99_ms': None,
+        'ops_per_sec': count / timer.elapsed
+    })
+    return results
+
+
+def prepare_database(path: Path, rows: int) -> DatabaseManager:
+    """生成（或复用）包含rows条事件的数据库"""
+    manager = DatabaseManager(path)
+    existing = manager.get_connection().execute('SELECT COUNT(*) FROM events').fetchone()[0]
+    if existing >= rows:
+        return manager
+    
+    print(f"生成 {rows} 条事件: {path}")
+    with Timer() as timer:
+        for start in range(existing, rows, GENERATE_CHUNK):
+            manager.insert_events([make_event(i) for i in range(start, min(rows, start + GENERATE_CHUNK))])
+    print(f"生成完成，用时 {timer.elapsed:.1f}s")
+    return manager
+
+
+def measure(fn, repeat: int) -> dict:
+    """重复执行，返回延迟分布"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+        'ops_per_sec': len(samples) / sum(samples) if sum(samples) else 0.0
+    }
+
+
+def bench_reads(manager: DatabaseManager, rows: int, repeat: int) -> list:
+    """列表查询、深翻页、过滤、统计与全文检索"""
+    def deep_page():
+        # 连续翻100页
+        cursor = None
+        for _ in range(100):
+            page = manager.get_events_page(50, cursor)
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+    
+    cases = [
+        ('get_events(limit=100)', lambda: manager.get_events(100), repeat),
+        ('get_events_page x100', deep_page, max(1, repeat // 10)),
+        ('get_events_page(username)', lambda: manager.get_events_page(50, username='张三'), repeat),
+        ('get_events_page(action=USB*)', lambda: manager.get_events_page(50, action='USB*'), repeat),
+        ('get_statistics', manager.get_statistics, repeat),
+        ('get_stats_timeline(day)', lambda: manager.get_stats_timeline('day'), repeat),
+        ('search_events(exact)', lambda: manager.search_events(f'file_{rows // 2}'), repeat),
+        ('search_events(prefix)', lambda: manager.search_events(f'file_{rows // 3}*'), repeat),
+        ('search_events(broad, rank)', lambda: manager.search_events('dat'), repeat),
+        ('search_events(broad, recent)', lambda: manager.search_events('dat', sort='recent'), repeat),
+    ]
+    
+    results = []
+    for name, fn, n in cases:
+        results.append({'case': name, 'rows': rows, **measure(fn, n)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据库规模基准')
+    parser.add_argument('--rows', default='1000000', help='逗号分隔的事件表规模')
+    parser.add_argument('--inserts', type=int, default=5000, help='插入基准的事件数')
+    parser.add_argument('--batch-size', type=int, default=1000, help='批量插入大小')
+    parser.add_argument('--repeat', type=int, default=50, help='每个查询的重复次数')
+    parser.add_argument('--data-dir', help='保留生成的数据库以便复用')
+    parser.add_argument('--json', help='结果输出JSON文件')
+    args = parser.parse_args()
+    
+    results = []
+    with temp_dir() as work_dir:
+        data_dir = Path(args.data_dir).expanduser() if args.data_dir else work_dir
+        data_dir.mkdir(parents=True, exist_ok=True)
+        
+        if args.inserts:
+            results.extend(bench_inserts(work_dir, args.inserts, args.batch_size))
+        
+        for rows in [int(r) for r in args.rows.split(',') if r.strip()]:
+            manager = prepare_database(data_dir / f'events_{rows}.db', rows)
+            results.extend(bench_reads(manager, rows, args.repeat))
+            manager.close_all()
+    
+    report('database_queries', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
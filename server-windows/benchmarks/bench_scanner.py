@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件夹扫描基准：旧版 os.walk + os.path.getsize vs FolderScanner（os.scandir + 线程池）
+
+在本地文件系统上生成合成目录树后分别扫描:
+    python benchmarks/bench_scanner.py --width 8 --depth 3 --files 40
+"""
+
+import argparse
+import os
+import time
+
+from common import Timer, report, temp_dir
+
+from scanner import FolderScanner
+
+
+def make_tree(root: str, width: int, depth: int, files: int) -> int:
+    """生成每层width个子目录、每个目录files个文件的目录树，返回文件总数"""
+    count = 0
+    for i in range(files):
+        with open(os.path.join(root, f'file_{i}.txt'), 'wb') as f:
+            f.write(b'x' * (i % 4096))
+        count += 1
+    if depth > 0:
+        for i in range(width):
+            sub = os.path.join(root, f'dir_{i}')
+            os.mkdir(sub)
+            count += make_tree(sub, width, depth - 1, files)
+    return count
+
+
+def legacy_scan(folder_path: str) -> dict:
+    """旧版实现：os.walk + 每个文件单独getsize"""
+    total_files = 0
+    total_size = 0
+    for root, dirs, files in os.walk(folder_path):
+        for file in files:
+            try:
+                total_size += os.path.getsize(os.path.join(root, file))
+                total_files += 1
+            except OSError:
+                pass
+    return {'total_files': total_files, 'total_size': total_size}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='文件夹扫描基准')
+    parser.add_argument('--width', type=int, default=8, help='每层子目录数')
+    parser.add_argument('--depth', type=int, default=3, help='目录深度')
+    parser.add_argument('--files', type=int, default=40, help='每个目录的文件数')
+    parser.add_argument('--workers', default='1,4,8', help='FolderScanner线程数列表')
+    parser.add_argument('--json', help='结果输出JSON文件')
+    args = parser.parse_args()
+    
+    results = []
+    with temp_dir() as tmp:
+        root = str(tmp / 'tree')
+        os.mkdir(root)
+        file_count = make_tree(root, args.width, args.depth, args.files)
+        
+        with Timer() as timer:
+            legacy = legacy_scan(root)
+        results.append({
+            'scanner': 'os.walk+getsize',
+            'files': legacy['total_files'],
+            'seconds': timer.elapsed,
+            'files_per_sec': file_count / timer.elapsed,
+            'first_dir_ms': timer.elapsed * 1000
+        })
+        
+        for workers in [int(w) for w in args.workers.split(',')]:
+            scanner = FolderScanner(max_workers=workers, max_entries=0, max_depth=0)
+            first = None
+            files = 0
+            with Timer() as timer:
+                for folder_info in scanner.iter_structure(root):
+                    if first is None:
+                        # 流式产出：第一个目录可用的时间
+                        first = (time.perf_counter() - timer.start) * 1000
+                    files += len(folder_info['files'])
+            results.append({
+                'scanner': f'FolderScanner(workers={workers})',
+                'files': files,
+                'seconds': timer.elapsed,
+                'files_per_sec': file_count / timer.elapsed,
+                'first_dir_ms': first
+            })
+    
+    report('folder_scanner', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
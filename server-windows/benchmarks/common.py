@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+基准测试公共工具
+"""
+
+import json
+import os
+import sys
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# 让基准脚本可以直接导入server-windows下的模块
+SERVER_DIR = Path(__file__).resolve().parent.parent
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+
+ACTIONS = ['拷入文件 (.docx)', '拷入文件 (.pdf)', '拷入文件 (.jpg)', 'USB插入', 'USB移除']
+USERNAMES = ['张三', '李四', '王五', '赵六']
+
+
+def make_event(i: int, base_time: Optional[datetime] = None) -> Dict:
+    """生成一条合成事件"""
+    base_time = base_time or datetime.now()
+    return {
+        'timestamp': (base_time - timedelta(seconds=i)).isoformat(),
+        'machine_name': f'BENCH-PC{i % 8:03d}',
+        'ip_address': '127.0.0.1',
+        'username': USERNAMES[i % len(USERNAMES)],
+        'login_id': i % 50,
+        'drive_letter': 'EFGH'[i % 4],
+        'file_name': f'file_{i}.dat',
+        'file_path': f'E:\\file_{i}.dat',
+        'action': ACTIONS[i % len(ACTIONS)],
+        'file_size': (i * 7919) % 10485760,
+        'is_folder': False
+    }
+
+
+@contextmanager
+def temp_dir(prefix: str = 'usbmon_bench_'):
+    """临时目录（结束后删除）"""
+    path = Path(tempfile.mkdtemp(prefix=prefix))
+    try:
+        yield path
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+
+class Timer:
+    """简单计时器"""
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+        return self
+    
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+        return False
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """计算百分位数（最近秩法）"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def report(name: str, results: List[Dict], json_path: Optional[str] = None):
+    """打印结果表格，并可选写入JSON文件"""
+    print(f"\n== {name} ==")
+    if results:
+        columns = list(results[0].keys())
+        widths = {c: max(len(c), *(len(_fmt(r.get(c))) for r in results)) for c in columns}
+        print("  ".join(c.ljust(widths[c]) for c in columns))
+        for row in results:
+            print("  ".join(_fmt(row.get(c)).ljust(widths[c]) for c in columns))
+    
+    if json_path:
+        payload = {
+            'benchmark': name,
+            'timestamp': datetime.now().isoformat(),
+            'python': sys.version.split()[0],
+            'platform': sys.platform,
+            'cpu_count': os.cpu_count(),
+            'results': results
+        }
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=2, ensure_ascii=False)
+        print(f"结果已写入: {json_path}")
+
+
+def _fmt(value) -> str:
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
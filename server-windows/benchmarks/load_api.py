@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+读接口压测：模拟多个仪表盘并发轮询，按并发数报告p50/p99延迟
+
+默认在子进程中启动一个使用临时数据库的uvicorn，预先写入--seed条事件；
+也可以用--url指向已经运行的后端。
+
+用法:
+    python benchmarks/load_api.py --concurrency 1,8,32,64 --requests 2000
+    python benchmarks/load_api.py --url http://localhost:8888
+"""
+
+import argparse
+import http.client
+import json
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+from common import SERVER_DIR, Timer, percentile, report, temp_dir
+
+from config import config
+from load_ingest import api_event, post
+
+# 仪表盘轮询的接口组合
+ENDPOINTS = [
+    '/api/events?limit=50',
+    '/api/events?limit=50&action=USB*',
+    '/api/stats',
+    '/api/stats/timeline?granularity=hour',
+    '/api/ping',
+]
+
+# 子进程：临时数据库 + uvicorn（不弹登录框，也不启动USB监控）
+LAUNCHER = '''
+import sys
+sys.path.insert(0, {server_dir!r})
+from config import config
+config.config['database'] = {db_path!r}
+import uvicorn
+import api
+api.app.router.on_startup.clear()
+uvicorn.run(api.app, host='127.0.0.1', port={port}, log_level='warning')
+'''
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(db_path: str, port: int) -> subprocess.Popen:
+    """启动后端子进程并等待端口可用"""
+    code = LAUNCHER.format(server_dir=str(SERVER_DIR), db_path=db_path, port=port)
+    process = subprocess.Popen([sys.executable, '-c', code], cwd=str(SERVER_DIR))
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return process
+        except OSError:
+            if process.poll() is not None:
+                raise RuntimeError('后端子进程启动失败')
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError('等待后端启动超时')
+
+
+def run_level(base_url: str, api_key: str, concurrency: int, total: int) -> dict:
+    """concurrency个客户端（各自保持长连接）共发送total个请求"""
+    parsed = urllib.parse.urlparse(base_url)
+    headers = {'Authorization': f'Bearer {api_key}'}
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = [0]
+    
+    def client():
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=60)
+        samples = []
+        while True:
+            with lock:
+                if counter[0] >= total:
+                    break
+                n = counter[0]
+                counter[0] += 1
+            path = ENDPOINTS[n % len(ENDPOINTS)]
+            start = time.perf_counter()
+            try:
+                conn.request('GET', path, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    raise RuntimeError(response.status)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+                conn.close()
+                conn = http.client.HTTPConnection(parsed.hostname, parsed.port, timeout=60)
+                continue
+            samples.append(time.perf_counter() - start)
+        conn.close()
+        with lock:
+            latencies.extend(samples)
+    
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    with Timer() as timer:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': len(latencies) / timer.elapsed if timer.elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'max_ms': max(latencies) * 1000 if latencies else 0.0
+    }
+
+
+def seed(base_url: str, api_key: str, count: int, batch_size: int = 1000):
+    """通过批量接口写入测试数据"""
+    for start in range(0, count, batch_size):
+        events = [api_event(i) for i in range(start, min(count, start + batch_size))]
+        post(f"{base_url}/api/events/batch", json.dumps(events, ensure_ascii=False).encode('utf-8'), api_key)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='读接口并发压测')
+    parser.add_argument('--url', help='已运行的后端地址（不指定则启动临时后端）')
+    parser.add_argument('--api-key', default=str(config.get('api_key', '')))
+    parser.add_argument('--concurrency', default='1,8,32,64', help='逗号分隔的并发数')
+    parser.add_argument('--requests', type=int, default=2000, help='每个并发级别的请求数')
+    parser.add_argument('--seed', type=int, default=50000, help='临时后端预写入的事件数')
+    parser.add_argument('--json', help='结果输出JSON文件')
+    args = parser.parse_args()
+    
+    levels = [int(c) for c in args.concurrency.split(',') if c.strip()]
+    
+    with temp_dir() as work_dir:
+        process = None
+        base_url = args.url
+        if not base_url:
+            port = free_port()
+            process = start_server(str(work_dir / 'load_api.db'), port)
+            base_url = f"http://127.0.0.1:{port}"
+        base_url = base_url.rstrip('/')
+        
+        try:
+            if process and args.seed:
+                seed(base_url, args.api_key, args.seed)
+            results = [run_level(base_url, args.api_key, c, args.requests) for c in levels]
+        finally:
+            if process:
+                process.terminate()
+                process.wait(timeout=10)
+    
+    report('api_read_latency', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
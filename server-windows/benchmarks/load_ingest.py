@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+写入接口压测：POST /api/events 逐条提交 vs POST /api/events/batch 批量提交
+
+需要先启动后端（python main.py 或 uvicorn api:app），然后:
+    python benchmarks/load_ingest.py --url http://localhost:8888 --events 5000 --concurrency 8
+"""
+
+import argparse
+import json
+import threading
+import urllib.request
+
+from common import Timer, make_event, report
+
+from config import config
+
+
+def post(url: str, body: bytes, api_key: str, content_type: str = 'application/json') -> dict:
+    """发送POST请求并解析JSON响应"""
+    request = urllib.request.Request(url, data=body, method='POST', headers={
+        'Authorization': f'Bearer {api_key}',
+        'Content-Type': content_type
+    })
+    with urllib.request.urlopen(request, timeout=120) as response:
+        return json.loads(response.read())
+
+
+def api_event(i: int) -> dict:
+    """FileEvent模型接受的字段"""
+    event = make_event(i)
+    event.pop('login_id')
+    return event
+
+
+def run_parallel(jobs, concurrency: int):
+    """用concurrency个线程执行jobs中的可调用对象"""
+    lock = threading.Lock()
+    jobs = list(jobs)
+    
+    def worker():
+        while True:
+            with lock:
+                if not jobs:
+                    return
+                job = jobs.pop()
+            job()
+    
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def bench_single(base_url: str, api_key: str, count: int, concurrency: int) -> dict:
+    """每个事件一个请求"""
+    url = f"{base_url}/api/events"
+    bodies = [json.dumps(api_event(i)).encode('utf-8') for i in range(count)]
+    with Timer() as timer:
+        run_parallel([lambda b=b: post(url, b, api_key) for b in bodies], concurrency)
+    return _result('single', count, 1, concurrency, timer.elapsed)
+
+
+def bench_batch(base_url: str, api_key: str, count: int, concurrency: int,
+                batch_size: int, ndjson: bool) -> dict:
+    """每batch_size个事件一个请求"""
+    url = f"{base_url}/api/events/batch"
+    bodies = []
+    for start in range(0, count, batch_size):
+        events = [api_event(i) for i in range(start, min(count, start + batch_size))]
+        if ndjson:
+            bodies.append('\n'.join(json.dumps(e, ensure_ascii=False) for e in events).encode('utf-8'))
+        else:
+            bodies.append(json.dumps(events, ensure_ascii=False).encode('utf-8'))
+    content_type = 'application/x-ndjson' if ndjson else 'application/json'
+    
+    with Timer() as timer:
+        run_parallel([lambda b=b: post(url, b, api_key, content_type) for b in bodies], concurrency)
+    return _result('batch-ndjson' if ndjson else 'batch-json', count, batch_size, concurrency, timer.elapsed)
+
+
+def _result(mode: str, count: int, batch_size: int, concurrency: int, elapsed: float) -> dict:
+    return {
+        'mode': mode,
+        'events': count,
+        'batch_size': batch_size,
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'events_per_sec': count / elapsed if elapsed else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='事件写入接口压测')
+    parser.add_argument('--url', default=f"http://{config.get('host', 'localhost')}:{config.get('port', 8888)}")
+    parser.add_argument('--api-key', default=str(config.get('api_key', '')))
+    parser.add_argument('--events', type=int, default=5000, help='事件数量')
+    parser.add_argument('--concurrency', type=int, default=8, help='并发连接数')
+    parser.add_argument('--batch-size', type=int, default=1000, help='批量接口每个请求的事件数')
+    parser.add_argument('--json', help='结果输出JSON文件')
+    args = parser.parse_args()
+    
+    base_url = args.url.rstrip('/')
+    results = [
+        bench_single(base_url, args.api_key, args.events, args.concurrency),
+        bench_batch(base_url, args.api_key, args.events, args.concurrency, args.batch_size, ndjson=False),
+        bench_batch(base_url, args.api_key, args.events, args.concurrency, args.batch_size, ndjson=True),
+    ]
+    report('ingest_load', results, args.json)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行整套基准并汇总为一个JSON文件，可与上一版本的结果对比找出性能回退
+
+    python benchmarks/run_all.py --profile quick --output results.json
+    python benchmarks/run_all.py --profile full --output v2.json --compare v1.json
+
+profile:
+    quick   几分钟内跑完，适合日常对比
+    full    包含百万/千万级事件表（首次生成数据较慢，可用--data-dir复用）
+
+需要fastapi的接口基准在缺少依赖时记为skipped，不影响其他基准。
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from common import SERVER_DIR
+
+BENCH_DIR = Path(__file__).resolve().parent
+
+# (名称, 脚本, quick参数, full参数)
+SUITE = [
+    ('event_writer', 'bench_event_writer.py', ['--events', '20000'], ['--events', '200000']),
+    ('database_concurrency', 'bench_database.py', ['--inserts', '200'], ['--inserts', '2000']),
+    ('database_queries', 'bench_queries.py',
+     ['--rows', '100000', '--inserts', '2000', '--repeat', '20'],
+     ['--rows', '1000000,10000000', '--inserts', '20000', '--repeat', '50']),
+    ('scanner', 'bench_scanner.py', ['--depth', '2'], ['--depth', '3', '--files', '100']),
+    ('folder_log', 'bench_folder_log.py', ['--depth', '2'], ['--depth', '3', '--files', '100']),
+    ('pipeline', 'bench_pipeline.py', ['--files', '500'], ['--files', '5000', '--source', 'all']),
+    ('multiplexer', 'bench_multiplexer.py', ['--drives', '16', '--files', '20', '--idle', '1'],
+     ['--drives', '64', '--files', '100', '--source', 'all']),
+    ('idle_cpu', 'bench_idle_cpu.py', ['--seconds', '3'], ['--seconds', '10']),
+    ('api_inprocess', 'bench_api.py', ['--seed', '20000', '--requests', '200'],
+     ['--seed', '200000', '--requests', '2000', '--concurrency', '1,16,64']),
+    ('api_workers', 'bench_api_workers.py', ['--workers', '1,2', '--seed', '20000', '--requests', '1000'],
+     ['--workers', '1,2,4,8', '--seed', '200000', '--requests', '5000', '--write-rate', '50']),
+]
+
+# 数值越小越好 / 越大越好的字段后缀
+LOWER_IS_BETTER = ('_ms', 'seconds', 'cpu_percent')
+HIGHER_IS_BETTER = ('per_sec', 'rps')
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=str(SERVER_DIR), stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(name: str, script: str, extra: List[str], data_dir: Optional[str]) -> Dict:
+    """以子进程运行单个基准脚本，读取其JSON输出"""
+    with tempfile.TemporaryDirectory(prefix='usbmon_suite_') as tmp:
+        json_path = os.path.join(tmp, f'{name}.json')
+        cmd = [sys.executable, str(BENCH_DIR / script), *extra, '--json', json_path]
+        if data_dir and script == 'bench_queries.py':
+            cmd += ['--data-dir', data_dir]
+        print(f"\n>>> {name}: {' '.join(cmd[1:])}")
+        
+        completed = subprocess.run(cmd, cwd=str(SERVER_DIR), capture_output=True, text=True)
+        sys.stdout.write(completed.stdout)
+        if completed.returncode != 0 or not os.path.exists(json_path):
+            error = (completed.stderr or '').strip().splitlines()[-1:] or ['未知错误']
+            status = 'skipped' if 'ModuleNotFoundError' in error[0] else 'failed'
+            print(f"!!! {name} {status}: {error[0]}")
+            return {'name': name, 'status': status, 'error': error[0], 'results': []}
+        
+        with open(json_path, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+        return {'name': name, 'status': 'ok', 'results': payload.get('results', [])}
+
+
+def row_key(row: Dict) -> str:
+    """结果行的标识：所有非数值字段 + 并发等配置字段"""
+    parts = []
+    for key, value in row.items():
+        if isinstance(value, str) or key in ('concurrency', 'rows', 'batch_size', 'workers', 'drives'):
+            parts.append(f'{key}={value}')
+    return ','.join(parts)
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[Dict]:
+    """逐项对比两次结果，返回变差超过threshold的指标"""
+    regressions = []
+    base_rows = {
+        (bench['name'], row_key(row)): row
+        for bench in baseline.get('benchmarks', []) for row in bench.get('results', [])
+    }
+    for bench in current.get('benchmarks', []):
+        for row in bench.get('results', []):
+            base = base_rows.get((bench['name'], row_key(row)))
+            if not base:
+                continue
+            for field, value in row.items():
+                old = base.get(field)
+                if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                    continue
+                if field.endswith(LOWER_IS_BETTER):
+                    change = (value - old) / old
+                elif field.endswith(HIGHER_IS_BETTER):
+                    change = (old - value) / old
+                else:
+                    continue
+                if change > threshold:
+                    regressions.append({
+                        'benchmark': bench['name'],
+                        'row': row_key(row),
+                        'field': field,
+                        'baseline': old,
+                        'current': value,
+                        'worse_by': f"{change * 100:.1f}%"
+                    })
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='运行全部基准')
+    parser.add_argument('--profile', default='quick', choices=['quick', 'full'])
+    parser.add_argument('--only', help='只运行指定基准（逗号分隔）')
+    parser.add_argument('--data-dir', help='数据库规模基准复用生成数据的目录')
+    parser.add_argument('--output', default='benchmark_results.json', help='汇总结果JSON文件')
+    parser.add_argument('--compare', help='与之前的汇总结果对比')
+    parser.add_argument('--threshold', type=float, default=0.2, help='判定回退的变差比例')
+    args = parser.parse_args()
+    
+    only = set(args.only.split(',')) if args.only else None
+    benchmarks = []
+    for name, script, quick_args, full_args in SUITE:
+        if only and name not in only:
+            continue
+        extra = quick_args if args.profile == 'quick' else full_args
+        benchmarks.append(run_benchmark(name, script, extra, args.data_dir))
+    
+    summary = {
+        'suite': 'usb-monitor',
+        'profile': args.profile,
+        'revision': git_revision(),
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'platform': sys.platform,
+        'cpu_count': os.cpu_count(),
+        'benchmarks': benchmarks
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    print(f"\n汇总结果已写入: {args.output}")
+    
+    failed = [b['name'] for b in benchmarks if b['status'] == 'failed']
+    if failed:
+        print(f"失败的基准: {', '.join(failed)}")
+    
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(summary, baseline, args.threshold)
+        print(f"\n与 {baseline.get('revision') or args.compare} 对比: {len(regressions)} 项变差超过 {args.threshold * 100:.0f}%")
+        for item in regressions:
+            print(f"  {item['benchmark']} [{item['row']}] {item['field']}: "
+                  f"{item['baseline']:.3f} -> {item['current']:.3f} ({item['worse_by']})")
+        if regressions:
+            sys.exit(2)
+    
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+接口响应缓存 - 按数据版本号 + TTL缓存序列化后的响应体，附带ETag
+"""
+
+import hashlib
+import json
+import threading
+import time
+import logging
+from typing import Callable, Dict, Optional
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class CacheEntry:
+    """一条缓存：数据版本、过期时间、响应体与ETag"""
+    
+    __slots__ = ('version', 'expires', 'body', 'etag')
+    
+    def __init__(self, version: int, expires: float, body: bytes):
+        self.version = version
+        self.expires = expires
+        self.body = body
+        # ETag取自响应内容，数据版本变了但结果相同时客户端仍可得到304
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+class VersionedTTLCache:
+    """版本号 + TTL缓存
+    
+    调用方在计算前记下依赖数据的版本号，写入路径每次修改数据都会递增版本号；
+    命中要求版本号一致且未超过TTL（TTL兜底处理"今日事件数"这类随时间变化的结果）。
+    """
+    
+    def __init__(self, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl if ttl is not None else float(config.get('cache_ttl', 30))  # type: ignore
+        self.clock = clock
+        self._entries: Dict[str, CacheEntry] = {}
+        self._lock = threading.Lock()
+        
+        # 指标
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0  # 数据版本变化导致失效
+        self.expired = 0  # 超过TTL导致失效
+        self.not_modified = 0  # 返回304的次数
+    
+    def get(self, name: str, version: int) -> Optional[CacheEntry]:
+        """取出仍然有效的缓存；无效时返回None"""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.version != version:
+                self.stale += 1
+            elif entry.expires <= self.clock():
+                self.expired += 1
+            else:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            del self._entries[name]
+            return None
+    
+    def put(self, name: str, version: int, value) -> CacheEntry:
+        """序列化并缓存结果（version为计算前读取的数据版本）"""
+        body = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        entry = CacheEntry(version, self.clock() + self.ttl, body)
+        with self._lock:
+            current = self._entries.get(name)
+            # 并发计算时保留版本较新的结果
+            if current is None or current.version <= version:
+                self._entries[name] = entry
+        return entry
+    
+    def invalidate(self, name: Optional[str] = None):
+        """清除某条或全部缓存"""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+    
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+    
+    def get_stats(self) -> Dict:
+        """缓存指标"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'expired': self.expired,
+                'not_modified': self.not_modified,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match请求头是否匹配ETag（支持列表、弱校验W/和*）"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+# 全局响应缓存实例
+response_cache = VersionedTTLCache()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+跨进程变更追踪 - API以多个工作进程运行、USB监控在独立进程中写库时，各工作进程
+轮询共享的SQLite(WAL)数据库：按ID追踪新写入的事件推送给本进程的实时订阅者，
+并同步数据版本号，使响应缓存在其他进程写入后失效
+"""
+
+import threading
+import logging
+from typing import Callable, Dict, List, Optional
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeFeed(threading.Thread):
+    """变更追踪线程
+    
+    每poll_interval秒检查一次PRAGMA data_version，数据库没有被提交过修改时不做任何查询；
+    有修改时重新读取数据版本号，再按ID正序读出last_id之后的事件交给publish。
+    SQLite同一时刻只有一个写事务，自增ID按提交顺序分配，按ID追踪不会漏掉事件。
+    """
+    
+    def __init__(self, database, publish: Callable[[List[Dict]], None],
+                 poll_interval: Optional[float] = None, batch_size: Optional[int] = None):
+        super().__init__(daemon=True, name='ChangeFeed')
+        self.db = database
+        self.publish = publish
+        self.poll_interval = poll_interval or float(config.get('feed_poll_interval', 0.1))  # type: ignore
+        self.batch_size = batch_size or int(config.get('feed_batch_size', 1000))  # type: ignore
+        self.last_id = 0
+        self.running = False
+        self._stop_event = threading.Event()
+        
+        # 指标
+        self.polls = 0
+        self.wakeups = 0  # 检测到数据库有修改的次数
+        self.events_published = 0
+    
+    def start(self):
+        """从当前最大的事件ID开始追踪"""
+        self.last_id = self.db.max_event_id()
+        self.running = True
+        super().start()
+        logger.info(f"✅ 变更追踪已启动 (从事件 {self.last_id} 之后开始, 间隔: {self.poll_interval}s)")
+    
+    def stop(self, timeout: Optional[float] = None):
+        if not self.running:
+            return
+        self.running = False
+        self._stop_event.set()
+        self.join(timeout)
+    
+    def run(self):
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.poll()
+            except Exception as e:
+                logger.error(f"变更追踪失败: {e}")
+    
+    def poll(self) -> int:
+        """检查一次，返回推送的事件数"""
+        self.polls += 1
+        if not self.db.data_changed():
+            return 0
+        self.wakeups += 1
+        self.db.refresh_versions()
+        
+        published = 0
+        while True:
+            rows = self.db.get_events_since(self.last_id, self.batch_size)
+            if not rows:
+                break
+            self.last_id = rows[-1]['id']
+            self.publish(rows)
+            published += len(rows)
+            if len(rows) < self.batch_size:
+                break
+        self.events_published += published
+        return published
+    
+    def get_stats(self) -> Dict:
+        """变更追踪指标"""
+        return {
+            'running': self.running,
+            'poll_interval': self.poll_interval,
+            'last_id': self.last_id,
+            'polls': self.polls,
+            'wakeups': self.wakeups,
+            'events_published': self.events_published
+        }
@@ -17,7 +17,60 @@ class Config:
             "host": "localhost",
             "port": 8888,
             "api_key": "usb_monitor_2024",
-            "database": "usb_monitor.db"
+            "database": "usb_monitor.db",
+            "db_busy_timeout_ms": 5000,
+            "db_synchronous": "NORMAL",
+            "db_cache_size_kb": 16384,
+            "db_mmap_size": 268435456,
+            "db_pool_size": 8,
+            "db_executor_workers": 4,
+            "writer_batch_size": 500,
+            "writer_flush_interval": 0.5,
+            "writer_queue_size": 10000,
+            "writer_put_timeout": 5.0,
+            "batch_chunk_size": 1000,
+            "batch_max_events": 100000,
+            "batch_max_line_bytes": 16777216,
+            "batch_max_body_bytes": 134217728,
+            "scan_max_workers": 4,
+            "scan_max_entries": 500000,
+            "scan_max_depth": 0,
+            "copy_settle_time": 0.5,
+            "copy_poll_interval": 0.25,
+            "copy_max_wait": 600,
+            "notify_backend": "auto",
+            "notify_buffer_size": 65536,
+            "notify_replay_trace": "",
+            "notify_replay_speed": 1.0,
+            "notify_record_trace": "",
+            "device_watch_backend": "auto",
+            "device_poll_interval": 0.5,
+            "device_fallback_interval": 30,
+            "device_debounce": 0.3,
+            "sse_queue_size": 1000,
+            "sse_heartbeat": 15,
+            "sse_retry_ms": 3000,
+            "sse_catchup_limit": 1000,
+            "cache_ttl": 30,
+            "fts_tokenizer": "trigram",
+            "search_rank_window": 5000,
+            "hot_months": 0,
+            "retention_months": 0,
+            "archive_cache_months": 6,
+            "archive_interval_hours": 24,
+            "monitor_workers": 4,
+            "mux_poll_interval": 0.05,
+            "dedup_capacity": 10000,
+            "dedup_ttl": 300,
+            "login_timeout": 120,
+            "login_pending_limit": 10000,
+            "api_workers": 1,
+            "monitor_mode": "embedded",
+            "heartbeat_interval": 2,
+            "feed_poll_interval": 0.1,
+            "feed_batch_size": 1000,
+            "monitor_metrics_port": 8889,
+            "api_shutdown_timeout": 15
         }
         self.config = self.load_config()
     
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+拷贝完成跟踪器 - 定时复查待定路径，大小/修改时间稳定后才上报拷入事件
+"""
+
+import os
+import time
+import threading
+import logging
+from typing import Callable, Dict, Optional, Tuple
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingCopy:
+    """一个尚未拷贝完成的路径"""
+    
+    __slots__ = ('path', 'callback', 'first_seen', 'last_change', 'next_check', 'signature')
+    
+    def __init__(self, path: str, callback: Callable[[], None], now: float):
+        self.path = path
+        self.callback = callback
+        self.first_seen = now
+        self.last_change = now
+        self.next_check = now
+        self.signature: Optional[Tuple] = None
+
+
+def stat_signature(path: str) -> Optional[Tuple]:
+    """路径当前状态签名：文件取 (大小, 修改时间)，不存在时返回None
+    
+    文件夹本身的大小不随内容变化，文件夹的拷贝进度依靠touch()提示判断。
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+
+class CopyCompletionTracker(threading.Thread):
+    """拷贝完成跟踪器
+    
+    track()登记新拷入的路径后立即返回，不阻塞通知读取循环。后台线程每隔
+    poll_interval秒复查一次到期的路径：签名（大小、修改时间）连续settle_time秒
+    没有变化、期间也没有收到touch()提示，就认为拷贝完成并调用回调；
+    超过max_wait秒仍未稳定则强制上报；路径消失则放弃。
+    
+    poll()可以传入时间单独调用，配合自定义clock/stat在测试中驱动，无需启动线程。
+    """
+    
+    def __init__(self, settle_time: Optional[float] = None,
+                 poll_interval: Optional[float] = None,
+                 max_wait: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic,
+                 stat: Callable[[str], Optional[Tuple]] = stat_signature):
+        super().__init__(daemon=True, name='CopyCompletionTracker')
+        self.settle_time = settle_time if settle_time is not None else float(config.get('copy_settle_time', 0.5))  # type: ignore
+        self.poll_interval = poll_interval if poll_interval is not None else float(config.get('copy_poll_interval', 0.25))  # type: ignore
+        self.max_wait = max_wait if max_wait is not None else float(config.get('copy_max_wait', 600))  # type: ignore
+        self.clock = clock
+        self.stat = stat
+        self.pending: Dict[str, _PendingCopy] = {}
+        self.running = False
+        self._cond = threading.Condition()
+        
+        # 指标
+        self.settled_count = 0
+        self.forced_count = 0
+        self.vanished_count = 0
+    
+    def track(self, path: str, callback: Callable[[], None]):
+        """登记一个新拷入的路径；拷贝完成后在跟踪线程中调用callback"""
+        with self._cond:
+            if path not in self.pending:
+                self.pending[path] = _PendingCopy(path, callback, self.clock())
+                self._cond.notify()
+    
+    def touch(self, path: str):
+        """收到该路径（或其子项）的变化通知：重新开始计算稳定时间"""
+        with self._cond:
+            item = self.pending.get(path)
+            if item:
+                item.last_change = self.clock()
+    
+    def discard(self, path: str):
+        """不再跟踪该路径（例如已被删除）"""
+        with self._cond:
+            self.pending.pop(path, None)
+    
+    def discard_prefix(self, prefix: str) -> int:
+        """不再跟踪prefix目录下的所有路径（例如驱动器已移除），返回丢弃的数量"""
+        prefix = os.path.join(prefix, '')
+        with self._cond:
+            paths = [path for path in self.pending if path.startswith(prefix)]
+            for path in paths:
+                del self.pending[path]
+        return len(paths)
+    
+    def pending_count(self, prefix: Optional[str] = None) -> int:
+        """待定路径数（可只统计prefix目录下的）"""
+        if prefix is None:
+            return len(self.pending)
+        prefix = os.path.join(prefix, '')
+        with self._cond:
+            return sum(1 for path in self.pending if path.startswith(prefix))
+    
+    def poll(self, now: Optional[float] = None) -> int:
+        """复查所有到期的路径，返回本次上报的数量"""
+        now = self.clock() if now is None else now
+        ready = []
+        
+        with self._cond:
+            for path, item in list(self.pending.items()):
+                if item.next_check > now:
+                    continue
+                
+                signature = self.stat(path)
+                if signature is None:
+                    # 拷入后又被删除或重命名
+                    del self.pending[path]
+                    self.vanished_count += 1
+                    continue
+                
+                if signature != item.signature:
+                    item.signature = signature
+                    item.last_change = max(item.last_change, now)
+                
+                if now - item.last_change >= self.settle_time:
+                    ready.append(self.pending.pop(path))
+                    self.settled_count += 1
+                elif now - item.first_seen >= self.max_wait:
+                    logger.warning(f"拷贝超过{self.max_wait:.0f}秒仍未完成，强制记录: {path}")
+                    ready.append(self.pending.pop(path))
+                    self.forced_count += 1
+                else:
+                    item.next_check = now + self.poll_interval
+        
+        # 回调在锁外执行，避免阻塞track()
+        for item in ready:
+            try:
+                item.callback()
+            except Exception as e:
+                logger.error(f"处理拷入完成回调失败: {e}")
+        
+        return len(ready)
+    
+    def start(self):
+        """启动跟踪线程"""
+        self.running = True
+        super().start()
+    
+    def stop(self):
+        """停止跟踪线程（未完成的路径被丢弃）"""
+        with self._cond:
+            self.running = False
+            self._cond.notify()
+    
+    def run(self):
+        """跟踪线程主循环：没有待定路径时休眠，直到track()唤醒"""
+        while self.running:
+            with self._cond:
+                if not self.pending:
+                    self._cond.wait()
+                    continue
+                delay = min(item.next_check for item in self.pending.values()) - self.clock()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+            self.poll()
+    
+    def get_stats(self) -> Dict:
+        """跟踪器指标"""
+        return {
+            'pending': len(self.pending),
+            'settled': self.settled_count,
+            'forced': self.forced_count,
+            'vanished': self.vanished_count
+        }
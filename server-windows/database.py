@@ -4,37 +4,378 @@
 数据库管理
 """
 
+import base64
+import json
+import os
+import re
 import sqlite3
-from datetime import datetime
+import threading
+import time
+from contextlib import closing
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import Callable, List, Dict, Optional, Tuple
 import logging
 
 from config import config
+from snapshots import (
+    ENCODING as SNAPSHOT_ENCODING, encode_structure, decode_structure, iter_file_names, structure_names
+)
+from metrics import Histogram
+from partitions import ArchiveStore, add_months, current_month, month_of, month_range
 
 logger = logging.getLogger(__name__)
 
+# UPDATE ... RETURNING需要SQLite 3.35+
+RETURNING_SUPPORTED = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+INSERT_SECONDS = Histogram('usbmon_db_insert_seconds', '批量插入事件耗时（含快照编码）')
+INSERT_BATCH_SIZE = Histogram('usbmon_db_insert_batch_size', '每次插入的事件数',
+                              buckets=(1, 5, 10, 50, 100, 500, 1000, 5000))
+
+
+def encode_cursor(timestamp: str, event_id: int) -> str:
+    """(timestamp, id) -> 不透明分页游标"""
+    raw = json.dumps([timestamp, event_id], ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """分页游标 -> (timestamp, id)，格式错误时抛出ValueError"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, event_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return str(timestamp), int(event_id)
+    except Exception:
+        raise ValueError(f"无效的分页游标: {cursor}")
+
+
+# 单次分页读取的行数上限（流式导出按块读取，块大小同样不超过该值）
+MAX_PAGE_SIZE = 20000
+
+# 全文检索排序权重：文件名 > 路径 > 文件夹内的文件名
+FTS_WEIGHTS = (10.0, 3.0, 1.0)
+
+# trigram分词需要SQLite 3.34+，更早的版本退回按词分词（连续的中文和数字是一个词，只能整词/前缀匹配）
+TRIGRAM_SUPPORTED = sqlite3.sqlite_version_info >= (3, 34, 0)
+FALLBACK_TOKENIZER = 'unicode61 remove_diacritics 2'
+TRIGRAM_MIN_LENGTH = 3  # 三元组索引能够匹配的最短检索词
+
+
+def build_match_query(query: str, trigram: bool = False) -> Tuple[str, List[str]]:
+    """把用户输入的检索词转换为安全的FTS5 MATCH表达式，无有效检索词时抛出ValueError
+    
+    - 空格分隔的词之间为AND，大写OR表示或
+    - 双引号括起的内容按短语匹配
+    - trigram分词：每个词按子串匹配（合同 匹配 采购合同2024.docx，contract 匹配 subcontract），
+      词首、词尾的*可以省略；不足3个字符的词用不上三元组索引，不放进MATCH表达式，
+      而是返回给调用方做LIKE子串匹配（与其余词为AND，不能与OR组合）
+    - 按词分词：词尾的*表示前缀匹配（contr* 匹配 contract）；词首的*无法利用索引，忽略；
+      "..."*表示短语的最后一个词前缀匹配
+    
+    其余FTS5语法字符一律当作普通文本，不会产生语法错误。
+    返回 (MATCH表达式, LIKE子串匹配的短词)，只有短词时MATCH表达式为空字符串。
+    """
+    terms: List[Optional[Tuple[str, bool]]] = []  # None表示OR
+    for match in re.finditer(r'"([^"]*)"(\*?)|(\S+)', query or ''):
+        if match.group(3) is None:
+            text, prefix = match.group(1), bool(match.group(2))
+        elif match.group(3) == 'OR':
+            if terms and terms[-1] is not None:
+                terms.append(None)
+            continue
+        else:
+            word = match.group(3).replace('"', '').lstrip('*')
+            text, prefix = word.rstrip('*'), word.endswith('*')
+        text = text.strip()
+        if text:
+            terms.append((text, prefix))
+    if terms and terms[-1] is None:
+        terms.pop()
+    
+    parts: List[str] = []
+    short_terms: List[str] = []
+    for i, term in enumerate(terms):
+        if term is None:
+            parts.append('OR')
+            continue
+        text, prefix = term
+        if trigram and len(text) < TRIGRAM_MIN_LENGTH:
+            beside_or = (i > 0 and terms[i - 1] is None) or (i + 1 < len(terms) and terms[i + 1] is None)
+            if beside_or:
+                raise ValueError(f"与OR组合的检索词至少需要{TRIGRAM_MIN_LENGTH}个字符: {text}")
+            short_terms.append(text)
+            continue
+        parts.append('"' + text.replace('"', '""') + '"' + ('*' if prefix and not trigram else ''))
+    
+    if not parts and not short_terms:
+        raise ValueError(f"无有效检索词: {query}")
+    return ' '.join(parts), short_terms
+
+
+def like_pattern(text: str) -> str:
+    """子串 -> LIKE模式（转义%和_，配合ESCAPE '\\'）"""
+    return '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+# 事件列表返回的列：不含文件夹结构本体，只给出引用
+EVENT_LIST_COLUMNS = '''
+    id, timestamp, machine_name, ip_address, username, login_id,
+    drive_letter, file_name, file_path, action, file_size, is_folder,
+    snapshot_id, (folder_structure IS NOT NULL OR snapshot_id IS NOT NULL) AS has_folder_structure,
+    created_at
+'''
+
+
+# 删除事件时同步扣减汇总计数（归档时临时移除，汇总保留在主库）
+ROLLUP_DELETE_TRIGGER = '''
+    CREATE TRIGGER IF NOT EXISTS trg_events_rollup_delete AFTER DELETE ON events
+    BEGIN
+        UPDATE event_rollups SET count = count - 1
+        WHERE bucket = substr(OLD.timestamp, 1, 13)
+          AND action = COALESCE(OLD.action, '')
+          AND username = COALESCE(OLD.username, '');
+    END
+'''
+
+# 归档时按列名复制（旧数据库升级后列顺序与新建的不同）
+EVENT_COLUMNS = '''
+    id, timestamp, machine_name, ip_address, username, login_id,
+    drive_letter, file_name, file_path, action, file_size, is_folder,
+    folder_structure, snapshot_id, created_at
+'''
+SNAPSHOT_COLUMNS = 'id, digest, encoding, data, folder_count, file_count, total_size, raw_size, created_at'
+
 
 class DatabaseManager:
-    """数据库管理器"""
-    
-    def __init__(self):
-        db_name: str = config.get('database', 'usb_monitor.db')  # type: ignore
-        # 数据库文件放在database文件夹内
-        db_dir = Path(__file__).parent / 'database'
-        db_dir.mkdir(exist_ok=True)  # 确保文件夹存在
-        self.db_file = db_dir / db_name
-        self.init_database()
-    
-    def get_connection(self):
-        """获取数据库连接"""
-        conn = sqlite3.connect(self.db_file)
+    """数据库管理器
+    
+    长连接放在有上限的连接池中：get_connection()借出一条连接，release_connection()
+    归还；同一线程在归还前再次获取时返回同一条连接（可嵌套）。连接数不超过
+    db_pool_size，池满时等待其他线程归还。数据库使用WAL日志模式，读写互不阻塞。
+    """
+    
+    journal_mode = 'WAL'
+    
+    def __init__(self, db_file: Optional[Path] = None, lazy: bool = False):
+        """lazy=True时不立即建表，第一次获取连接时才初始化（导入本模块不产生磁盘I/O）"""
+        if db_file is None:
+            db_name: str = config.get('database', 'usb_monitor.db')  # type: ignore
+            # 数据库文件放在database文件夹内
+            db_file = Path(__file__).parent / 'database' / db_name
+        self.db_file = Path(db_file)
+        
+        # 连接参数（均可在config.json中调整）
+        self.busy_timeout_ms = int(config.get('db_busy_timeout_ms', 5000))  # type: ignore
+        self.synchronous = str(config.get('db_synchronous', 'NORMAL')).upper()
+        self.cache_size_kb = int(config.get('db_cache_size_kb', 16384))  # type: ignore
+        self.mmap_size = int(config.get('db_mmap_size', 268435456))  # type: ignore
+        self.fts_tokenizer = str(config.get('fts_tokenizer', 'trigram'))
+        if self.fts_tokenizer.split()[0] == 'trigram' and not TRIGRAM_SUPPORTED:
+            logger.warning(f"SQLite {sqlite3.sqlite_version} 不支持trigram分词，全文检索改用: {FALLBACK_TOKENIZER}")
+            self.fts_tokenizer = FALLBACK_TOKENIZER
+        self.fts_trigram = self.fts_tokenizer.split()[0] == 'trigram'
+        self.search_rank_window = int(config.get('search_rank_window', 5000))  # type: ignore
+        
+        # 按月归档（归档目录与数据库文件同级）
+        self.archives = ArchiveStore(self.db_file.parent / 'archive')
+        self.hot_months = int(config.get('hot_months', 0))  # type: ignore
+        self.retention_months = int(config.get('retention_months', 0))  # type: ignore
+        
+        # 连接池：空闲连接 + 已借出的连接（线程 -> 连接）
+        self.pool_size = max(1, int(config.get('db_pool_size', 8)))  # type: ignore
+        self._local = threading.local()
+        self._idle: List[sqlite3.Connection] = []
+        self._borrowed: Dict[threading.Thread, sqlite3.Connection] = {}
+        self._pool_cond = threading.Condition()
+        self._watch_conn: Optional[sqlite3.Connection] = None  # data_changed()专用
+        self._watch_lock = threading.Lock()
+        
+        # 数据版本号：每次修改对应的表就递增，供响应缓存判断是否失效（data_versions表在本进程的副本）
+        self._versions: Dict[str, int] = {'events': 0, 'users': 0}
+        self._version_lock = threading.Lock()
+        
+        self._initialized = False
+        self._initializing = False
+        self._init_lock = threading.RLock()
+        if not lazy:
+            self.ensure_initialized()
+    
+    def ensure_initialized(self):
+        """确保数据库已建表/升级；其他线程在初始化完成前等待"""
+        if self._initialized:
+            return
+        with self._init_lock:
+            # 初始化过程中本线程再次获取连接时直接返回
+            if self._initialized or self._initializing:
+                return
+            self._initializing = True
+            try:
+                start = time.perf_counter()
+                self.db_file.parent.mkdir(parents=True, exist_ok=True)  # 确保文件夹存在
+                self.init_database()
+                self._initialized = True
+                logger.debug(f"数据库已初始化: {self.db_file} ({(time.perf_counter() - start) * 1000:.0f}ms)")
+            finally:
+                self._initializing = False
+    
+    def get_connection(self) -> sqlite3.Connection:
+        """从连接池借出一条连接，用完须调用release_connection归还
+        
+        本线程已借出连接时返回同一条连接（嵌套计数），池满时最多等待busy_timeout。
+        """
+        if not self._initialized:
+            self.ensure_initialized()
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            self._local.depth += 1
+            return conn
+        
+        deadline = time.monotonic() + self.busy_timeout_ms / 1000.0
+        with self._pool_cond:
+            while True:
+                if self._idle:
+                    conn = self._idle.pop()
+                    break
+                if len(self._borrowed) < self.pool_size:
+                    conn = self._create_connection()
+                    break
+                if self._reclaim_connections():
+                    continue
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise sqlite3.OperationalError(f"数据库连接池已满 ({self.pool_size} 条连接均已借出)")
+                self._pool_cond.wait(remaining)
+            self._borrowed[threading.current_thread()] = conn
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+    
+    def release_connection(self, conn: sqlite3.Connection):
+        """归还连接；嵌套获取时最外层归还才放回连接池，未提交的事务回滚"""
+        if getattr(self._local, 'conn', None) is not conn:
+            return
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        self._local.conn = None
+        if conn.in_transaction:
+            conn.rollback()
+        with self._pool_cond:
+            self._borrowed.pop(threading.current_thread(), None)
+            self._idle.append(conn)
+            self._pool_cond.notify()
+    
+    def _create_connection(self) -> sqlite3.Connection:
+        """创建并调优一条新连接"""
+        # 同一时刻只借给一个线程，但归还后可能借给其他线程，因此关闭线程检查
+        conn = sqlite3.connect(
+            self.db_file,
+            timeout=self.busy_timeout_ms / 1000.0,
+            check_same_thread=False
+        )
         conn.row_factory = sqlite3.Row
+        conn.execute(f'PRAGMA busy_timeout = {self.busy_timeout_ms}')
+        conn.execute(f'PRAGMA synchronous = {self.synchronous}')
+        conn.execute(f'PRAGMA cache_size = {-self.cache_size_kb}')
+        conn.execute(f'PRAGMA mmap_size = {self.mmap_size}')
+        conn.execute('PRAGMA temp_store = MEMORY')
         return conn
     
+    def _reclaim_connections(self) -> bool:
+        """收回已退出线程未归还的连接（调用方持有_pool_cond），返回是否收回了连接"""
+        dead = [t for t in self._borrowed if not t.is_alive()]
+        for thread in dead:
+            conn = self._borrowed.pop(thread)
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.append(conn)
+            except sqlite3.Error as e:
+                logger.debug(f"收回数据库连接失败: {e}")
+        return bool(dead)
+    
+    def close_all(self):
+        """关闭连接池中的所有连接"""
+        with self._pool_cond:
+            for conn in self._idle + list(self._borrowed.values()):
+                try:
+                    conn.close()
+                except Exception as e:
+                    logger.debug(f"关闭数据库连接失败: {e}")
+            self._idle.clear()
+            self._borrowed.clear()
+            self._pool_cond.notify_all()
+        with self._watch_lock:
+            if self._watch_conn is not None:
+                self._watch_conn.close()
+                self._watch_conn = None
+        self._local = threading.local()
+    
+    def data_version(self, table: str) -> int:
+        """表的数据版本号（本进程最近一次读取或写入的值）"""
+        return self._versions.get(table, 0)
+    
+    def _bump_version(self, table: str, conn: Optional[sqlite3.Connection] = None):
+        """表数据已修改：递增data_versions表中的版本号
+        
+        版本号保存在数据库中，其他进程通过refresh_versions()得知数据已变化。
+        传入conn时在调用方的事务内递增，否则单独提交。
+        """
+        if conn is None:
+            conn = self.get_connection()
+            try:
+                with conn:
+                    self._bump_version(table, conn)
+            finally:
+                self.release_connection(conn)
+            return
+        if RETURNING_SUPPORTED:
+            version = conn.execute(
+                'UPDATE data_versions SET version = version + 1 WHERE name = ? RETURNING version', (table,)
+            ).fetchall()[0][0]  # 取完结果，语句结束后才能提交
+        else:
+            conn.execute('UPDATE data_versions SET version = version + 1 WHERE name = ?', (table,))
+            version = conn.execute('SELECT version FROM data_versions WHERE name = ?', (table,)).fetchone()[0]
+        with self._version_lock:
+            if version > self._versions.get(table, 0):
+                self._versions[table] = version
+    
+    def refresh_versions(self) -> Dict[str, int]:
+        """重新读取各表的数据版本号（其他进程写入后调用）"""
+        conn = self.get_connection()
+        
+        try:
+            rows = conn.execute('SELECT name, version FROM data_versions').fetchall()
+        finally:
+            self.release_connection(conn)
+        
+        with self._version_lock:
+            for name, version in rows:
+                if version > self._versions.get(name, 0):
+                    self._versions[name] = version
+            return dict(self._versions)
+    
+    def data_changed(self) -> bool:
+        """自上次调用以来，数据库（包括其他进程）是否提交过修改
+        
+        基于PRAGMA data_version，每个线程各自记录上次的值；第一次调用返回True。
+        data_version不反映同一条连接自己提交的修改，而池中的连接会被各线程用来写入，
+        因此使用一条不写入的专用连接。
+        """
+        with self._watch_lock:
+            if self._watch_conn is None:
+                self._watch_conn = self._create_connection()
+            version = self._watch_conn.execute('PRAGMA data_version').fetchone()[0]
+        
+        changed = getattr(self._local, 'data_version', None) != version
+        self._local.data_version = version
+        return changed
+    
     def init_database(self):
         """初始化数据库"""
         conn = self.get_connection()
+        conn.execute(f'PRAGMA journal_mode = {self.journal_mode}')
         cursor = conn.cursor()
         
         # 创建用户登录记录表
@@ -66,11 +407,32 @@ class DatabaseManager:
                 file_size INTEGER DEFAULT 0,
                 is_folder BOOLEAN DEFAULT 0,
                 folder_structure TEXT,
+                snapshot_id INTEGER,
                 created_at TEXT DEFAULT CURRENT_TIMESTAMP,
                 FOREIGN KEY (login_id) REFERENCES user_logins(id)
             )
         ''')
         
+        # 旧数据库升级：文件夹结构改为引用快照表
+        event_columns = {row[1] for row in cursor.execute('PRAGMA table_info(events)')}
+        if 'snapshot_id' not in event_columns:
+            cursor.execute('ALTER TABLE events ADD COLUMN snapshot_id INTEGER')
+        
+        # 创建文件夹结构快照表（列式压缩，按内容摘要去重）
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS folder_snapshots (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                digest TEXT UNIQUE NOT NULL,
+                encoding TEXT NOT NULL,
+                data BLOB NOT NULL,
+                folder_count INTEGER DEFAULT 0,
+                file_count INTEGER DEFAULT 0,
+                total_size INTEGER DEFAULT 0,
+                raw_size INTEGER DEFAULT 0,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
         # 创建用户表
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -82,60 +444,218 @@ class DatabaseManager:
         ''')
         
         # 创建索引
+        # 索引末尾隐含rowid(=id)，因此 (列, timestamp) 索引可直接按 (timestamp, id) 排序翻页
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events(timestamp)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_machine ON events(machine_name)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_action ON events(action)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_username ON events(username)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_machine_time ON events(machine_name, timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_action_time ON events(action, timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_username_time ON events(username, timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_drive_time ON events(drive_letter, timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_events_folder_time ON events(is_folder, timestamp)')
+        # 旧的单列索引已被上面的复合索引覆盖
+        cursor.execute('DROP INDEX IF EXISTS idx_events_machine')
+        cursor.execute('DROP INDEX IF EXISTS idx_events_action')
+        cursor.execute('DROP INDEX IF EXISTS idx_events_username')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_logins_username ON user_logins(username)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_logins_time ON user_logins(login_time)')
         
+        # 创建统计汇总表（按小时 × 类型 × 用户计数，由触发器增量维护）
+        rollups_exist = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'event_rollups'"
+        ).fetchone() is not None
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS event_rollups (
+                bucket TEXT NOT NULL,
+                action TEXT NOT NULL DEFAULT '',
+                username TEXT NOT NULL DEFAULT '',
+                count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (bucket, action, username)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_events_rollup_insert AFTER INSERT ON events
+            BEGIN
+                INSERT INTO event_rollups (bucket, action, username, count)
+                VALUES (substr(NEW.timestamp, 1, 13), COALESCE(NEW.action, ''), COALESCE(NEW.username, ''), 1)
+                ON CONFLICT (bucket, action, username) DO UPDATE SET count = count + 1;
+            END
+        ''')
+        cursor.execute(ROLLUP_DELETE_TRIGGER)
+        
+        # 归档清单：每个已归档月份一行，按ID定位归档中的事件
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS event_archives (
+                month TEXT PRIMARY KEY,
+                event_count INTEGER NOT NULL DEFAULT 0,
+                min_id INTEGER,
+                max_id INTEGER,
+                file_size INTEGER DEFAULT 0,
+                archived_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # 数据版本号：每次修改对应的表就递增，多个进程共用数据库时据此判断缓存是否失效
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS data_versions (
+                name TEXT PRIMARY KEY,
+                version INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        cursor.executemany(
+            'INSERT OR IGNORE INTO data_versions (name, version) VALUES (?, 0)',
+            [(name,) for name in self._versions]
+        )
+        
+        # 服务状态：独立运行的监控进程定期写入心跳和运行指标
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS service_status (
+                name TEXT PRIMARY KEY,
+                pid INTEGER,
+                started_at TEXT,
+                heartbeat_at REAL,
+                stats TEXT
+            )
+        ''')
+        
+        # 创建全文索引（文件名、路径、文件夹内的文件名；rowid即事件ID）
+        fts_sql = cursor.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'events_fts'"
+        ).fetchone()
+        fts_exists = fts_sql is not None
+        # 分词配置变了（例如旧数据库按词分词，现在默认trigram）：按新分词器重建
+        fts_stale = fts_exists and self._fts_tokenize_clause() not in fts_sql[0]
+        self._create_fts(cursor)
+        
         conn.commit()
-        conn.close()
+        
+        # 旧数据库首次升级：回填汇总表和全文索引
+        if not rollups_exist:
+            self._rebuild_rollups(conn)
+        if not fts_exists:
+            self._rebuild_fts(conn)
+        elif fts_stale:
+            logger.info(f"全文索引分词器已改为 {self.fts_tokenizer}，重建索引")
+            self._rebuild_fts(conn, recreate=True)
+        
+        self.release_connection(conn)
+        self.refresh_versions()
         
         logger.info("数据库初始化完成")
     
+    def _create_fts(self, cursor: sqlite3.Cursor):
+        """创建全文索引表及删除触发器
+        
+        文件夹内的文件名要从快照解码，无法在触发器里完成，因此插入由insert_events
+        在同一事务内写入；删除事件时由触发器同步删除索引。
+        """
+        # 前缀索引只对按词分词有用，trigram本身就能匹配任意位置的子串
+        options = '' if self.fts_trigram else ",\n                prefix = '2 3'"
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
+                name, path, contents,
+                {self._fts_tokenize_clause()}{options}
+            )
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_events_fts_delete AFTER DELETE ON events
+            BEGIN
+                DELETE FROM events_fts WHERE rowid = OLD.id;
+            END
+        ''')
+    
+    def _fts_tokenize_clause(self) -> str:
+        tokenizer = self.fts_tokenizer.replace("'", "''")
+        return f"tokenize = '{tokenizer}'"
+    
     def insert_login(self, username: str, drive_letter: str) -> int:
         """插入用户登录记录"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         import os
-        cursor.execute('''
-            INSERT INTO user_logins (
-                username, login_time, drive_letter, machine_name, ip_address
-            ) VALUES (?, ?, ?, ?, ?)
-        ''', (
-            username,
-            datetime.now().isoformat(),
-            drive_letter,
-            os.environ.get('COMPUTERNAME', 'Unknown'),
-            '127.0.0.1'
-        ))
-        
-        login_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        try:
+            with conn:
+                cursor = conn.execute('''
+                    INSERT INTO user_logins (
+                        username, login_time, drive_letter, machine_name, ip_address
+                    ) VALUES (?, ?, ?, ?, ?)
+                ''', (
+                    username,
+                    datetime.now().isoformat(),
+                    drive_letter,
+                    os.environ.get('COMPUTERNAME', 'Unknown'),
+                    '127.0.0.1'
+                ))
+            login_id = cursor.lastrowid
+        finally:
+            self.release_connection(conn)
         
         return int(login_id) if login_id is not None else 0
     
     def insert_event(self, event_data: Dict):
         """插入事件"""
+        self.insert_events([event_data])
+    
+    def insert_events(self, events: List[Dict]) -> List[int]:
+        """批量插入事件（单个事务），返回新事件的ID列表
+        
+        事件中的folder_structure不写入events表，而是编码后存入folder_snapshots，
+        事件只保存snapshot_id引用；提交后把snapshot_id写回各事件字典，
+        推送给订阅者的事件与查询出的行一致。
+        """
+        if not events:
+            return []
+        
+        start = time.perf_counter()
+        # 编码在事务外完成，缩短写锁持有时间
+        snapshots = [
+            encode_structure(event_data['folder_structure']) if event_data.get('folder_structure') else None
+            for event_data in events
+        ]
+        contents = [
+            '\n'.join(structure_names(event_data['folder_structure'])) if event_data.get('folder_structure') else None
+            for event_data in events
+        ]
         conn = self.get_connection()
-        cursor = conn.cursor()
         
-        # 如果有文件夹结构，序列化为JSON
-        folder_structure = event_data.get('folder_structure')
-        if folder_structure:
-            import json
-            folder_structure = json.dumps(folder_structure, ensure_ascii=False)
+        try:
+            with conn:
+                rows = [
+                    self._event_row(event_data, self._store_snapshot(conn, snapshot))
+                    for event_data, snapshot in zip(events, snapshots)
+                ]
+                conn.executemany('''
+                    INSERT INTO events (
+                        timestamp, machine_name, ip_address, username, login_id,
+                        drive_letter, file_name, file_path, action,
+                        file_size, is_folder, snapshot_id
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', rows)
+                # 同一事务内写入，ID连续分配
+                last_id = conn.execute('SELECT last_insert_rowid()').fetchone()[0]
+                ids = range(last_id - len(rows) + 1, last_id + 1)
+                
+                # 全文索引与事件在同一事务内写入
+                fts_rows = []
+                for event_id, row, text in zip(ids, rows, contents):
+                    if text is None and row[11] is not None:
+                        # 只带snapshot_id、未附文件夹结构的事件，从已保存的快照取文件名
+                        text = self._snapshot_contents(conn, row[11])
+                    fts_rows.append((event_id, row[6], row[7], text))
+                conn.executemany(
+                    'INSERT INTO events_fts (rowid, name, path, contents) VALUES (?, ?, ?, ?)', fts_rows
+                )
+                self._bump_version('events', conn)
+        finally:
+            self.release_connection(conn)
         
-        cursor.execute('''
-            INSERT INTO events (
-                timestamp, machine_name, ip_address, username, login_id,
-                drive_letter, file_name, file_path, action,
-                file_size, is_folder, folder_structure
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
+        for event_data, row in zip(events, rows):
+            event_data['snapshot_id'] = row[11]
+        INSERT_SECONDS.observe(time.perf_counter() - start)
+        INSERT_BATCH_SIZE.observe(len(rows))
+        return list(ids)
+    
+    def _event_row(self, event_data: Dict, snapshot_id: Optional[int]) -> tuple:
+        """事件字典 -> 插入参数"""
+        return (
             event_data.get('timestamp'),
             event_data.get('machine_name'),
             event_data.get('ip_address'),
@@ -147,59 +667,415 @@ class DatabaseManager:
             event_data.get('action'),
             event_data.get('file_size', 0),
             event_data.get('is_folder', False),
-            folder_structure
+            snapshot_id if snapshot_id is not None else event_data.get('snapshot_id')
+        )
+    
+    def _store_snapshot(self, conn: sqlite3.Connection, snapshot: Optional[tuple]) -> Optional[int]:
+        """保存编码后的快照（已存在则复用），返回快照ID"""
+        if snapshot is None:
+            return None
+        
+        digest, data, info = snapshot
+        conn.execute('''
+            INSERT OR IGNORE INTO folder_snapshots (
+                digest, encoding, data, folder_count, file_count, total_size, raw_size
+            ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            digest, SNAPSHOT_ENCODING, data,
+            info['folder_count'], info['file_count'], info['total_size'], info['raw_size']
         ))
+        return conn.execute('SELECT id FROM folder_snapshots WHERE digest = ?', (digest,)).fetchone()[0]
+    
+    def _snapshot_contents(self, conn: sqlite3.Connection, snapshot_id: int) -> Optional[str]:
+        """已保存快照中的目录和文件名（换行分隔），用于全文索引"""
+        row = conn.execute('SELECT encoding, data FROM folder_snapshots WHERE id = ?', (snapshot_id,)).fetchone()
+        if not row:
+            return None
+        return '\n'.join(iter_file_names(row['data'], row['encoding']))
+    
+    def get_snapshot(self, snapshot_id: int) -> Optional[Dict]:
+        """获取文件夹结构快照（解码后）"""
+        conn = self.get_connection()
         
-        conn.commit()
-        conn.close()
+        try:
+            row = conn.execute('SELECT * FROM folder_snapshots WHERE id = ?', (snapshot_id,)).fetchone()
+        finally:
+            self.release_connection(conn)
+        
+        if not row:
+            return None
+        
+        snapshot = dict(row)
+        snapshot['structure'] = decode_structure(snapshot.pop('data'), snapshot['encoding'])
+        return snapshot
+    
+    def get_event_folder_structure(self, event_id: int) -> Optional[List[Dict]]:
+        """获取事件的文件夹结构（快照引用或旧版内联JSON）"""
+        conn = self.get_connection()
+        
+        sql = '''
+            SELECT e.folder_structure, s.encoding, s.data
+            FROM events e LEFT JOIN folder_snapshots s ON s.id = e.snapshot_id
+            WHERE e.id = ?
+        '''
+        try:
+            row = conn.execute(sql, (event_id,)).fetchone()
+            months = [] if row else [r[0] for r in conn.execute(
+                'SELECT month FROM event_archives WHERE min_id <= ? AND max_id >= ?', (event_id, event_id)
+            )]
+        finally:
+            self.release_connection(conn)
+        
+        # 主库没有时到ID范围覆盖该事件的归档中查找
+        for month in months:
+            try:
+                with closing(self.archives.connect(month)) as archive:
+                    row = archive.execute(sql, (event_id,)).fetchone()
+            except (OSError, sqlite3.Error) as e:
+                logger.warning(f"读取归档 {month} 失败: {e}")
+            if row:
+                break
+        
+        if not row:
+            return None
+        if row['data'] is not None:
+            return decode_structure(row['data'], row['encoding'])
+        if row['folder_structure']:
+            return json.loads(row['folder_structure'])
+        return []
+    
+    def migrate_inline_structures(self, chunk_size: int = 500) -> int:
+        """把旧版内联在events.folder_structure中的JSON迁移到快照表，返回迁移条数"""
+        migrated = 0
+        conn = self.get_connection()
+        
+        try:
+            while True:
+                rows = conn.execute('''
+                    SELECT id, folder_structure FROM events
+                    WHERE folder_structure IS NOT NULL
+                    LIMIT ?
+                ''', (chunk_size,)).fetchall()
+                if not rows:
+                    break
+                
+                snapshots = []
+                contents = []
+                for row in rows:
+                    try:
+                        structure = json.loads(row['folder_structure'])
+                        snapshots.append(encode_structure(structure))
+                        contents.append('\n'.join(structure_names(structure)))
+                    except ValueError:
+                        logger.warning(f"事件 {row['id']} 的文件夹结构无法解析，已清空")
+                        snapshots.append(None)
+                        contents.append(None)
+                
+                with conn:
+                    for row, snapshot, text in zip(rows, snapshots, contents):
+                        conn.execute(
+                            'UPDATE events SET snapshot_id = ?, folder_structure = NULL WHERE id = ?',
+                            (self._store_snapshot(conn, snapshot), row['id'])
+                        )
+                        conn.execute('UPDATE events_fts SET contents = ? WHERE rowid = ?', (text, row['id']))
+                migrated += len(rows)
+        finally:
+            self.release_connection(conn)
+        
+        logger.info(f"文件夹结构迁移完成: {migrated} 条")
+        return migrated
     
     def get_events(self, limit: int = 100, machine_name: Optional[str] = None) -> List[Dict]:
         """获取事件列表"""
+        return self.get_events_page(limit, machine_name=machine_name)['events']
+    
+    def get_events_page(self, limit: int = 100, after: Optional[str] = None,
+                        machine_name: Optional[str] = None,
+                        username: Optional[str] = None,
+                        drive_letter: Optional[str] = None,
+                        action: Optional[str] = None,
+                        start_time: Optional[str] = None,
+                        end_time: Optional[str] = None,
+                        is_folder: Optional[bool] = None) -> Dict:
+        """按 (timestamp, id) 倒序分页获取事件
+        
+        after为上一页返回的next_cursor；action以*结尾时按前缀匹配；
+        时间范围为 [start_time, end_time)。每个过滤条件都有 (列, timestamp)
+        复合索引支撑，翻页代价与页码无关。
+        
+        主库的结果不足一页时，按月份从新到旧继续查询与时间范围重叠的归档，
+        凑满一页即停止，近期数据的查询不会打开任何归档。
+        limit限制在 [1, MAX_PAGE_SIZE] 之间。
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        where, params = self._event_filters(
+            machine_name, username, drive_letter, action, start_time, end_time, is_folder
+        )
+        after_timestamp = None
+        if after:
+            after_timestamp, after_id = decode_cursor(after)
+            where.append('(timestamp, id) < (?, ?)')
+            params.extend([after_timestamp, after_id])
+        
+        sql = f'SELECT {EVENT_LIST_COLUMNS} FROM events'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY timestamp DESC, id DESC LIMIT ?'
+        params.append(limit + 1)
+        
         conn = self.get_connection()
-        cursor = conn.cursor()
         
-        if machine_name:
-            cursor.execute('''
-                SELECT * FROM events 
-                WHERE machine_name = ?
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            ''', (machine_name, limit))
+        try:
+            rows = conn.execute(sql, params).fetchall()
+            archives = conn.execute('SELECT month, min_id, max_id FROM event_archives ORDER BY month DESC').fetchall()
+        finally:
+            self.release_connection(conn)
+        
+        for archive in archives:
+            month_start, month_end = month_range(archive['month'])
+            if ((start_time and month_end <= start_time) or (end_time and month_start >= end_time)
+                    or (after_timestamp and month_start > after_timestamp)):
+                continue
+            if len(rows) > limit and rows[limit]['timestamp'] >= month_end:
+                # 已凑满一页，且都比该月（及更早月份）的事件新
+                break
+            rows = self._merge_archive_rows(
+                rows, archive['month'], sql, params, limit, lambda r: (r['timestamp'], r['id'])
+            )
+        
+        events = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit and events:
+            next_cursor = encode_cursor(events[-1]['timestamp'], events[-1]['id'])
+        
+        return {
+            'events': events,
+            'next_cursor': next_cursor
+        }
+    
+    def _merge_archive_rows(self, rows: List, month: str, sql: str, params: List,
+                            limit: int, key: Callable) -> List:
+        """在归档中执行同一查询，与已有结果按key倒序合并，保留前limit+1行
+        
+        归档过程中事件已复制到归档、尚未从主库删除时两边都能查到，按ID去重（保留先查到的）。
+        """
+        try:
+            with closing(self.archives.connect(month)) as conn:
+                archived = conn.execute(sql, params).fetchall()
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"读取归档 {month} 失败，已跳过: {e}")
+            return rows
+        
+        seen = {row['id'] for row in rows}
+        merged = list(rows) + [row for row in archived if row['id'] not in seen]
+        merged.sort(key=key, reverse=True)
+        return merged[:limit + 1]
+    
+    def search_events(self, query: str, limit: int = 50, after: Optional[str] = None,
+                      sort: str = 'rank',
+                      machine_name: Optional[str] = None,
+                      username: Optional[str] = None,
+                      drive_letter: Optional[str] = None,
+                      action: Optional[str] = None,
+                      start_time: Optional[str] = None,
+                      end_time: Optional[str] = None,
+                      is_folder: Optional[bool] = None) -> Dict:
+        """全文检索文件名、路径和文件夹内的文件名（检索语法见build_match_query）
+        
+        sort='rank'按bm25相关度排序，只在最新的search_rank_window条命中（含过滤条件）
+        中排序，游标为 (得分, id)；新事件写入会使得分略有变化，翻页期间可能出现个别
+        重复或遗漏，且只检索主库。sort='recent'按事件ID倒序，直接沿索引的rowid顺序
+        读取，命中数百万条的宽泛检索词也只读取一页，主库不足一页时继续检索归档，
+        需要完整遍历全部命中时使用。
+        """
+        if sort not in ('rank', 'recent'):
+            raise ValueError(f"无效的排序方式: {sort}")
+        match, short_terms = build_match_query(query, self.fts_trigram)
+        after_id = None
+        where, params = self._event_filters(
+            machine_name, username, drive_letter, action, start_time, end_time, is_folder
+        )
+        
+        if match:
+            where.insert(0, 'events_fts MATCH ?')
+            params.insert(0, match)
+        # 不足3个字符的词：逐行LIKE子串匹配（只有短词时需要扫描整个索引表）
+        for text in short_terms:
+            where.append("(events_fts.name LIKE ? ESCAPE '\\' OR events_fts.path LIKE ? ESCAPE '\\'"
+                         " OR events_fts.contents LIKE ? ESCAPE '\\')")
+            params.extend([like_pattern(text)] * 3)
+        
+        if sort == 'rank':
+            # 只对最新的search_rank_window条命中计算bm25（每条约数微秒），再取当前页的事件列
+            # 没有MATCH表达式时无法计算bm25，所有命中得分相同，按ID排序
+            weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+            score = f'bm25(events_fts, {weights})' if match else '0.0'
+            sql = f'''
+                SELECT {EVENT_LIST_COLUMNS}, m.score FROM (
+                    SELECT events_fts.rowid AS match_id, {score} AS score
+                    FROM events_fts JOIN events ON events.id = events_fts.rowid
+                    WHERE {' AND '.join(where)}
+                    ORDER BY events_fts.rowid DESC LIMIT ?
+                ) AS m JOIN events ON events.id = m.match_id
+            '''
+            params.append(self.search_rank_window or -1)
+            if after:
+                after_key, after_id = decode_cursor(after)
+                try:
+                    after_score = float(after_key)
+                except ValueError:
+                    raise ValueError(f"无效的分页游标: {after}")
+                sql += ' WHERE (m.score, events.id) > (?, ?)'
+                params.extend([after_score, after_id])
+            sql += ' ORDER BY m.score, events.id LIMIT ?'
         else:
-            cursor.execute('''
-                SELECT * FROM events 
-                ORDER BY timestamp DESC 
-                LIMIT ?
-            ''', (limit,))
+            if after:
+                after_id = decode_cursor(after)[1]
+                where.append('events_fts.rowid < ?')
+                params.append(after_id)
+            sql = f'''
+                SELECT {EVENT_LIST_COLUMNS} FROM events_fts
+                JOIN events ON events.id = events_fts.rowid
+                WHERE {' AND '.join(where)}
+                ORDER BY events_fts.rowid DESC LIMIT ?
+            '''
+        params.append(limit + 1)
+        
+        conn = self.get_connection()
+        
+        try:
+            rows = conn.execute(sql, params).fetchall()
+            archives = conn.execute('SELECT month, min_id, max_id FROM event_archives ORDER BY max_id DESC').fetchall()
+        except sqlite3.OperationalError as e:
+            # 检索词已转义，这里只会是分词后为空等极端情况
+            raise ValueError(f"检索词无效: {e}")
+        finally:
+            self.release_connection(conn)
+        
+        if sort == 'recent':
+            # 按ID倒序时依次合并归档；各月得分不可比，相关度排序只检索主库
+            for archive in archives:
+                if after_id is not None and archive['min_id'] >= after_id:
+                    continue
+                if len(rows) > limit and rows[limit]['id'] > archive['max_id']:
+                    break
+                rows = self._merge_archive_rows(rows, archive['month'], sql, params, limit, lambda r: r['id'])
+        
+        events = [dict(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit and events:
+            last = events[-1]
+            key = repr(last['score']) if sort == 'rank' else last['timestamp']
+            next_cursor = encode_cursor(key, last['id'])
+        
+        return {
+            'query': match,
+            'like_terms': short_terms,
+            'events': events,
+            'next_cursor': next_cursor
+        }
+    
+    def get_events_since(self, after_id: int, limit: int = 1000,
+                         machine_name: Optional[str] = None,
+                         username: Optional[str] = None,
+                         drive_letter: Optional[str] = None,
+                         action: Optional[str] = None,
+                         is_folder: Optional[bool] = None) -> List[Dict]:
+        """按ID正序获取after_id之后写入的事件（实时推送断线续传）"""
+        where, params = self._event_filters(
+            machine_name, username, drive_letter, action, None, None, is_folder
+        )
+        where.append('id > ?')
+        params.extend([after_id, limit])
+        
+        conn = self.get_connection()
         
-        rows = cursor.fetchall()
-        conn.close()
+        try:
+            rows = conn.execute(f'''
+                SELECT {EVENT_LIST_COLUMNS} FROM events
+                WHERE {' AND '.join(where)}
+                ORDER BY id LIMIT ?
+            ''', params).fetchall()
+        finally:
+            self.release_connection(conn)
         
         return [dict(row) for row in rows]
     
-    def get_statistics(self) -> Dict:
-        """获取统计信息"""
+    def max_event_id(self) -> int:
+        """当前最大的事件ID（没有事件时为0）"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
-        # 总事件数
-        cursor.execute('SELECT COUNT(*) FROM events')
-        total_events = cursor.fetchone()[0]
+        try:
+            return conn.execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+        finally:
+            self.release_connection(conn)
+    
+    def _event_filters(self, machine_name: Optional[str] = None,
+                       username: Optional[str] = None,
+                       drive_letter: Optional[str] = None,
+                       action: Optional[str] = None,
+                       start_time: Optional[str] = None,
+                       end_time: Optional[str] = None,
+                       is_folder: Optional[bool] = None) -> Tuple[List[str], List]:
+        """事件过滤条件 -> (WHERE子句列表, 参数列表)"""
+        where: List[str] = []
+        params: List = []
         
-        # 今日事件数
-        today = datetime.now().date().isoformat()
-        cursor.execute('SELECT COUNT(*) FROM events WHERE DATE(timestamp) = ?', (today,))
-        today_events = cursor.fetchone()[0]
+        if machine_name:
+            where.append('machine_name = ?')
+            params.append(machine_name)
+        if username:
+            where.append('username = ?')
+            params.append(username)
+        if drive_letter:
+            where.append('drive_letter = ?')
+            params.append(drive_letter.rstrip(':\\').upper())
+        if action:
+            if action.endswith('*'):
+                # 前缀匹配改写为范围查询，才能走索引
+                prefix = action[:-1]
+                where.append('action >= ? AND action < ?')
+                params.extend([prefix, prefix + '\U0010ffff'])
+            else:
+                where.append('action = ?')
+                params.append(action)
+        if start_time:
+            where.append('timestamp >= ?')
+            params.append(start_time)
+        if end_time:
+            where.append('timestamp < ?')
+            params.append(end_time)
+        if is_folder is not None:
+            where.append('is_folder = ?')
+            params.append(1 if is_folder else 0)
         
-        # 各类型事件统计
-        cursor.execute('''
-            SELECT action, COUNT(*) as count 
-            FROM events 
-            GROUP BY action
-        ''')
-        action_stats = {row[0]: row[1] for row in cursor.fetchall()}
+        return where, params
+    
+    def get_statistics(self) -> Dict:
+        """获取统计信息（读取汇总表，代价与事件总数无关）"""
+        conn = self.get_connection()
         
-        conn.close()
+        try:
+            # 总事件数
+            total_events = conn.execute('SELECT COALESCE(SUM(count), 0) FROM event_rollups').fetchone()[0]
+            
+            # 今日事件数（bucket以日期开头，按前缀范围查询可走主键）
+            today = datetime.now().date()
+            today_events = conn.execute(
+                'SELECT COALESCE(SUM(count), 0) FROM event_rollups WHERE bucket >= ? AND bucket < ?',
+                (today.isoformat(), (today + timedelta(days=1)).isoformat())
+            ).fetchone()[0]
+            
+            # 各类型事件统计
+            cursor = conn.execute('''
+                SELECT action, SUM(count) as count 
+                FROM event_rollups 
+                GROUP BY action
+                HAVING SUM(count) > 0
+            ''')
+            action_stats = {row[0]: row[1] for row in cursor.fetchall()}
+        finally:
+            self.release_connection(conn)
         
         return {
             'total_events': total_events,
@@ -207,41 +1083,404 @@ class DatabaseManager:
             'action_stats': action_stats
         }
     
+    def get_stats_timeline(self, granularity: str = 'day',
+                           start_time: Optional[str] = None,
+                           end_time: Optional[str] = None,
+                           username: Optional[str] = None,
+                           action: Optional[str] = None) -> List[Dict]:
+        """按天/小时汇总事件数，可按用户、类型过滤；时间范围为 [start_time, end_time)"""
+        width = 10 if granularity == 'day' else 13
+        where: List[str] = []
+        params: List = []
+        if start_time:
+            where.append('bucket >= ?')
+            params.append(start_time[:width])
+        if end_time:
+            where.append('bucket < ?')
+            params.append(end_time[:width])
+        if username:
+            where.append('username = ?')
+            params.append(username)
+        if action:
+            where.append('action = ?')
+            params.append(action)
+        
+        sql = f'SELECT substr(bucket, 1, {width}) AS period, SUM(count) AS count FROM event_rollups'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' GROUP BY period HAVING SUM(count) > 0 ORDER BY period'
+        
+        conn = self.get_connection()
+        
+        try:
+            rows = conn.execute(sql, params).fetchall()
+        finally:
+            self.release_connection(conn)
+        
+        return [dict(row) for row in rows]
+    
+    def rebuild_rollups(self) -> int:
+        """从events表重建统计汇总表（已归档月份保留原有汇总），返回汇总行数"""
+        conn = self.get_connection()
+        
+        try:
+            return self._rebuild_rollups(conn)
+        finally:
+            self.release_connection(conn)
+    
+    def _rebuild_rollups(self, conn: sqlite3.Connection) -> int:
+        """在一个事务内清空并回填汇总表
+        
+        已归档月份的事件不在主库，这些月份的汇总行原样保留，只重建其余月份。
+        """
+        with conn:
+            conn.execute('''
+                DELETE FROM event_rollups
+                WHERE substr(bucket, 1, 7) NOT IN (SELECT month FROM event_archives)
+            ''')
+            conn.execute('''
+                INSERT INTO event_rollups (bucket, action, username, count)
+                SELECT substr(timestamp, 1, 13), COALESCE(action, ''), COALESCE(username, ''), COUNT(*)
+                FROM events
+                WHERE substr(timestamp, 1, 7) NOT IN (SELECT month FROM event_archives)
+                GROUP BY 1, 2, 3
+            ''')
+            rows = conn.execute('SELECT COUNT(*) FROM event_rollups').fetchone()[0]
+        self._bump_version('events')
+        logger.info(f"统计汇总表已重建: {rows} 行")
+        return rows
+    
+    def rebuild_fts(self, chunk_size: int = 5000) -> int:
+        """按当前分词配置重建全文索引，返回索引的事件数"""
+        conn = self.get_connection()
+        
+        try:
+            return self._rebuild_fts(conn, chunk_size, recreate=True)
+        finally:
+            self.release_connection(conn)
+    
+    def _rebuild_fts(self, conn: sqlite3.Connection, chunk_size: int = 5000, recreate: bool = False) -> int:
+        """清空并按ID分批回填全文索引，每批一个事务，不长时间阻塞写入"""
+        with conn:
+            if recreate:
+                # 分词器只能在建表时指定，修改fts_tokenizer后需要重建表
+                conn.execute('DROP TABLE IF EXISTS events_fts')
+                self._create_fts(conn.cursor())
+            else:
+                conn.execute('DELETE FROM events_fts')
+        
+        indexed = 0
+        last_id = 0
+        names_cache: Dict[int, Optional[str]] = {}  # 快照去重后被大量事件共用，解码结果按快照缓存
+        while True:
+            rows = conn.execute('''
+                SELECT e.id, e.file_name, e.file_path, e.snapshot_id, e.folder_structure, s.encoding, s.data
+                FROM events e LEFT JOIN folder_snapshots s ON s.id = e.snapshot_id
+                WHERE e.id > ?
+                ORDER BY e.id LIMIT ?
+            ''', (last_id, chunk_size)).fetchall()
+            if not rows:
+                break
+            
+            fts_rows = []
+            for row in rows:
+                text = None
+                if row['data'] is not None:
+                    if row['snapshot_id'] not in names_cache:
+                        if len(names_cache) >= 1000:
+                            names_cache.clear()
+                        names_cache[row['snapshot_id']] = '\n'.join(iter_file_names(row['data'], row['encoding']))
+                    text = names_cache[row['snapshot_id']]
+                elif row['folder_structure']:
+                    try:
+                        text = '\n'.join(structure_names(json.loads(row['folder_structure'])))
+                    except ValueError:
+                        pass
+                fts_rows.append((row['id'], row['file_name'], row['file_path'], text))
+            
+            # 重建期间服务可能仍在写入，已被insert_events索引的事件直接覆盖
+            with conn:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO events_fts (rowid, name, path, contents) VALUES (?, ?, ?, ?)',
+                    fts_rows
+                )
+            indexed += len(rows)
+            last_id = rows[-1]['id']
+        
+        with conn:
+            conn.execute("INSERT INTO events_fts (events_fts) VALUES ('optimize')")
+        logger.info(f"全文索引已重建: {indexed} 条事件")
+        return indexed
+    
+    def archive_cold_months(self, hot_months: Optional[int] = None) -> List[str]:
+        """把最近hot_months个月之前的事件逐月归档，返回归档的月份"""
+        hot_months = self.hot_months if hot_months is None else hot_months
+        if hot_months <= 0:
+            return []
+        
+        cutoff = add_months(current_month(), -hot_months)
+        archived: List[str] = []
+        while True:
+            conn = self.get_connection()
+            try:
+                oldest = conn.execute('SELECT MIN(timestamp) FROM events').fetchone()[0]
+            finally:
+                self.release_connection(conn)
+            
+            month = month_of(oldest or '')
+            if not oldest or month >= cutoff:
+                break
+            if not re.fullmatch(r'\d{4}-\d{2}', month):
+                logger.warning(f"事件时间格式无法识别，停止归档: {oldest}")
+                break
+            self.archive_month(month)
+            archived.append(month)
+        return archived
+    
+    def archive_month(self, month: str, chunk_size: int = 10000) -> int:
+        """把一个月的事件移入归档文件（已有归档时合并），返回该归档的事件总数
+        
+        先写好并压缩归档文件，再分批从主库删除，中途失败重新执行即可。
+        删除时临时移除汇总触发器，统计汇总保留在主库。
+        """
+        if month >= current_month():
+            raise ValueError(f"不能归档当前月份: {month}")
+        start, end = month_range(month)
+        self.archives.directory.mkdir(parents=True, exist_ok=True)
+        building = self.archives.directory / f"events_{month.replace('-', '_')}.db.building"
+        if building.exists():
+            building.unlink()
+        if self.archives.exists(month):
+            self.archives.extract(month, building)
+        # 归档文件与主库表结构相同（含全文索引），查询语句可以直接复用
+        DatabaseManager(building).close_all()
+        
+        conn = self.get_connection()
+        
+        try:
+            conn.execute('ATTACH DATABASE ? AS archive', (str(building),))
+            try:
+                with conn:
+                    copied_max_id = conn.execute(
+                        'SELECT MAX(id) FROM main.events WHERE timestamp >= ? AND timestamp < ?', (start, end)
+                    ).fetchone()[0] or 0
+                    conn.execute(f'''
+                        INSERT OR IGNORE INTO archive.folder_snapshots ({SNAPSHOT_COLUMNS})
+                        SELECT {SNAPSHOT_COLUMNS} FROM main.folder_snapshots
+                        WHERE id IN (
+                            SELECT snapshot_id FROM main.events
+                            WHERE timestamp >= ? AND timestamp < ? AND id <= ?
+                        )
+                    ''', (start, end, copied_max_id))
+                    conn.execute(f'''
+                        INSERT OR IGNORE INTO archive.events ({EVENT_COLUMNS})
+                        SELECT {EVENT_COLUMNS} FROM main.events
+                        WHERE timestamp >= ? AND timestamp < ? AND id <= ?
+                    ''', (start, end, copied_max_id))
+                    # 合并进已有归档时，同一摘要的快照可能已以另一个ID存在（上面被忽略）：
+                    # 按摘要把新复制事件的snapshot_id改为归档中的ID
+                    conn.execute('''
+                        UPDATE archive.events SET snapshot_id = (
+                            SELECT a.id FROM archive.folder_snapshots a
+                            JOIN main.folder_snapshots m ON m.digest = a.digest
+                            WHERE m.id = archive.events.snapshot_id
+                        )
+                        WHERE id IN (
+                            SELECT id FROM main.events
+                            WHERE timestamp >= ? AND timestamp < ? AND id <= ? AND snapshot_id IS NOT NULL
+                        )
+                        AND snapshot_id IN (SELECT id FROM main.folder_snapshots)
+                    ''', (start, end, copied_max_id))
+                    conn.execute('''
+                        INSERT OR REPLACE INTO archive.events_fts (rowid, name, path, contents)
+                        SELECT f.rowid, f.name, f.path, f.contents
+                        FROM main.events e JOIN main.events_fts f ON f.rowid = e.id
+                        WHERE e.timestamp >= ? AND e.timestamp < ? AND e.id <= ?
+                    ''', (start, end, copied_max_id))
+                    count, min_id, max_id = conn.execute(
+                        'SELECT COUNT(*), MIN(id), MAX(id) FROM archive.events'
+                    ).fetchone()
+                    # 主库中随归档移出的快照（按主库ID）
+                    snapshot_ids = [row[0] for row in conn.execute('''
+                        SELECT DISTINCT snapshot_id FROM main.events
+                        WHERE timestamp >= ? AND timestamp < ? AND id <= ? AND snapshot_id IS NOT NULL
+                    ''', (start, end, copied_max_id))]
+            finally:
+                conn.execute('DETACH DATABASE archive')
+        finally:
+            self.release_connection(conn)
+        
+        # 归档文件改回普通日志模式并压实，只读打开时不需要-wal/-shm文件
+        with closing(sqlite3.connect(building)) as archive_conn:
+            archive_conn.execute('PRAGMA journal_mode = DELETE')
+            archive_conn.execute('VACUUM')
+        file_size = self.archives.store(month, building)
+        building.unlink()
+        
+        # 归档已落盘，再从主库删除（只删已复制的事件，期间新写入的迟到事件留待下次）
+        deleted = 0
+        conn = self.get_connection()
+        
+        try:
+            while True:
+                with conn:
+                    # 显式开启事务，触发器的移除和恢复与删除一起提交
+                    conn.execute('BEGIN IMMEDIATE')
+                    conn.execute('DROP TRIGGER IF EXISTS trg_events_rollup_delete')
+                    cursor = conn.execute('''
+                        DELETE FROM events WHERE id IN (
+                            SELECT id FROM events
+                            WHERE timestamp >= ? AND timestamp < ? AND id <= ?
+                            LIMIT ?
+                        )
+                    ''', (start, end, copied_max_id, chunk_size))
+                    conn.execute(ROLLUP_DELETE_TRIGGER)
+                if cursor.rowcount <= 0:
+                    break
+                deleted += cursor.rowcount
+            
+            with conn:
+                # 不再被主库事件引用的快照随归档移出
+                conn.execute('''
+                    DELETE FROM folder_snapshots
+                    WHERE id IN (SELECT value FROM json_each(?))
+                      AND id NOT IN (SELECT snapshot_id FROM events WHERE snapshot_id IS NOT NULL)
+                ''', (json.dumps(snapshot_ids),))
+                conn.execute('''
+                    INSERT OR REPLACE INTO event_archives (month, event_count, min_id, max_id, file_size, archived_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (month, count, min_id, max_id, file_size, datetime.now().isoformat()))
+        finally:
+            self.release_connection(conn)
+        
+        self._bump_version('events')
+        logger.info(f"📦 {month} 已归档: 移出 {deleted} 条，归档共 {count} 条，{file_size / 1024 / 1024:.1f} MB")
+        return count
+    
+    def apply_retention(self, retention_months: Optional[int] = None, chunk_size: int = 10000) -> Dict:
+        """删除最近retention_months个月之前的事件、归档和统计汇总（0表示永久保留）"""
+        retention_months = self.retention_months if retention_months is None else retention_months
+        if retention_months <= 0:
+            return {'archives_removed': [], 'events_deleted': 0}
+        
+        cutoff = add_months(current_month(), -retention_months)
+        cutoff_start = month_range(cutoff)[0]
+        conn = self.get_connection()
+        
+        try:
+            manifest = [row[0] for row in conn.execute('SELECT month FROM event_archives WHERE month < ?', (cutoff,))]
+            removed = sorted(set(manifest) | {m for m in self.archives.months() if m < cutoff})
+            for month in removed:
+                self.archives.remove(month)
+            
+            deleted = 0
+            while True:
+                with conn:
+                    cursor = conn.execute('''
+                        DELETE FROM events WHERE id IN (
+                            SELECT id FROM events WHERE timestamp < ? LIMIT ?
+                        )
+                    ''', (cutoff_start, chunk_size))
+                if cursor.rowcount <= 0:
+                    break
+                deleted += cursor.rowcount
+            
+            with conn:
+                conn.execute('DELETE FROM event_archives WHERE month < ?', (cutoff,))
+                conn.execute('DELETE FROM event_rollups WHERE bucket < ?', (cutoff_start,))
+        finally:
+            self.release_connection(conn)
+        
+        if removed or deleted:
+            self._bump_version('events')
+            logger.info(f"🗑️ 保留策略: 删除 {cutoff} 之前的 {len(removed)} 个归档、{deleted} 条事件")
+        return {'archives_removed': removed, 'events_deleted': deleted}
+    
+    def get_partition_stats(self) -> Dict:
+        """主库时间范围、归档清单与解压缓存状态"""
+        conn = self.get_connection()
+        
+        try:
+            oldest, newest = conn.execute('SELECT MIN(timestamp), MAX(timestamp) FROM events').fetchone()
+            archives = [dict(row) for row in conn.execute('SELECT * FROM event_archives ORDER BY month DESC')]
+        finally:
+            self.release_connection(conn)
+        
+        return {
+            'hot_months': self.hot_months,
+            'retention_months': self.retention_months,
+            'hot_oldest': oldest,
+            'hot_newest': newest,
+            'database_bytes': os.path.getsize(self.db_file) if self.db_file.exists() else 0,
+            'archives': archives,
+            'archive_store': self.archives.get_stats()
+        }
+    
+    def write_service_status(self, name: str, started_at: str, stats: Dict):
+        """写入服务心跳（时间为time.time()，跨进程可比较）"""
+        conn = self.get_connection()
+        
+        try:
+            with conn:
+                conn.execute('''
+                    INSERT OR REPLACE INTO service_status (name, pid, started_at, heartbeat_at, stats)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (name, os.getpid(), started_at, time.time(), json.dumps(stats, ensure_ascii=False, default=str)))
+        finally:
+            self.release_connection(conn)
+    
+    def get_service_status(self, name: str) -> Optional[Dict]:
+        """读取服务最近一次心跳"""
+        conn = self.get_connection()
+        
+        try:
+            row = conn.execute('SELECT * FROM service_status WHERE name = ?', (name,)).fetchone()
+        finally:
+            self.release_connection(conn)
+        
+        if row is None:
+            return None
+        status = dict(row)
+        status['stats'] = json.loads(status['stats']) if status['stats'] else {}
+        return status
+    
     def get_user(self, username: str) -> Optional[Dict]:
         """获取用户"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM users WHERE username = ?', (username,))
-        row = cursor.fetchone()
-        conn.close()
+        try:
+            row = conn.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
+        finally:
+            self.release_connection(conn)
         
         return dict(row) if row else None
     
     def get_all_users(self) -> List[Dict]:
         """获取所有用户"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
-        cursor.execute('SELECT * FROM users ORDER BY username')
-        rows = cursor.fetchall()
-        conn.close()
+        try:
+            rows = conn.execute('SELECT * FROM users ORDER BY username').fetchall()
+        finally:
+            self.release_connection(conn)
         
         return [dict(row) for row in rows]
     
     def add_user(self, username: str, password: str = ''):
         """添加用户"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
-        cursor.execute('''
-            INSERT INTO users (username, password) 
-            VALUES (?, ?)
-        ''', (username, password))
+        try:
+            with conn:
+                conn.execute('''
+                    INSERT INTO users (username, password) 
+                    VALUES (?, ?)
+                ''', (username, password))
+        finally:
+            self.release_connection(conn)
         
-        conn.commit()
-        conn.close()
+        self._bump_version('users')
 
 
-# 全局数据库实例
-db = DatabaseManager()
+# 全局数据库实例（第一次使用时才初始化）
+db = DatabaseManager(lazy=True)
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+有界、带时间窗口的去重集合 - 抑制短时间内的重复通知，占用内存不随运行时间增长
+"""
+
+import sys
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+from config import config
+
+
+class TimedDedupSet:
+    """LRU + TTL去重集合
+    
+    条目按加入时间排序保存在OrderedDict中：超过ttl秒的条目视为不存在，并在之后的
+    操作中从队首顺带清理；条目数超过capacity时淘汰最早加入的。所有操作均摊O(1)。
+    重复的add()不刷新加入时间，时间窗口从第一次出现算起。
+    
+    内存占用 = 容器本身 + 键对象 + 时间戳，键的大小在增删时增量维护，查询为O(1)。
+    """
+    
+    ENTRY_OVERHEAD = sys.getsizeof(0.0)  # 每个条目的时间戳对象；哈希表和链表节点已计入sys.getsizeof(OrderedDict)
+    
+    def __init__(self, capacity: Optional[int] = None, ttl: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity or int(config.get('dedup_capacity', 10000))  # type: ignore
+        self.ttl = ttl if ttl is not None else float(config.get('dedup_ttl', 300))  # type: ignore
+        self.clock = clock
+        self._items: 'OrderedDict[Hashable, float]' = OrderedDict()
+        self._key_bytes = 0
+        
+        # 指标
+        self.duplicate_count = 0
+        self.expired_count = 0
+        self.evicted_count = 0
+    
+    def add(self, key: Hashable) -> bool:
+        """加入key；时间窗口内已存在（重复）时返回False"""
+        now = self.clock()
+        self._expire(now)
+        if key in self._items:
+            self.duplicate_count += 1
+            return False
+        
+        self._items[key] = now
+        self._key_bytes += sys.getsizeof(key)
+        while len(self._items) > self.capacity:
+            self._pop_oldest()
+            self.evicted_count += 1
+        return True
+    
+    def discard(self, key: Hashable):
+        """移除key（例如文件已被删除，之后同名拷入应重新记录）"""
+        if self._items.pop(key, None) is not None:
+            self._key_bytes -= sys.getsizeof(key)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        added_at = self._items.get(key)
+        return added_at is not None and self.clock() - added_at < self.ttl
+    
+    def __len__(self) -> int:
+        # 只读：可能包含已过期、尚未清理的条目（清理只在add()中进行，指标查询不修改集合）
+        return len(self._items)
+    
+    def clear(self):
+        self._items.clear()
+        self._key_bytes = 0
+    
+    def _expire(self, now: float):
+        items = self._items
+        while items:
+            _, added_at = next(iter(items.items()))
+            if now - added_at < self.ttl:
+                break
+            self._pop_oldest()
+            self.expired_count += 1
+    
+    def _pop_oldest(self):
+        key, _ = self._items.popitem(last=False)
+        self._key_bytes -= sys.getsizeof(key)
+    
+    def memory_bytes(self) -> int:
+        """估算占用的内存（字节）"""
+        return sys.getsizeof(self._items) + self._key_bytes + len(self._items) * self.ENTRY_OVERHEAD
+    
+    def get_stats(self) -> Dict:
+        return {
+            'size': len(self),
+            'capacity': self.capacity,
+            'ttl': self.ttl,
+            'duplicates': self.duplicate_count,
+            'expired': self.expired_count,
+            'evicted': self.evicted_count,
+            'memory_bytes': self.memory_bytes()
+        }
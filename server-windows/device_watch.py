@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+设备插拔通知 - 有设备变化时才唤醒监控循环重新枚举驱动器
+
+    WmiDeviceWatcher        Windows: WMI Win32_VolumeChangeEvent（卷挂载/卸载）
+    MountsDeviceWatcher     Linux: 监听/proc/self/mounts变化
+    SimulatedDeviceWatcher  手动模拟插入/移除，用于测试和基准
+    PollingDeviceWatcher    兜底：固定间隔唤醒（旧行为）
+"""
+
+import os
+import sys
+import time
+import select
+import threading
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceWatcher(ABC):
+    """设备变化通知接口（子类必须实现wait）"""
+    
+    # 没有事件时兜底重新枚举的间隔（秒）
+    fallback_interval = 30.0
+    
+    def start(self):
+        """开始监听"""
+        pass
+    
+    @abstractmethod
+    def wait(self, timeout: float) -> bool:
+        """等待设备变化，最多timeout秒；有变化返回True，超时返回False"""
+    
+    def stop(self):
+        """停止监听，唤醒正在等待的线程"""
+        pass
+    
+    def list_drives(self) -> Optional[set]:
+        """当前驱动器集合；返回None表示由调用方按平台自行枚举"""
+        return None
+    
+    def drive_root(self, drive: str) -> Optional[str]:
+        """驱动器根路径；返回None表示使用 "X:\\" """
+        return None
+
+
+class PollingDeviceWatcher(DeviceWatcher):
+    """固定间隔轮询"""
+    
+    def __init__(self, interval: Optional[float] = None):
+        self.interval = interval or float(config.get('device_poll_interval', 0.5))  # type: ignore
+        self.fallback_interval = self.interval
+        self._stop_event = threading.Event()
+    
+    def wait(self, timeout: float) -> bool:
+        self._stop_event.wait(min(timeout, self.interval))
+        return False
+    
+    def stop(self):
+        self._stop_event.set()
+
+
+class _EventDeviceWatcher(DeviceWatcher):
+    """由后台线程或外部调用置位事件的通知源公共部分"""
+    
+    def __init__(self):
+        self.fallback_interval = float(config.get('device_fallback_interval', 30))  # type: ignore
+        self.debounce = float(config.get('device_debounce', 0.3))  # type: ignore
+        self._changed = threading.Event()
+        self._stopped = False
+    
+    def notify(self):
+        """标记发生了设备变化"""
+        self._changed.set()
+    
+    def wait(self, timeout: float) -> bool:
+        if not self._changed.wait(timeout):
+            return False
+        # 一次插入往往连续触发多个事件，稍等片刻合并处理
+        if self.debounce and not self._stopped:
+            time.sleep(self.debounce)
+        self._changed.clear()
+        return not self._stopped
+    
+    def stop(self):
+        self._stopped = True
+        self._changed.set()
+
+
+class WmiDeviceWatcher(_EventDeviceWatcher):
+    """WMI卷变化事件（EventType 2=挂载, 3=卸载）"""
+    
+    def __init__(self):
+        super().__init__()
+        self._thread = None
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name='WmiDeviceWatcher')
+        self._thread.start()
+    
+    def _run(self):
+        import pythoncom
+        import wmi
+        
+        pythoncom.CoInitialize()
+        try:
+            watcher = wmi.WMI().watch_for(raw_wql="SELECT * FROM Win32_VolumeChangeEvent")
+            while not self._stopped:
+                try:
+                    event = watcher(timeout_ms=1000)
+                except wmi.x_wmi_timed_out:
+                    continue
+                logger.debug(f"卷变化事件: {getattr(event, 'DriveName', '')} EventType={getattr(event, 'EventType', '')}")
+                self.notify()
+        except Exception as e:
+            # 事件订阅失败时退化为按兜底间隔重新枚举
+            logger.error(f"WMI设备事件订阅失败，改为轮询: {e}")
+            self.fallback_interval = float(config.get('device_poll_interval', 0.5))  # type: ignore
+        finally:
+            pythoncom.CoUninitialize()
+
+
+class MountsDeviceWatcher(_EventDeviceWatcher):
+    """Linux挂载表变化（/proc/self/mounts在挂载/卸载时产生POLLPRI）
+    
+    /media、/run/media下的挂载点视为可移动设备，驱动器名取挂载点目录名。
+    """
+    
+    MOUNTS = '/proc/self/mounts'
+    REMOVABLE_PREFIXES = ('/media/', '/run/media/', '/mnt/usb')
+    
+    def __init__(self):
+        super().__init__()
+        self._thread = None
+    
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True, name='MountsDeviceWatcher')
+        self._thread.start()
+    
+    def _run(self):
+        try:
+            with open(self.MOUNTS, 'r') as f:
+                poller = select.poll()
+                poller.register(f, select.POLLPRI | select.POLLERR)
+                f.read()
+                while not self._stopped:
+                    if poller.poll(1000):
+                        f.seek(0)
+                        f.read()
+                        self.notify()
+        except Exception as e:
+            logger.error(f"监听挂载表失败，改为轮询: {e}")
+            self.fallback_interval = float(config.get('device_poll_interval', 0.5))  # type: ignore
+    
+    def _mounts(self) -> Dict[str, str]:
+        """可移动设备挂载点：驱动器名 -> 挂载路径"""
+        mounts = {}
+        try:
+            with open(self.MOUNTS, 'r') as f:
+                for line in f:
+                    parts = line.split()
+                    if len(parts) < 2:
+                        continue
+                    mount_point = parts[1].replace('\\040', ' ')
+                    if mount_point.startswith(self.REMOVABLE_PREFIXES):
+                        mounts[os.path.basename(mount_point.rstrip('/'))] = mount_point
+        except OSError as e:
+            logger.error(f"读取挂载表失败: {e}")
+        return mounts
+    
+    def list_drives(self) -> Optional[set]:
+        return set(self._mounts())
+    
+    def drive_root(self, drive: str) -> Optional[str]:
+        return self._mounts().get(drive)
+
+
+class SimulatedDeviceWatcher(_EventDeviceWatcher):
+    """模拟设备插拔：insert()/remove()修改驱动器集合并触发事件"""
+    
+    def __init__(self, debounce: float = 0.0):
+        super().__init__()
+        self.debounce = debounce
+        self.drives: Dict[str, str] = {}
+        self._lock = threading.Lock()
+    
+    def insert(self, drive: str, root_path: str):
+        """模拟插入：drive对应的文件系统根目录为root_path"""
+        with self._lock:
+            self.drives[drive] = root_path
+        self.notify()
+    
+    def remove(self, drive: str):
+        """模拟移除"""
+        with self._lock:
+            self.drives.pop(drive, None)
+        self.notify()
+    
+    def list_drives(self) -> Optional[set]:
+        with self._lock:
+            return set(self.drives)
+    
+    def drive_root(self, drive: str) -> Optional[str]:
+        with self._lock:
+            return self.drives.get(drive)
+
+
+def create_device_watcher() -> DeviceWatcher:
+    """按配置/平台创建设备通知源（device_watch_backend: auto / wmi / mounts / polling）"""
+    backend = str(config.get('device_watch_backend', 'auto')).lower()
+    if backend == 'auto':
+        backend = 'wmi' if sys.platform == 'win32' else 'mounts'
+    
+    if backend == 'wmi':
+        return WmiDeviceWatcher()
+    if backend == 'mounts':
+        return MountsDeviceWatcher()
+    if backend == 'polling':
+        return PollingDeviceWatcher()
+    raise ValueError(f"未知的设备通知源类型: {backend}")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+驱动器分类缓存 - 按 (盘符, 卷序列号) 记住是否为USB设备，避免每次枚举都走WMI查询
+"""
+
+import threading
+import logging
+from typing import Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DriveClassificationCache:
+    """驱动器分类缓存
+    
+    classify(letter)是昂贵的判断（固定磁盘需要WMI关联查询），identify(letter)
+    返回卷序列号等廉价的身份标识。同一盘符的标识不变时直接使用缓存结果；
+    换了一个卷（序列号变化）、设备被移除（invalidate/retain）时重新判断。
+    """
+    
+    def __init__(self, classify: Callable[[str], bool],
+                 identify: Callable[[str], Optional[int]]):
+        self.classify = classify
+        self.identify = identify
+        self._entries: Dict[str, tuple] = {}  # 盘符 -> (卷序列号, 是否USB)
+        self._lock = threading.Lock()
+        
+        # 指标
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+    
+    def is_usb(self, letter: str) -> bool:
+        """盘符是否为USB设备（命中缓存时不调用classify）"""
+        serial = self.identify(letter)
+        with self._lock:
+            entry = self._entries.get(letter)
+            if entry is not None and entry[0] == serial:
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                logger.debug(f"{letter}: 卷序列号变化，重新判断")
+                self.invalidations += 1
+            self.misses += 1
+        
+        # 判断在锁外进行，WMI查询可能较慢
+        result = self.classify(letter)
+        with self._lock:
+            self._entries[letter] = (serial, result)
+        return result
+    
+    def invalidate(self, letter: str):
+        """丢弃某个盘符的缓存（设备移除）"""
+        with self._lock:
+            if self._entries.pop(letter, None) is not None:
+                self.invalidations += 1
+    
+    def retain(self, letters: Iterable[str]):
+        """只保留仍然存在的盘符"""
+        present = set(letters)
+        with self._lock:
+            for letter in [l for l in self._entries if l not in present]:
+                del self._entries[letter]
+                self.invalidations += 1
+    
+    def get_entry(self, letter: str) -> Optional[Dict]:
+        """某个盘符的缓存内容（调试用）"""
+        with self._lock:
+            entry = self._entries.get(letter)
+        if entry is None:
+            return None
+        return {'volume_serial': entry[0], 'is_usb': entry[1]}
+    
+    def get_stats(self) -> Dict:
+        """缓存指标"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程内事件广播 - 事件落库后推送给所有实时订阅者（SSE）
+
+写入方（EventWriter写线程、API请求、ChangeFeed）调用publish()，订阅者在事件循环中
+通过各自的有界队列接收。订阅者消费太慢、队列写满时不阻塞写入方，
+只给该订阅者打上lagging标记，由订阅方自行回数据库追赶。
+"""
+
+import asyncio
+import threading
+import logging
+from typing import Dict, List, Optional
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# 推送给订阅者的事件字段（与事件列表接口一致，不含文件夹结构）
+PUBLIC_FIELDS = (
+    'timestamp', 'machine_name', 'ip_address', 'username', 'login_id',
+    'drive_letter', 'file_name', 'file_path', 'action', 'file_size'
+)
+
+
+def public_event(event: Dict, event_id: int) -> Dict:
+    """落库后的事件 -> 推送格式（与数据库查询出的行字段一致）"""
+    result = {'id': event_id}
+    for field in PUBLIC_FIELDS:
+        result[field] = event.get(field)
+    result['is_folder'] = 1 if event.get('is_folder') else 0
+    result['snapshot_id'] = event.get('snapshot_id')
+    result['has_folder_structure'] = 1 if (event.get('folder_structure') or event.get('snapshot_id')) else 0
+    return result
+
+
+class EventFilter:
+    """订阅过滤条件（语义与DatabaseManager._event_filters一致）"""
+    
+    def __init__(self, machine_name: Optional[str] = None,
+                 username: Optional[str] = None,
+                 drive_letter: Optional[str] = None,
+                 action: Optional[str] = None,
+                 is_folder: Optional[bool] = None):
+        self.machine_name = machine_name
+        self.username = username
+        self.drive_letter = drive_letter.rstrip(':\\').upper() if drive_letter else None
+        self.action = action
+        self.is_folder = is_folder
+    
+    def as_kwargs(self) -> Dict:
+        """转成数据库查询参数"""
+        return {
+            'machine_name': self.machine_name,
+            'username': self.username,
+            'drive_letter': self.drive_letter,
+            'action': self.action,
+            'is_folder': self.is_folder
+        }
+    
+    def matches(self, event: Dict) -> bool:
+        if self.machine_name and event.get('machine_name') != self.machine_name:
+            return False
+        if self.username and event.get('username') != self.username:
+            return False
+        if self.drive_letter and event.get('drive_letter') != self.drive_letter:
+            return False
+        if self.action:
+            action = event.get('action') or ''
+            if self.action.endswith('*'):
+                if not action.startswith(self.action[:-1]):
+                    return False
+            elif action != self.action:
+                return False
+        if self.is_folder is not None and bool(event.get('is_folder')) != self.is_folder:
+            return False
+        return True
+
+
+class Subscription:
+    """一个订阅者：所属事件循环 + 有界队列"""
+    
+    def __init__(self, loop: asyncio.AbstractEventLoop, event_filter: EventFilter, maxsize: int):
+        self.loop = loop
+        self.filter = event_filter
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.lagging = False  # 有事件因队列已满被丢弃，需要回数据库追赶
+        self.delivered = 0
+        self.dropped = 0
+    
+    def _offer(self, events: List[Dict]):
+        """在所属事件循环中执行：把匹配的事件放入队列"""
+        for event in events:
+            if not self.filter.matches(event):
+                continue
+            try:
+                self.queue.put_nowait(event)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                self.lagging = True
+                self.dropped += 1
+
+
+class EventBus:
+    """事件广播"""
+    
+    def __init__(self, queue_size: Optional[int] = None):
+        self.queue_size = queue_size or int(config.get('sse_queue_size', 1000))  # type: ignore
+        self._subscribers: List[Subscription] = []
+        self._lock = threading.Lock()
+        
+        # 指标
+        self.published = 0
+    
+    def subscribe(self, event_filter: Optional[EventFilter] = None) -> Subscription:
+        """在事件循环中调用，创建订阅"""
+        subscription = Subscription(asyncio.get_running_loop(), event_filter or EventFilter(), self.queue_size)
+        with self._lock:
+            self._subscribers.append(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+    
+    def publish(self, events: List[Dict], ids: List[int]):
+        """广播一批已落库的事件及其ID（线程安全，不阻塞调用方）"""
+        if not events:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers)
+        self.published += len(events)
+        if not subscribers:
+            return
+        
+        self._broadcast(subscribers, [public_event(event, event_id) for event, event_id in zip(events, ids)])
+    
+    def publish_rows(self, rows: List[Dict]):
+        """广播从数据库查询出的事件行（已是推送格式，例如其他进程写入、由ChangeFeed读到的事件）"""
+        if not rows:
+            return
+        with self._lock:
+            subscribers = list(self._subscribers)
+        self.published += len(rows)
+        if subscribers:
+            self._broadcast(subscribers, rows)
+    
+    def _broadcast(self, subscribers: List[Subscription], events: List[Dict]):
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._offer, events)
+            except RuntimeError:
+                # 事件循环已关闭
+                self.unsubscribe(subscription)
+    
+    def get_stats(self) -> Dict:
+        """广播指标"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        return {
+            'subscribers': len(subscribers),
+            'published': self.published,
+            'queue_size': self.queue_size,
+            'lagging': sum(1 for s in subscribers if s.lagging),
+            'delivered': sum(s.delivered for s in subscribers),
+            'dropped': sum(s.dropped for s in subscribers)
+        }
+
+
+# 全局事件广播实例
+bus = EventBus()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+事件异步写入器 - 监控线程只负责入队，单独的写线程批量落库
+"""
+
+import queue
+import threading
+import time
+import logging
+from typing import Callable, Dict, List, Optional
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class EventWriter(threading.Thread):
+    """事件写入器
+    
+    FileMonitor等生产者调用put()把事件放入有界队列；写线程每攒够
+    batch_size条或距第一条入队超过flush_interval秒，就用一个事务批量写入。
+    队列满时put()最多阻塞put_timeout秒（背压），仍然写不进去才丢弃并计数。
+    落库成功后以 (事件, ID) 列表调用on_written（例如推送给实时订阅者）。
+    """
+    
+    def __init__(self, database, batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None,
+                 queue_size: Optional[int] = None,
+                 put_timeout: Optional[float] = None,
+                 on_written: Optional[Callable[[List[Dict], List[int]], None]] = None):
+        super().__init__(daemon=True, name='EventWriter')
+        self.db = database
+        self.on_written = on_written
+        self.batch_size = batch_size or int(config.get('writer_batch_size', 500))  # type: ignore
+        self.flush_interval = flush_interval or float(config.get('writer_flush_interval', 0.5))  # type: ignore
+        self.put_timeout = put_timeout or float(config.get('writer_put_timeout', 5.0))  # type: ignore
+        queue_size = queue_size or int(config.get('writer_queue_size', 10000))  # type: ignore
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.running = False
+        self._stop_event = threading.Event()
+        
+        # 指标（写入类指标只由写线程更新）
+        self.events_written = 0
+        self.events_failed = 0
+        self.events_dropped = 0
+        self.batches_written = 0
+        self.last_batch_size = 0
+        self.max_batch_size = 0
+        self.max_queue_depth = 0
+        self.last_flush_seconds = 0.0
+        self._drop_lock = threading.Lock()
+    
+    def start(self):
+        """启动写线程"""
+        self.running = True
+        super().start()
+        logger.info(f"✅ 事件写入器已启动 (批量: {self.batch_size}, 间隔: {self.flush_interval}s)")
+    
+    def put(self, event: Dict) -> bool:
+        """事件入队；写入器未运行时直接同步写入"""
+        if not self.running:
+            self._notify([event], self.db.insert_events([event]))
+            return True
+        
+        try:
+            self.queue.put(event, timeout=self.put_timeout)
+            return True
+        except queue.Full:
+            with self._drop_lock:
+                self.events_dropped += 1
+            logger.error(f"事件队列已满，丢弃事件: {event.get('action')} - {event.get('file_name')}")
+            return False
+    
+    def stop(self, timeout: Optional[float] = None):
+        """停止写入器：先写完队列中剩余的事件再退出"""
+        if not self.running:
+            return
+        # 先切换为同步写入，之后到达的事件不再进入队列
+        self.running = False
+        self._stop_event.set()
+        try:
+            self.queue.put_nowait(None)  # 唤醒正在等待的写线程
+        except queue.Full:
+            pass
+        self.join(timeout)
+        
+        # 写线程退出后若仍有残留（并发入队或超时），同步写完
+        leftover = []
+        while True:
+            try:
+                event = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is not None:
+                leftover.append(event)
+        if leftover:
+            self._write_batch(leftover)
+        logger.info(f"❌ 事件写入器已停止 (共写入 {self.events_written} 条)")
+    
+    def run(self):
+        """写线程主循环"""
+        while True:
+            batch = self._collect_batch()
+            if batch:
+                self._write_batch(batch)
+            # 唤醒用的None可能已在攒批时被取走，写完一批后也要检查是否该退出
+            if self._stop_event.is_set() and self.queue.empty():
+                break
+    
+    def _collect_batch(self) -> List[Dict]:
+        """攒一批事件：满batch_size或超过flush_interval即返回"""
+        try:
+            first = self.queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        if first is None:
+            return []
+        
+        depth = self.queue.qsize() + 1
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+        
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            # 停止时不再等待，尽快写完
+            remaining = 0 if self._stop_event.is_set() else deadline - time.monotonic()
+            try:
+                if remaining > 0:
+                    event = self.queue.get(timeout=remaining)
+                else:
+                    event = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is None:
+                break
+            batch.append(event)
+        return batch
+    
+    def _write_batch(self, batch: List[Dict]):
+        """写入一批事件；整批失败时逐条重试，隔离坏数据"""
+        start = time.perf_counter()
+        try:
+            self._notify(batch, self.db.insert_events(batch))
+            self.events_written += len(batch)
+        except Exception as e:
+            logger.error(f"批量写入事件失败，改为逐条写入: {e}")
+            for event in batch:
+                try:
+                    self._notify([event], self.db.insert_events([event]))
+                    self.events_written += 1
+                except Exception as item_error:
+                    self.events_failed += 1
+                    logger.error(f"保存事件失败: {item_error}")
+        
+        self.last_flush_seconds = time.perf_counter() - start
+        self.batches_written += 1
+        self.last_batch_size = len(batch)
+        if len(batch) > self.max_batch_size:
+            self.max_batch_size = len(batch)
+    
+    def _notify(self, events: List[Dict], ids: List[int]):
+        """落库成功回调（回调异常不影响写入）"""
+        if not self.on_written:
+            return
+        try:
+            self.on_written(events, ids)
+        except Exception as e:
+            logger.error(f"事件落库回调失败: {e}")
+    
+    def get_stats(self) -> Dict:
+        """写入器指标"""
+        return {
+            'running': self.running,
+            'queue_depth': self.queue.qsize(),
+            'queue_capacity': self.queue.maxsize,
+            'max_queue_depth': self.max_queue_depth,
+            'events_written': self.events_written,
+            'events_failed': self.events_failed,
+            'events_dropped': self.events_dropped,
+            'batches_written': self.batches_written,
+            'last_batch_size': self.last_batch_size,
+            'max_batch_size': self.max_batch_size,
+            'avg_batch_size': round(self.events_written / self.batches_written, 2) if self.batches_written else 0,
+            'last_flush_ms': round(self.last_flush_seconds * 1000, 3)
+        }
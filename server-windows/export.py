@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+事件导出 - 沿分页游标逐批读取，边读边编码输出，内存占用与导出总量无关
+
+支持两种格式:
+    csv       UTF-8（带BOM，Excel可直接打开）
+    columnar  紧凑列式格式，每批一个zlib压缩块，体积通常只有CSV的十分之一左右
+
+columnar文件结构:
+    MAGIC
+    头部JSON一行: {"format", "version", "columns", "filters", "created_at"}
+    若干数据块: b'B' + 4字节长度(大端) + zlib(JSON)
+        {"rows": n, "next_cursor": ..., "columns": {列名: 编码后的列}}
+        低基数字符串列为 {"dict": [取值...], "codes": [下标...]}，
+        id列为 {"delta": [首个id, 差值...]}，其余列为普通数组
+    结束块: b'E' + 4字节长度 + JSON {"rows": 总行数, "next_cursor": ...}
+
+读取使用iter_columnar()。导出顺序与事件列表相同（时间倒序），
+每个数据块都带有next_cursor，可以从任意块之后继续导出。
+"""
+
+import csv
+import io
+import json
+import os
+import struct
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional
+
+EXPORT_COLUMNS = [
+    'id', 'timestamp', 'machine_name', 'ip_address', 'username', 'login_id',
+    'drive_letter', 'file_name', 'file_path', 'action', 'file_size', 'is_folder', 'snapshot_id'
+]
+
+# 取值重复度高、适合字典编码的列
+DICT_COLUMNS = {'machine_name', 'ip_address', 'username', 'drive_letter', 'action', 'is_folder'}
+
+MAGIC = b'USBEVCOL1\n'
+FORMATS = ('csv', 'columnar')
+
+
+class CsvEncoder:
+    """CSV编码器"""
+    
+    media_type = 'text/csv; charset=utf-8'
+    extension = 'csv'
+    
+    def __init__(self, filters: Optional[Dict] = None, include_cursor: bool = False):
+        self.columns = EXPORT_COLUMNS + (['cursor'] if include_cursor else [])
+        self.include_cursor = include_cursor
+        if include_cursor:
+            # 只读取导出文件时不需要数据库，按需导入
+            from database import encode_cursor
+            self._encode_cursor = encode_cursor
+    
+    def begin(self) -> bytes:
+        return ('\ufeff' + self._format([self.columns])).encode('utf-8')
+    
+    def chunk(self, events: List[Dict], next_cursor: Optional[str]) -> bytes:
+        rows = []
+        for event in events:
+            row = [event.get(column) for column in EXPORT_COLUMNS]
+            if self.include_cursor:
+                # 每行附带续传游标：从该行之后继续导出
+                row.append(self._encode_cursor(event['timestamp'], event['id']))
+            rows.append(row)
+        return self._format(rows).encode('utf-8')
+    
+    def end(self, total: int, next_cursor: Optional[str]) -> bytes:
+        return b''
+    
+    def _format(self, rows: List[List]) -> str:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\r\n')
+        writer.writerows(rows)
+        return buffer.getvalue()
+
+
+class ColumnarEncoder:
+    """列式编码器"""
+    
+    media_type = 'application/octet-stream'
+    extension = 'evcol'
+    
+    def __init__(self, filters: Optional[Dict] = None, include_cursor: bool = False):
+        self.filters = {k: v for k, v in (filters or {}).items() if v is not None}
+    
+    def begin(self) -> bytes:
+        header = {
+            'format': 'usbmon-events-columnar',
+            'version': 1,
+            'columns': EXPORT_COLUMNS,
+            'filters': self.filters,
+            'created_at': datetime.now().isoformat()
+        }
+        return MAGIC + json.dumps(header, ensure_ascii=False).encode('utf-8') + b'\n'
+    
+    def chunk(self, events: List[Dict], next_cursor: Optional[str]) -> bytes:
+        columns: Dict[str, object] = {}
+        for column in EXPORT_COLUMNS:
+            values = [event.get(column) for event in events]
+            if column == 'id':
+                columns[column] = {'delta': [values[0]] + [b - a for a, b in zip(values, values[1:])] if values else []}
+            elif column in DICT_COLUMNS:
+                index: Dict = {}
+                codes = [index.setdefault(value, len(index)) for value in values]
+                columns[column] = {'dict': list(index), 'codes': codes}
+            else:
+                columns[column] = values
+        payload = json.dumps({
+            'rows': len(events),
+            'next_cursor': next_cursor,
+            'columns': columns
+        }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        return self._block(b'B', zlib.compress(payload, 6))
+    
+    def end(self, total: int, next_cursor: Optional[str]) -> bytes:
+        footer = json.dumps({'rows': total, 'next_cursor': next_cursor}).encode('utf-8')
+        return self._block(b'E', footer)
+    
+    def _block(self, kind: bytes, data: bytes) -> bytes:
+        return kind + struct.pack('>I', len(data)) + data
+
+
+ENCODERS = {'csv': CsvEncoder, 'columnar': ColumnarEncoder}
+
+
+def create_encoder(fmt: str, filters: Optional[Dict] = None, include_cursor: bool = False):
+    """按格式名创建编码器，不支持的格式抛出ValueError"""
+    if fmt not in ENCODERS:
+        raise ValueError(f"不支持的导出格式: {fmt}（可选: {', '.join(FORMATS)}）")
+    return ENCODERS[fmt](filters, include_cursor)
+
+
+def iter_columnar(stream: BinaryIO) -> Iterator[Dict]:
+    """逐行读取columnar导出文件，格式错误时抛出ValueError"""
+    if stream.read(len(MAGIC)) != MAGIC:
+        raise ValueError("不是columnar导出文件")
+    header = json.loads(stream.readline())
+    columns = header['columns']
+    
+    while True:
+        kind = stream.read(1)
+        if not kind or kind == b'E':
+            # 没有结束块说明导出未完成（可续传）
+            return
+        length = struct.unpack('>I', stream.read(4))[0]
+        data = stream.read(length)
+        if kind != b'B' or len(data) != length:
+            raise ValueError("导出文件已损坏或被截断")
+        
+        block = json.loads(zlib.decompress(data))
+        decoded = []
+        for column in columns:
+            encoded = block['columns'][column]
+            if isinstance(encoded, dict) and 'delta' in encoded:
+                values, current = [], 0
+                for i, delta in enumerate(encoded['delta']):
+                    current = delta if i == 0 else current + delta
+                    values.append(current)
+            elif isinstance(encoded, dict):
+                values = [encoded['dict'][code] for code in encoded['codes']]
+            else:
+                values = encoded
+            decoded.append(values)
+        for row in zip(*decoded):
+            yield dict(zip(columns, row))
+
+
+def export_to_file(database, output: Path, fmt: str = 'csv', chunk_size: int = 5000,
+                   resume: bool = False, max_rows: Optional[int] = None, **filters) -> Dict:
+    """导出事件到文件
+    
+    每写完一批就把游标、行数和文件长度记入 <output>.cursor；resume=True时
+    把文件截断到上次记录的长度后从该游标继续（格式和过滤条件须与上次一致）。
+    全部导出完成后删除游标文件。
+    """
+    output = Path(output)
+    state_path = output.with_name(output.name + '.cursor')
+    encoder = create_encoder(fmt, filters)
+    active_filters = {key: value for key, value in filters.items() if value is not None}
+    
+    state = {'cursor': None, 'rows': 0, 'size': 0, 'format': fmt, 'filters': active_filters}
+    if resume and state_path.exists():
+        state = json.loads(state_path.read_text(encoding='utf-8'))
+        if state.get('format') != fmt:
+            raise ValueError(f"续传格式不一致: 上次为 {state.get('format')}")
+        if state.get('filters', {}) != active_filters:
+            raise ValueError(f"续传过滤条件不一致: 上次为 {state.get('filters', {})}")
+    
+    cursor = state['cursor']
+    total = state['rows']
+    # 上次已写完最后一批、只差结束块
+    finished = bool(state['size']) and cursor is None
+    
+    with open(output, 'r+b' if state['size'] else 'wb') as f:
+        # 丢弃上次中断时写了一半的数据
+        f.truncate(state['size'])
+        f.seek(state['size'])
+        if not state['size']:
+            f.write(encoder.begin())
+        
+        while not finished:
+            limit = chunk_size if max_rows is None else min(chunk_size, max_rows - (total - state['rows']))
+            if limit <= 0:
+                break
+            page = database.get_events_page(limit, cursor, **filters)
+            if page['events']:
+                f.write(encoder.chunk(page['events'], page['next_cursor']))
+                f.flush()
+                total += len(page['events'])
+            cursor = page['next_cursor']
+            finished = cursor is None
+            _save_state(state_path, {
+                'cursor': cursor, 'rows': total, 'size': f.tell(), 'format': fmt, 'filters': active_filters
+            })
+        
+        if finished:
+            f.write(encoder.end(total, None))
+    
+    if finished and state_path.exists():
+        state_path.unlink()
+    return {'rows': total, 'next_cursor': cursor, 'complete': finished, 'bytes': output.stat().st_size}
+
+
+def _save_state(path: Path, state: Dict):
+    tmp = path.with_name(path.name + '.tmp')
+    tmp.write_text(json.dumps(state, ensure_ascii=False), encoding='utf-8')
+    os.replace(tmp, path)
@@ -1,19 +1,27 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-USB监控后端 - 主程序入口（带系统托盘）
+USB监控后端 - 主程序入口（带系统托盘，或 --headless 无界面运行）
 作者：董明照
+
+    python main.py                       系统托盘 + 登录窗口 + API服务
+    python main.py --headless            只运行监控服务和API（不加载Qt，事件记为未登录用户）
+    python main.py --startup-report FILE 启动完成后把各模块导入耗时写入FILE
+    python main.py --workers 4           USB监控留在本进程，API另起4个工作进程（共用数据库）
+
+界面(PySide6)、uvicorn和api只在需要时导入，数据库在首次访问时才初始化。
 """
 
+import startup  # 必须最先导入：之后导入的模块都会计时
+startup.enable_import_timing()
+
+import os
 import sys
+import argparse
+import multiprocessing
 import threading
-import webbrowser
 import logging
-from PySide6.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QMessageBox
-from PySide6.QtGui import QAction
-import uvicorn
 from config import config
-from api import app as fastapi_app
 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,109 +30,18 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-class TrayApp:
-    """系统托盘应用"""
-    
-    def __init__(self, qt_app):
-        self.qt_app = qt_app
-        self.host = str(config.get('host', 'localhost'))
-        port_value = config.get('port', 8888)
-        self.port = int(port_value) if port_value is not None else 8888
-        
-        # 创建托盘图标
-        self.tray = QSystemTrayIcon()
-        icon = qt_app.style().standardIcon(QApplication.style().StandardPixmap.SP_ComputerIcon)
-        self.tray.setIcon(icon)
-        self.tray.setToolTip("USB监控后端")
-        
-        # 创建菜单
-        menu = QMenu()
-        
-        status_action = QAction("🟢 服务运行中", menu)
-        status_action.setEnabled(False)
-        menu.addAction(status_action)
-        
-        menu.addSeparator()
-        
-        api_action = QAction("📖 打开API文档", menu)
-        api_action.triggered.connect(self.open_api_docs)
-        menu.addAction(api_action)
-        
-        logs_action = QAction("📂 打开日志目录", menu)
-        logs_action.triggered.connect(self.open_logs)
-        menu.addAction(logs_action)
-        
-        menu.addSeparator()
-        
-        about_action = QAction("ℹ️ 关于", menu)
-        about_action.triggered.connect(self.show_about)
-        menu.addAction(about_action)
-        
-        quit_action = QAction("❌ 退出", menu)
-        quit_action.triggered.connect(self.quit_app)
-        menu.addAction(quit_action)
-        
-        self.tray.setContextMenu(menu)
-        self.tray.show()
-        
-        # 显示启动消息
-        self.tray.showMessage(
-            "USB监控后端",
-            f"服务已启动\n地址: http://{self.host}:{self.port}",
-            QSystemTrayIcon.MessageIcon.Information,
-            3000
-        )
-    
-    def open_api_docs(self):
-        """打开API文档"""
-        webbrowser.open(f"http://{self.host}:{self.port}/docs")
-    
-    def open_logs(self):
-        """打开日志目录"""
-        import os
-        from pathlib import Path
-        logs_dir = Path(__file__).parent / 'logs'
-        logs_dir.mkdir(exist_ok=True)
-        os.startfile(str(logs_dir))
-    
-    def show_about(self):
-        """显示关于信息"""
-        QMessageBox.information(
-            None,
-            "关于 USB监控后端",
-            f"USB监控后端服务\n\n"
-            f"服务地址: http://{self.host}:{self.port}\n"
-            f"API文档: http://{self.host}:{self.port}/docs\n\n"
-            f"作者: 董明照"
-        )
-    
-    def quit_app(self):
-        """退出应用"""
-        reply = QMessageBox.question(
-            None,
-            "确认退出",
-            "确定要退出USB监控后端吗？\n服务将停止运行。",
-            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
-            QMessageBox.StandardButton.No
-        )
-        
-        if reply == QMessageBox.StandardButton.Yes:
-            self.tray.hide()
-            self.qt_app.quit()
-
-
 def run_server(host, port):
     """运行FastAPI服务器"""
+    import uvicorn
+    from api import app as fastapi_app
+    startup.mark('api_imported')
+    
     logger.info("="*50)
     logger.info("USB监控后端启动")
     logger.info(f"服务地址: http://{host}:{port}")
     logger.info(f"API文档: http://{host}:{port}/docs")
     logger.info("="*50)
     
-    # 设置登录回调 (延迟导入避免循环依赖)
-    from server import usb_service  # type: ignore
-    usb_service.set_login_callback(show_login_dialog)
-    
     uvicorn.run(
         fastapi_app,
         host=host,
@@ -133,51 +50,145 @@ def run_server(host, port):
     )
 
 
-def show_login_dialog(drive_letter: str) -> tuple:
-    """显示登录对话框"""
-    from login_dialog import LoginDialog
-    from PySide6.QtWidgets import QApplication
+def serve_api(host, port, workers, shutdown_event=None):
+    """API进程入口：各工作进程不启动USB监控，只读取共享数据库并接收上报
     
-    app = QApplication.instance()
-    if app is None:
-        return ("未知用户", 0)
+    shutdown_event被设置时通知uvicorn的进程管理器退出：各工作进程收到退出信号后
+    处理完进行中的请求、执行应用的关闭事件再结束。
+    """
+    os.environ['USB_MONITOR_MODE'] = 'external'  # 由uvicorn启动的工作进程继承
+    import uvicorn
+    from uvicorn.supervisors import Multiprocess
     
-    # 创建并显示登录窗口
-    dialog = LoginDialog(drive_letter)
-    result = dialog.exec()
-    
-    if result == dialog.DialogCode.Accepted:
-        return (dialog.username, dialog.login_id)
-    else:
-        return (None, None)
+    logger.info(f"API服务: http://{host}:{port} ({workers} 个工作进程)")
+    # 多个工作进程时uvicorn需要以导入路径加载应用
+    uvicorn_config = uvicorn.Config("api:app", host=host, port=port, workers=workers, log_level="info")
+    server = uvicorn.Server(uvicorn_config)
+    supervisor = Multiprocess(uvicorn_config, target=server.run, sockets=[uvicorn_config.bind_socket()])
+    if shutdown_event is not None:
+        def wait_for_shutdown():
+            shutdown_event.wait()
+            logger.info("收到关闭通知，API工作进程正在退出")
+            supervisor.should_exit.set()
+        threading.Thread(target=wait_for_shutdown, daemon=True, name='ApiShutdown').start()
+    supervisor.run()
 
 
-def main():
-    """主函数"""
-    # 读取配置
-    host = str(config.get('host', 'localhost'))
-    port_value = config.get('port', 8888)
-    port = int(port_value) if port_value is not None else 8888
+def start_api_process(host, port, workers):
+    """在子进程中运行API（uvicorn的多进程管理需要占用该进程的主线程），返回 (进程, 关闭事件)"""
+    context = multiprocessing.get_context('spawn')
+    shutdown_event = context.Event()
+    process = context.Process(
+        target=serve_api, args=(host, port, workers, shutdown_event), name='api'
+    )
+    process.start()
+    return process, shutdown_event
+
+
+def stop_api_process(process, shutdown_event, timeout=None):
+    """通知API进程正常退出；超时仍未退出再terminate，最后kill"""
+    timeout = float(config.get('api_shutdown_timeout', 15)) if timeout is None else timeout  # type: ignore
+    shutdown_event.set()
+    process.join(timeout)
+    if process.is_alive():
+        logger.warning(f"API进程 {timeout}s 内未退出，强制结束")
+        process.terminate()
+        process.join(5)
+    if process.is_alive():
+        process.kill()
+        process.join()
+
+
+def start_monitor():
+    """本进程运行USB监控（API在其他进程中）"""
+    from monitor_service import MonitorProcess
+    monitor = MonitorProcess()
+    monitor.start()
+    startup.mark('monitor_started')
+    return monitor
+
+
+def run_gui(host, port, workers):
+    """系统托盘模式：Qt事件循环在主线程；API服务在后台线程，workers>1时在单独的进程中"""
+    from PySide6.QtWidgets import QApplication
+    from tray import TrayApp, LoginBridge
+    startup.mark('gui_imported')
     
     # 创建Qt应用
     qt_app = QApplication(sys.argv)
     qt_app.setApplicationName("USB监控后端")
     qt_app.setQuitOnLastWindowClosed(False)
     
-    # 启动FastAPI服务器（后台线程）
-    server_thread = threading.Thread(
-        target=run_server,
-        args=(host, port),
-        daemon=True
-    )
-    server_thread.start()
+    # 设置登录回调：登录窗口在界面线程中显示，不阻塞监控循环 (延迟导入避免循环依赖)
+    from server import usb_service  # type: ignore
+    login_bridge = LoginBridge()
+    usb_service.set_login_callback(login_bridge.request)
+    
+    if workers > 1:
+        monitor = start_monitor()
+        api_process, api_shutdown = start_api_process(host, port, workers)
+        startup.finish()
+    else:
+        # 启动FastAPI服务器（后台线程）
+        server_thread = threading.Thread(
+            target=run_server,
+            args=(host, port),
+            daemon=True
+        )
+        server_thread.start()
     
     # 创建托盘应用
     tray_app = TrayApp(qt_app)
     
     # 运行Qt事件循环
-    sys.exit(qt_app.exec())
+    code = qt_app.exec()
+    if workers > 1:
+        stop_api_process(api_process, api_shutdown)
+        monitor.stop()
+    return code
+
+
+def run_headless(host, port, workers):
+    """无界面模式"""
+    if workers <= 1:
+        # 单进程：uvicorn在主线程运行，USB监控随应用启动
+        run_server(host, port)
+        return
+    
+    monitor = start_monitor()
+    api_process, api_shutdown = start_api_process(host, port, workers)
+    startup.finish()
+    try:
+        api_process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_api_process(api_process, api_shutdown)
+        monitor.stop()
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='USB监控后端')
+    parser.add_argument('--headless', action='store_true', help='无界面运行（不加载Qt，不弹出登录窗口）')
+    parser.add_argument('--startup-report', metavar='FILE', help='启动完成后写入启动耗时报告（JSON）')
+    parser.add_argument('--workers', type=int, default=int(config.get('api_workers', 1)),  # type: ignore
+                        help='API工作进程数；大于1时USB监控在本进程单独运行')
+    args = parser.parse_args()
+    startup.report_path = args.startup_report
+    
+    # 读取配置
+    host = str(config.get('host', 'localhost'))
+    port_value = config.get('port', 8888)
+    port = int(port_value) if port_value is not None else 8888
+    
+    if args.headless:
+        logger.info("🖥️ 无界面模式：不显示登录窗口，事件记为未登录用户")
+        run_headless(host, port, args.workers)
+    else:
+        sys.exit(run_gui(host, port, args.workers))
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # 打包后的exe启动API子进程
     main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+维护命令行工具
+
+用法:
+    python manage.py rebuild-stats        从事件表重建统计汇总表
+    python manage.py migrate-snapshots    把旧版内联的文件夹结构迁移到快照表
+    python manage.py rebuild-fts          重建全文索引（修改fts_tokenizer后需要执行）
+    python manage.py archive              把冷数据按月归档，并执行保留策略
+    python manage.py export               流式导出事件（csv / columnar），可断点续传
+"""
+
+import argparse
+import logging
+import sys
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def cmd_rebuild_stats(args):
+    """重建统计汇总表"""
+    from database import db
+    rows = db.rebuild_rollups()
+    print(f"✅ 统计汇总表重建完成，共 {rows} 行")
+
+
+def cmd_migrate_snapshots(args):
+    """迁移旧版内联文件夹结构"""
+    from database import db
+    migrated = db.migrate_inline_structures(args.chunk_size)
+    print(f"✅ 文件夹结构迁移完成，共 {migrated} 条")
+    if migrated and args.vacuum:
+        conn = db.get_connection()
+        try:
+            conn.execute('VACUUM')
+        finally:
+            db.release_connection(conn)
+        print("✅ 数据库已压缩")
+
+
+def cmd_rebuild_fts(args):
+    """重建全文索引"""
+    from database import db
+    indexed = db.rebuild_fts(args.chunk_size)
+    print(f"✅ 全文索引重建完成，共 {indexed} 条事件")
+
+
+def cmd_archive(args):
+    """按月归档冷数据并执行保留策略"""
+    from database import db
+    if args.month:
+        months = [month for month in args.month.split(',') if month.strip()]
+        for month in months:
+            db.archive_month(month.strip())
+    else:
+        months = db.archive_cold_months(args.hot_months)
+    print(f"✅ 已归档 {len(months)} 个月: {', '.join(months) or '无'}")
+    
+    result = db.apply_retention(args.retention_months)
+    if result['archives_removed'] or result['events_deleted']:
+        print(f"✅ 保留策略: 删除归档 {', '.join(result['archives_removed']) or '无'}，"
+              f"删除事件 {result['events_deleted']} 条")
+    
+    if (months or result['events_deleted']) and args.vacuum:
+        conn = db.get_connection()
+        try:
+            conn.execute('VACUUM')
+        finally:
+            db.release_connection(conn)
+        print("✅ 数据库已压缩")
+
+
+def cmd_export(args):
+    """流式导出事件"""
+    from database import db
+    from export import export_to_file
+    result = export_to_file(
+        db, args.output, args.format,
+        chunk_size=args.chunk_size,
+        resume=args.resume,
+        max_rows=args.max_rows,
+        machine_name=args.machine_name,
+        username=args.username,
+        drive_letter=args.drive_letter,
+        action=args.action,
+        start_time=args.start_time,
+        end_time=args.end_time,
+        is_folder=None if args.is_folder is None else bool(args.is_folder)
+    )
+    if result['complete']:
+        print(f"✅ 导出完成: {result['rows']} 条，{result['bytes'] / 1024 / 1024:.1f} MB -> {args.output}")
+    else:
+        print(f"⏸️ 已导出 {result['rows']} 条，使用 --resume 继续")
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='USB监控后端维护工具')
+    subparsers = parser.add_subparsers(dest='command')
+    
+    rebuild_stats = subparsers.add_parser('rebuild-stats', help='从事件表重建统计汇总表')
+    rebuild_stats.set_defaults(func=cmd_rebuild_stats)
+    
+    migrate_snapshots = subparsers.add_parser('migrate-snapshots', help='把旧版内联的文件夹结构迁移到快照表')
+    migrate_snapshots.add_argument('--chunk-size', type=int, default=500, help='每个事务迁移的事件数')
+    migrate_snapshots.add_argument('--vacuum', action='store_true', help='迁移后执行VACUUM回收空间')
+    migrate_snapshots.set_defaults(func=cmd_migrate_snapshots)
+    
+    rebuild_fts = subparsers.add_parser('rebuild-fts', help='重建全文索引（修改fts_tokenizer后需要执行）')
+    rebuild_fts.add_argument('--chunk-size', type=int, default=5000, help='每个事务索引的事件数')
+    rebuild_fts.set_defaults(func=cmd_rebuild_fts)
+    
+    archive = subparsers.add_parser('archive', help='把冷数据按月归档，并执行保留策略')
+    archive.add_argument('--hot-months', type=int, help='主库保留的月数（默认取配置hot_months，0表示不归档）')
+    archive.add_argument('--retention-months', type=int, help='总保留月数，0为永久（默认取配置retention_months）')
+    archive.add_argument('--month', help='只归档指定月份，如 2025-01（逗号分隔）')
+    archive.add_argument('--vacuum', action='store_true', help='归档后执行VACUUM回收空间')
+    archive.set_defaults(func=cmd_archive)
+    
+    export = subparsers.add_parser('export', help='流式导出事件（csv / columnar），可断点续传')
+    export.add_argument('output', help='输出文件')
+    export.add_argument('--format', default='csv', choices=['csv', 'columnar'])
+    export.add_argument('--resume', action='store_true', help='从上次中断处继续（读取 <输出文件>.cursor）')
+    export.add_argument('--chunk-size', type=int, default=5000, help='每批读取的事件数')
+    export.add_argument('--max-rows', type=int, help='本次最多导出的事件数')
+    export.add_argument('--machine-name')
+    export.add_argument('--username')
+    export.add_argument('--drive-letter')
+    export.add_argument('--action', help='事件类型，以*结尾按前缀匹配，如 拷入*')
+    export.add_argument('--start-time', help='起始时间（含），如 2026-07-01')
+    export.add_argument('--end-time', help='结束时间（不含），如 2026-10-01')
+    export.add_argument('--is-folder', type=int, choices=[0, 1])
+    export.set_defaults(func=cmd_export)
+    
+    args = parser.parse_args()
+    if not getattr(args, 'func', None):
+        parser.print_help()
+        sys.exit(1)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+进程内指标 - 计数器/直方图/仪表，按Prometheus文本格式导出
+
+计数器和直方图按线程分片：每个线程第一次记录某个指标时（加锁）登记自己的分片，
+之后只写自己的分片，记录路径上没有锁。导出时汇总所有分片；已退出线程的分片
+在导出时并入归档分片后移除，线程频繁创建销毁也不会无限增长。
+"""
+
+import math
+import threading
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 默认直方图桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Registry:
+    """指标注册表"""
+    
+    def __init__(self):
+        self.metrics: List['_Metric'] = []
+        self.lock = threading.Lock()
+    
+    def register(self, metric: '_Metric'):
+        with self.lock:
+            self.metrics.append(metric)
+    
+    def render(self) -> str:
+        """导出Prometheus文本格式"""
+        lines: List[str] = []
+        with self.lock:
+            metrics = list(self.metrics)
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class _Metric(ABC):
+    kind = 'untyped'
+    
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 registry: Optional[Registry] = REGISTRY):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        if registry is not None:
+            registry.register(self)
+    
+    @abstractmethod
+    def render(self) -> List[str]:
+        """本指标的样本行（不含HELP/TYPE）"""
+
+
+class _ShardedMetric(_Metric):
+    """按线程分片存储的指标"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._local = threading.local()
+        self._shards: Dict[threading.Thread, Dict] = {}
+        self._retired: Dict = {}  # 已退出线程的累计值
+        self._lock = threading.Lock()
+    
+    def _shard(self) -> Dict:
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = {}
+            self._local.shard = shard
+            with self._lock:
+                self._shards[threading.current_thread()] = shard
+        return shard
+    
+    def _collect(self) -> Dict:
+        """汇总所有分片（调用方不持锁）"""
+        with self._lock:
+            for thread in [t for t in self._shards if not t.is_alive()]:
+                self._merge(self._retired, self._shards.pop(thread).copy())
+            merged: Dict = {}
+            self._merge(merged, self._retired)
+            for shard in self._shards.values():
+                # dict.copy()在GIL下是原子的，不会与所属线程的写入冲突
+                self._merge(merged, shard.copy())
+        return merged
+    
+    @abstractmethod
+    def _merge(self, target: Dict, source: Dict):
+        """把一个分片的值累加到target"""
+
+
+class Counter(_ShardedMetric):
+    """只增计数器"""
+    
+    kind = 'counter'
+    
+    def inc(self, *label_values, amount: float = 1):
+        shard = self._shard()
+        shard[label_values] = shard.get(label_values, 0) + amount
+    
+    def _merge(self, target: Dict, source: Dict):
+        for key, value in source.items():
+            target[key] = target.get(key, 0) + value
+    
+    def value(self, *label_values) -> float:
+        return self._collect().get(label_values, 0)
+    
+    def render(self) -> List[str]:
+        return [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+            for key, value in sorted(self._collect().items())
+        ]
+
+
+class Histogram(_ShardedMetric):
+    """直方图：每个标签组合记录各桶计数、总和与次数"""
+    
+    kind = 'histogram'
+    
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS, registry: Optional[Registry] = REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+    
+    def observe(self, value: float, *label_values):
+        shard = self._shard()
+        series = shard.get(label_values)
+        if series is None:
+            # [各桶计数..., +Inf桶计数, 总和]
+            series = [0] * (len(self.buckets) + 1) + [0.0]
+            shard[label_values] = series
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+    
+    def _merge(self, target: Dict, source: Dict):
+        for key, series in source.items():
+            series = list(series)
+            current = target.get(key)
+            if current is None:
+                target[key] = series
+            else:
+                for i, value in enumerate(series):
+                    current[i] += value
+    
+    def render(self) -> List[str]:
+        lines = []
+        for key, series in sorted(self._collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(series[-1])}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Gauge(_Metric):
+    """仪表：导出时调用回调取当前值
+    
+    回调返回数值，或 {标签值元组: 数值} 字典（带标签时）。
+    """
+    
+    kind = 'gauge'
+    
+    def __init__(self, name: str, help: str, callback: Callable[[], object],
+                 labelnames: Sequence[str] = (), registry: Optional[Registry] = REGISTRY):
+        super().__init__(name, help, labelnames, registry)
+        self.callback = callback
+    
+    def render(self) -> List[str]:
+        try:
+            value = self.callback()
+        except Exception:
+            return []
+        if isinstance(value, dict):
+            items: List[Tuple] = sorted(value.items())
+        else:
+            items = [((), value)]
+        return [
+            f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(float(v))}'
+            for key, v in items
+        ]
+
+
+class CallbackCounter(Gauge):
+    """由其他组件自行累计的计数，导出时通过回调读取"""
+    
+    kind = 'counter'
+
+
+class MetricsServer:
+    """独立的指标HTTP服务：不运行API的进程（独立的监控进程）在GET /metrics导出本进程的指标"""
+    
+    def __init__(self, host: str, port: int, registry: Registry = REGISTRY):
+        self.host = host
+        self.port = port
+        self.registry = registry
+        self.httpd: Optional[ThreadingHTTPServer] = None
+        self.thread: Optional[threading.Thread] = None
+    
+    def start(self):
+        registry = self.registry
+        
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                pass
+        
+        self.httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True, name='MetricsServer')
+        self.thread.start()
+    
+    def stop(self):
+        if self.httpd is None:
+            return
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.httpd = None
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+独立的监控进程 - USB监控、事件写入和分区维护只在一个进程中运行
+
+API以多个工作进程运行时(monitor_mode=external)，工作进程不启动USB监控，只读取共享的
+SQLite(WAL)数据库并接收上报；本进程把事件写入同一个数据库，各工作进程的ChangeFeed按ID
+追踪后推送给实时订阅者。本进程每隔heartbeat_interval秒把运行指标写入service_status表，
+API的/api/ping和调试接口从中读取；本进程的Prometheus指标在monitor_metrics_port单独导出。
+
+用法:
+    python monitor_service.py    无界面单独运行（不弹登录窗口，事件记为未登录用户）
+    python main.py --workers 4   托盘程序运行监控，另起4个API工作进程
+"""
+
+import signal
+import threading
+import time
+import logging
+from datetime import datetime
+from typing import Dict, Optional
+
+from config import config
+from database import db
+from metrics import MetricsServer
+from partitions import PartitionMaintainer
+from server import register_service_metrics, usb_service
+
+logger = logging.getLogger(__name__)
+
+STATUS_NAME = 'monitor'
+
+
+def snapshot(service) -> Dict:
+    """监控服务的运行指标（心跳内容，与各调试接口的返回一致）"""
+    return {
+        'running': service.is_running(),
+        'monitors': service.get_monitor_stats(),
+        'hub': service.get_hub_stats(),
+        'logins': service.get_login_stats(),
+        'writer': service.get_writer_stats(),
+        'devices': service.get_device_stats()
+    }
+
+
+class Heartbeat(threading.Thread):
+    """定期把监控服务的运行指标写入service_status表"""
+    
+    def __init__(self, service, database, interval: Optional[float] = None):
+        super().__init__(daemon=True, name='Heartbeat')
+        self.service = service
+        self.db = database
+        self.interval = interval or float(config.get('heartbeat_interval', 2))  # type: ignore
+        self.started_at = datetime.now().isoformat()
+        self._stop_event = threading.Event()
+    
+    def run(self):
+        while True:
+            self.beat()
+            if self._stop_event.wait(self.interval):
+                break
+    
+    def beat(self):
+        try:
+            self.db.write_service_status(STATUS_NAME, self.started_at, snapshot(self.service))
+        except Exception as e:
+            logger.error(f"写入心跳失败: {e}")
+    
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout=5)
+        self.beat()  # 最后一次心跳记录已停止
+
+
+class MonitorProcess:
+    """监控进程：USB监控服务 + 分区维护 + 心跳 + 指标端口"""
+    
+    def __init__(self, service=usb_service, database=db):
+        self.service = service
+        self.db = database
+        self.maintainer = PartitionMaintainer(database)
+        self.heartbeat = Heartbeat(service, database)
+        register_service_metrics(service)
+        metrics_port = int(config.get('monitor_metrics_port', 8889))  # type: ignore
+        self.metrics_server = MetricsServer(str(config.get('host', 'localhost')), metrics_port) if metrics_port else None
+    
+    def start(self):
+        # 先完成建表/升级，API工作进程启动时不再并发初始化
+        self.db.ensure_initialized()
+        self.service.start()
+        self.maintainer.start()
+        self.heartbeat.start()
+        if self.metrics_server:
+            try:
+                self.metrics_server.start()
+                logger.info(f"📈 监控进程指标: http://{self.metrics_server.host}:{self.metrics_server.port}/metrics")
+            except OSError as e:
+                logger.error(f"指标端口启动失败: {e}")
+                self.metrics_server = None
+        logger.info(f"✅ 监控进程已启动 (心跳间隔: {self.heartbeat.interval}s)")
+    
+    def stop(self):
+        self.service.stop()
+        self.maintainer.stop()
+        self.heartbeat.stop()
+        if self.metrics_server:
+            self.metrics_server.stop()
+        logger.info("❌ 监控进程已停止")
+
+
+def read_status(database=db) -> Optional[Dict]:
+    """读取监控进程最近一次心跳；alive表示心跳未超过3个间隔"""
+    status = database.get_service_status(STATUS_NAME)
+    if status is None:
+        return None
+    interval = float(config.get('heartbeat_interval', 2))  # type: ignore
+    age = time.time() - (status['heartbeat_at'] or 0)
+    status['heartbeat_age'] = round(age, 3)
+    status['alive'] = bool(status['stats'].get('running')) and age < interval * 3
+    return status
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    
+    monitor = MonitorProcess()
+    monitor.start()
+    try:
+        while not stop_event.wait(1):
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.stop()
+
+
+if __name__ == '__main__':
+    main()
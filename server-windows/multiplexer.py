@@ -0,0 +1,487 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+通知多路复用 - 一个线程等待所有驱动器的变化通知，处理交给共享的工作线程池
+
+    Windows  所有目录句柄关联到同一个I/O完成端口，GetQueuedCompletionStatus按completion key分发
+    Linux    selectors（epoll）同时等待所有inotify描述符
+    其他     没有可等待句柄的通知源（回放等）由复用线程每隔mux_poll_interval秒轮询一次
+
+注册/注销以命令交给复用线程执行并立即唤醒它（向完成端口投递空完成包 / 向自管道写一字节），
+驱动器移除时句柄马上关闭，不用等任何超时。没有通知时复用线程一直阻塞，不会定时空转。
+
+同一驱动器的通知和拷贝完成回调由SerialDispatcher按到达顺序串行执行，不同驱动器之间并行。
+线程数与驱动器数量无关：1个复用线程 + 1个拷贝跟踪线程 + monitor_workers个工作线程。
+"""
+
+import os
+import sys
+import time
+import threading
+import selectors
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import config
+from copy_tracker import CopyCompletionTracker
+from notify_sources import Notification, NotificationSource
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[List[Notification]], None]
+
+WAKE_KEY = 0  # 完成端口上的唤醒包；通知源的key从1开始
+
+
+class _SelectorBackend:
+    """selectors实现：等待提供fileno()的通知源（inotify）"""
+    
+    name = 'selectors'
+    
+    def __init__(self):
+        self.selector = selectors.DefaultSelector()
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        os.set_blocking(self._wake_w, False)
+        self.selector.register(self._wake_r, selectors.EVENT_READ, WAKE_KEY)
+    
+    def accepts(self, source: NotificationSource) -> bool:
+        return source.fileno() is not None
+    
+    def add(self, key: int, source: NotificationSource):
+        self.selector.register(source.fileno(), selectors.EVENT_READ, key)  # type: ignore
+    
+    def remove(self, key: int, source: NotificationSource, pending: bool = True):
+        # 必须在关闭描述符之前注销
+        try:
+            self.selector.unregister(source.fileno())  # type: ignore
+        except (KeyError, ValueError):
+            pass
+    
+    def wait(self, timeout: Optional[float]) -> List[Tuple[int, object]]:
+        """等待最多timeout秒（None为一直等待），返回就绪的 (key, 附加信息)"""
+        ready = []
+        for selector_key, _ in self.selector.select(timeout):
+            if selector_key.data == WAKE_KEY:
+                try:
+                    while os.read(self._wake_r, 4096):
+                        pass
+                except BlockingIOError:
+                    pass
+            else:
+                ready.append((selector_key.data, None))
+        return ready
+    
+    def collect(self, source: NotificationSource, info) -> List[Notification]:
+        return source.read_ready()
+    
+    def wake(self):
+        try:
+            os.write(self._wake_w, b'\0')
+        except BlockingIOError:
+            pass  # 管道已满说明已有未处理的唤醒
+    
+    def close(self):
+        self.selector.close()
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+
+class _CompletionPortBackend:
+    """I/O完成端口实现：每个目录句柄上的ReadDirectoryChangesW完成后以其key排队"""
+    
+    name = 'iocp'
+    
+    WAIT_TIMEOUT = 258
+    
+    def __init__(self):
+        import win32file
+        self.port = win32file.CreateIoCompletionPort(win32file.INVALID_HANDLE_VALUE, None, 0, 1)
+        # 已关闭但还有挂起读取的通知源：收到其最后一个完成包之前缓冲区必须保持有效
+        self._retired: Dict[int, NotificationSource] = {}
+    
+    def accepts(self, source: NotificationSource) -> bool:
+        return source.supports_completion_port
+    
+    def add(self, key: int, source: NotificationSource):
+        source.attach(self.port, key)  # type: ignore
+    
+    def remove(self, key: int, source: NotificationSource, pending: bool = True):
+        if pending:
+            self._retired[key] = source
+    
+    def wait(self, timeout: Optional[float]) -> List[Tuple[int, object]]:
+        import win32event
+        import win32file
+        
+        ms = win32event.INFINITE if timeout is None else int(timeout * 1000)
+        ready = []
+        while True:
+            rc, num_bytes, key, overlapped = win32file.GetQueuedCompletionStatus(self.port, ms)
+            if overlapped is None and rc == self.WAIT_TIMEOUT:
+                break
+            if key in self._retired:
+                # 关闭时被取消的读取（或关闭前刚好完成的读取）
+                del self._retired[key]
+            elif key != WAKE_KEY:
+                ready.append((key, (rc, num_bytes)))
+            ms = 0  # 一次取完已经排队的完成包
+        return ready
+    
+    def collect(self, source: NotificationSource, info) -> List[Notification]:
+        rc, num_bytes = info
+        if rc:
+            raise OSError(rc, f'ReadDirectoryChangesW失败: {source.root_path}')
+        return source.complete(num_bytes)  # type: ignore
+    
+    def wake(self):
+        import win32file
+        win32file.PostQueuedCompletionStatus(self.port, 0, WAKE_KEY, None)
+    
+    def close(self):
+        import win32file
+        try:
+            win32file.CloseHandle(self.port)
+        except Exception:
+            pass
+
+
+def _close_quietly(source: NotificationSource):
+    try:
+        source.close()
+    except Exception:
+        pass
+
+
+def _create_backend():
+    return _CompletionPortBackend() if sys.platform == 'win32' else _SelectorBackend()
+
+
+class NotificationMultiplexer(threading.Thread):
+    """通知复用线程：在一个线程里等待所有已注册的通知源
+    
+    add()/remove()可在任意线程调用，实际注册和注销在复用线程中完成。
+    handler在复用线程中调用，只应把通知转交出去，不能做耗时处理。
+    注销后的通知源交给closer关闭：关闭inotify描述符要等内核回收所有watch
+    （每个十几毫秒），不应占用复用线程；停止时在复用线程中直接关闭。
+    """
+    
+    def __init__(self, poll_interval: Optional[float] = None,
+                 closer: Optional[Callable[[NotificationSource], None]] = None):
+        super().__init__(daemon=True, name='NotificationMultiplexer')
+        self.closer = closer
+        self.poll_interval = poll_interval if poll_interval is not None else float(config.get('mux_poll_interval', 0.05))  # type: ignore
+        self.backend = None
+        self.running = False
+        self._commands: deque = deque()
+        self._entries: Dict[int, Tuple[NotificationSource, Handler]] = {}  # 由后端等待的通知源
+        self._polled: Dict[int, Tuple[NotificationSource, Handler]] = {}  # 需要轮询的通知源
+        self._next_key = WAKE_KEY + 1
+        self._key_lock = threading.Lock()
+        
+        # 指标
+        self.wakeups = 0
+        self.batches = 0
+        self.notification_count = 0
+        self.error_count = 0
+    
+    def start(self):
+        """创建平台后端并启动复用线程"""
+        self.backend = _create_backend()
+        self.running = True
+        super().start()
+    
+    def add(self, source: NotificationSource, handler: Handler) -> int:
+        """注册一个已prepare()的通知源，返回用于remove()的key"""
+        with self._key_lock:
+            key = self._next_key
+            self._next_key += 1
+        self._commands.append(('add', key, source, handler))
+        self._wake()
+        return key
+    
+    def remove(self, key: int):
+        """注销并关闭通知源（立即唤醒复用线程执行，不等待完成）"""
+        self._commands.append(('remove', key))
+        self._wake()
+    
+    def stop(self, timeout: float = 5.0):
+        """停止复用线程，关闭所有通知源"""
+        self.running = False
+        self._wake()
+        if self.is_alive():
+            self.join(timeout)
+    
+    def _wake(self):
+        if self.backend is not None:
+            try:
+                self.backend.wake()
+            except Exception as e:
+                logger.debug(f"唤醒复用线程失败: {e}")
+    
+    def run(self):
+        """复用线程主循环"""
+        logger.info(f"通知复用线程已启动 ({self.backend.name})")
+        busy = False
+        while self.running:
+            self._apply_commands()
+            if busy:
+                timeout = 0.0  # 轮询的通知源上一轮还有数据，不等待直接再读
+            elif self._polled:
+                timeout = self.poll_interval
+            else:
+                timeout = None
+            
+            try:
+                ready = self.backend.wait(timeout)
+            except Exception as e:
+                logger.error(f"等待文件变化通知失败: {e}")
+                self.error_count += 1
+                ready = []
+                time.sleep(self.poll_interval)
+            self.wakeups += 1
+            
+            for key, info in ready:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                source, handler = entry
+                try:
+                    results = self.backend.collect(source, info)
+                except Exception as e:
+                    # 通常是设备已被拔出，等待设备移除通知后由监控服务注销
+                    logger.error(f"读取文件变化通知失败，停止监听 {source.root_path}: {e}")
+                    self.error_count += 1
+                    self._close(key, failed=True)
+                    continue
+                self._deliver(handler, results)
+            
+            busy = False
+            for key, (source, handler) in list(self._polled.items()):
+                try:
+                    results = source.read(0)
+                except Exception as e:
+                    logger.error(f"读取文件变化通知失败，停止监听 {source.root_path}: {e}")
+                    self.error_count += 1
+                    self._close(key)
+                    continue
+                if results:
+                    busy = True
+                    self._deliver(handler, results)
+        
+        self._apply_commands()
+        for key in list(self._entries) + list(self._polled):
+            self._close(key)
+        self.backend.close()
+        logger.info("通知复用线程已停止")
+    
+    def _apply_commands(self):
+        while self._commands:
+            command = self._commands.popleft()
+            if command[0] == 'remove':
+                self._close(command[1])
+                continue
+            
+            _, key, source, handler = command
+            if not self.backend.accepts(source):
+                self._polled[key] = (source, handler)
+                continue
+            try:
+                self.backend.add(key, source)
+            except Exception as e:
+                logger.error(f"注册通知源失败 {source.root_path}: {e}")
+                self.error_count += 1
+                self._close_source(source)
+                continue
+            self._entries[key] = (source, handler)
+    
+    def _close(self, key: int, failed: bool = False):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            # 读取出错时没有挂起的读取，完成端口不会再投递完成包
+            self.backend.remove(key, entry[0], pending=not failed)
+        else:
+            entry = self._polled.pop(key, None)
+        if entry is not None:
+            self._close_source(entry[0])
+    
+    def _close_source(self, source: NotificationSource):
+        if self.closer is not None and self.running:
+            self.closer(source)
+        else:
+            _close_quietly(source)
+    
+    def _deliver(self, handler: Handler, results: List[Notification]):
+        if not results:
+            return
+        self.batches += 1
+        self.notification_count += len(results)
+        try:
+            handler(results)
+        except Exception as e:
+            logger.error(f"分发文件变化通知失败: {e}")
+    
+    def get_stats(self) -> Dict:
+        """复用线程指标"""
+        return {
+            'backend': self.backend.name if self.backend else None,
+            'running': self.running,
+            'sources': len(self._entries),
+            'polled_sources': len(self._polled),
+            'wakeups': self.wakeups,
+            'batches': self.batches,
+            'notifications': self.notification_count,
+            'errors': self.error_count
+        }
+
+
+class SerialDispatcher:
+    """共享线程池上的按key串行执行器
+    
+    同一key的任务按提交顺序逐个执行（同一驱动器的状态不需要加锁），不同key之间并行。
+    一个key连续执行max_batch个任务后让出工作线程，繁忙的驱动器不会占满线程池。
+    """
+    
+    def __init__(self, workers: Optional[int] = None, max_batch: int = 64):
+        self.workers = workers or int(config.get('monitor_workers', 4))  # type: ignore
+        self.max_batch = max_batch
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='MonitorWorker')
+        self._queues: Dict[object, deque] = {}  # 有待执行或正在执行任务的key
+        self._lock = threading.Lock()
+        
+        # 指标
+        self.executed_count = 0
+        self.failed_count = 0
+    
+    def submit(self, key, fn: Callable, *args):
+        """提交任务，在key之前的任务全部完成后执行"""
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is not None:
+                queue.append((fn, args))
+                return
+            self._queues[key] = deque([(fn, args)])
+        self._schedule(key)
+    
+    def _schedule(self, key):
+        try:
+            self._executor.submit(self._drain, key)
+        except RuntimeError:
+            # 线程池已关闭（服务停止中）
+            with self._lock:
+                self._queues.pop(key, None)
+    
+    def _drain(self, key):
+        for _ in range(self.max_batch):
+            with self._lock:
+                queue = self._queues[key]
+                if not queue:
+                    del self._queues[key]
+                    return
+                fn, args = queue.popleft()
+            try:
+                fn(*args)
+            except Exception as e:
+                self.failed_count += 1
+                logger.error(f"监控任务执行失败: {e}")
+            self.executed_count += 1
+        # 排到线程池队尾，先让其他驱动器的任务执行
+        self._schedule(key)
+    
+    def pending_count(self) -> int:
+        """排队中的任务数"""
+        with self._lock:
+            return sum(len(queue) for queue in self._queues.values())
+    
+    def shutdown(self, wait: bool = False):
+        self._executor.shutdown(wait=wait)
+    
+    def get_stats(self) -> Dict:
+        return {
+            'workers': self.workers,
+            'active_keys': len(self._queues),
+            'queued': self.pending_count(),
+            'executed': self.executed_count,
+            'failed': self.failed_count
+        }
+
+
+class MonitorHub:
+    """多个驱动器监控器共用的复用线程、工作线程池和拷贝完成跟踪器"""
+    
+    def __init__(self, workers: Optional[int] = None,
+                 copy_tracker: Optional[CopyCompletionTracker] = None,
+                 poll_interval: Optional[float] = None):
+        self.dispatcher = SerialDispatcher(workers)
+        self.multiplexer = NotificationMultiplexer(
+            poll_interval, closer=lambda source: self.dispatcher.submit(source, _close_quietly, source)
+        )
+        self.copy_tracker = copy_tracker or CopyCompletionTracker()
+        self.running = False
+        self._keys: Dict[object, int] = {}  # 监控器 -> 通知源key
+        self._lock = threading.Lock()
+    
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self.running = True
+        self.multiplexer.start()
+        self.copy_tracker.start()
+    
+    def stop(self):
+        """停止所有监控（未完成的拷贝跟踪被丢弃）"""
+        with self._lock:
+            if not self.running:
+                return
+            self.running = False
+            self._keys.clear()
+        self.multiplexer.stop()
+        self.copy_tracker.stop()
+        self.dispatcher.shutdown(wait=False)
+    
+    def add(self, monitor):
+        """开始监控一个驱动器：在工作线程中打开通知源，就绪后交给复用线程"""
+        self.start()
+        self.dispatcher.submit(monitor, self._open, monitor)
+    
+    def _open(self, monitor):
+        if not monitor.running:
+            return
+        source = monitor._open_source()
+        if source is None:
+            return
+        key = self.multiplexer.add(
+            source, lambda results: self.dispatcher.submit(monitor, monitor._on_notifications, results)
+        )
+        with self._lock:
+            self._keys[monitor] = key
+        if not monitor.running:
+            # 打开期间已被停止
+            self._release(monitor)
+    
+    def remove(self, monitor):
+        """停止监控一个驱动器：立即关闭通知源，丢弃其尚未完成的拷贝跟踪"""
+        self._release(monitor)
+        self.copy_tracker.discard_prefix(monitor.drive_path)
+    
+    def _release(self, monitor):
+        with self._lock:
+            key = self._keys.pop(monitor, None)
+        if key is not None:
+            self.multiplexer.remove(key)
+    
+    def dispatch(self, monitor, fn: Callable, *args):
+        """在该监控器的串行队列中执行fn"""
+        self.dispatcher.submit(monitor, fn, *args)
+    
+    def get_stats(self) -> Dict:
+        """复用线程、工作线程池和拷贝跟踪器指标"""
+        return {
+            'monitors': len(self._keys),
+            'multiplexer': self.multiplexer.get_stats(),
+            'dispatcher': self.dispatcher.get_stats(),
+            'copy_tracker': self.copy_tracker.get_stats()
+        }
@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件变化通知源 - 屏蔽平台差异，FileMonitor只依赖统一的接口
+
+    Win32NotificationSource    Windows: ReadDirectoryChangesW
+    InotifyNotificationSource  Linux: inotify（递归为每个子目录添加watch）
+    ReplayNotificationSource   回放录制的事件轨迹，用于测试和基准
+    TraceRecorder              包装任意通知源，把读到的事件录制成轨迹文件
+
+通知统一为 (action, 相对路径) 列表，action取值与Win32 FILE_ACTION_*一致，
+相对路径使用本机分隔符os.sep。通知缓冲区溢出（部分事件已丢失）时产出
+(ACTION_OVERFLOW, '')，由调用方自行对账补救。
+
+除了阻塞的read(timeout)，通知源还提供供multiplexer.py统一等待的非阻塞接口:
+Win32通知源关联到I/O完成端口（attach/complete），inotify通知源提供可select的
+描述符（fileno/read_ready），其余通知源由复用线程轮询read(0)。
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import struct
+import select
+import logging
+from abc import ABC, abstractmethod
+from typing import List, Optional, Tuple
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# 与Win32 FILE_ACTION_*取值一致
+ACTION_OVERFLOW = 0
+ACTION_ADDED = 1
+ACTION_REMOVED = 2
+ACTION_MODIFIED = 3
+ACTION_RENAMED_OLD = 4
+ACTION_RENAMED_NEW = 5
+
+Notification = Tuple[int, str]
+
+
+class NotificationSource(ABC):
+    """通知源接口（子类必须实现open/read/close）"""
+    
+    supports_completion_port = False  # 是否可以关联到I/O完成端口
+    
+    def __init__(self, root_path: str):
+        self.root_path = root_path
+    
+    @abstractmethod
+    def open(self):
+        """开始监听"""
+    
+    def prepare(self):
+        """交给复用线程前的准备：完成耗时的初始化，但不发起读取（默认即open）"""
+        self.open()
+    
+    def fileno(self) -> Optional[int]:
+        """可以用select/epoll等待的描述符，没有时返回None"""
+        return None
+    
+    def read_ready(self) -> List[Notification]:
+        """fileno()可读后非阻塞地读取一批通知（默认即read(0)）"""
+        return self.read(0) or []
+    
+    @abstractmethod
+    def read(self, timeout: float) -> Optional[List[Notification]]:
+        """等待最多timeout秒，返回一批通知；超时返回None"""
+    
+    @abstractmethod
+    def close(self):
+        """停止监听并释放资源"""
+
+
+class Win32NotificationSource(NotificationSource):
+    """Windows ReadDirectoryChangesW通知源
+    
+    使用两块缓冲区交替读取：一次读取完成后先用另一块缓冲区重新发起读取，
+    再解析刚完成的那块，解析期间到达的通知不会因为没有挂起的读取而溢出。
+    读取完成但返回0字节表示内核缓冲区溢出，产出ACTION_OVERFLOW。
+    
+    单独使用时open()后由read()等待事件对象；由复用线程管理时先prepare()打开目录句柄，
+    再attach()关联到完成端口并发起读取，完成包到达后调用complete()。
+    """
+    
+    supports_completion_port = True
+    
+    def __init__(self, root_path: str, buffer_size: Optional[int] = None):
+        super().__init__(root_path)
+        self.buffer_size = buffer_size or int(config.get('notify_buffer_size', 65536))  # type: ignore
+        self.handle = None
+        self.overlapped = None
+        self.buffers = []
+        self.current = 0
+        self.armed = False
+    
+    def open(self):
+        import win32event
+        import win32file
+        
+        self.prepare()
+        self.overlapped = win32file.OVERLAPPED()
+        self.overlapped.hEvent = win32event.CreateEvent(None, False, False, None)
+        self._arm()
+    
+    def prepare(self):
+        """打开目录句柄、分配缓冲区（不发起读取）"""
+        import win32con
+        import win32file
+        
+        self.handle = win32file.CreateFile(
+            self.root_path,
+            win32con.GENERIC_READ,
+            win32con.FILE_SHARE_READ | win32con.FILE_SHARE_WRITE | win32con.FILE_SHARE_DELETE,
+            None,
+            win32con.OPEN_EXISTING,
+            win32con.FILE_FLAG_BACKUP_SEMANTICS | win32con.FILE_FLAG_OVERLAPPED,
+            None
+        )
+        self.buffers = [
+            win32file.AllocateReadBuffer(self.buffer_size),
+            win32file.AllocateReadBuffer(self.buffer_size)
+        ]
+        self.current = 0
+        # 监控文件创建（拷入）；大小/写入时间变化用于判断拷贝是否完成
+        self.notify_filter = (
+            win32con.FILE_NOTIFY_CHANGE_FILE_NAME |
+            win32con.FILE_NOTIFY_CHANGE_DIR_NAME |
+            win32con.FILE_NOTIFY_CHANGE_SIZE |
+            win32con.FILE_NOTIFY_CHANGE_LAST_WRITE
+        )
+    
+    def attach(self, port, key: int):
+        """关联到I/O完成端口并发起第一次读取；之后每次读取完成都以key排队到该端口"""
+        import win32file
+        
+        win32file.CreateIoCompletionPort(self.handle, port, key, 0)
+        self.overlapped = win32file.OVERLAPPED()
+        self._arm()
+    
+    def _arm(self):
+        import win32file
+        win32file.ReadDirectoryChangesW(  # type: ignore
+            self.handle, self.buffers[self.current], True,  # type: ignore
+            self.notify_filter,
+            self.overlapped
+        )
+        self.armed = True
+    
+    def read(self, timeout: float) -> Optional[List[Notification]]:
+        import win32event
+        import win32file
+        
+        if not self.armed:
+            self._arm()
+        
+        result = win32event.WaitForSingleObject(self.overlapped.hEvent, int(timeout * 1000))
+        if result != win32event.WAIT_OBJECT_0:
+            return None
+        
+        num_bytes = win32file.GetOverlappedResult(self.handle, self.overlapped, True)  # type: ignore
+        return self.complete(num_bytes)
+    
+    def complete(self, num_bytes: int) -> List[Notification]:
+        """一次读取已完成（num_bytes字节）：重新发起读取并解析结果"""
+        import win32file
+        
+        completed = self.buffers[self.current]
+        
+        # 先换另一块缓冲区重新发起读取，再解析已完成的缓冲区
+        self.current ^= 1
+        self.armed = False
+        self._arm()
+        
+        if num_bytes <= 0:
+            return [(ACTION_OVERFLOW, '')]
+        return list(win32file.FILE_NOTIFY_INFORMATION(completed, num_bytes))  # type: ignore
+    
+    def close(self):
+        import win32file
+        try:
+            win32file.CancelIo(self.handle)  # type: ignore
+            win32file.CloseHandle(self.handle)  # type: ignore
+        except Exception:
+            pass
+
+
+class InotifyNotificationSource(NotificationSource):
+    """Linux inotify通知源
+    
+    inotify不支持递归监听，这里在启动时为每个子目录添加watch，
+    并在收到子目录创建事件时为新目录补充watch。
+    """
+    
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    
+    WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    EVENT_HEADER = struct.Struct('iIII')
+    
+    def __init__(self, root_path: str, buffer_size: Optional[int] = None):
+        super().__init__(root_path)
+        self.buffer_size = buffer_size or int(config.get('notify_buffer_size', 65536))  # type: ignore
+        self.fd = -1
+        self.watches = {}  # wd -> 相对路径
+        self._libc = None
+    
+    def open(self):
+        import ctypes
+        import ctypes.util
+        
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1失败')
+        self._add_tree('')
+    
+    def _add_tree(self, rel_path: str):
+        """为目录及其所有子目录添加watch"""
+        self._add_watch(rel_path)
+        for root, dirs, _ in os.walk(os.path.join(self.root_path, rel_path)):
+            for name in dirs:
+                self._add_watch(os.path.relpath(os.path.join(root, name), self.root_path))
+    
+    def _add_watch(self, rel_path: str):
+        full_path = os.path.join(self.root_path, rel_path) if rel_path else self.root_path
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(full_path), self.WATCH_MASK)
+        if wd >= 0:
+            self.watches[wd] = rel_path
+    
+    def read(self, timeout: float) -> Optional[List[Notification]]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return None
+        return self.read_ready() or None
+    
+    def fileno(self) -> Optional[int]:
+        return self.fd if self.fd >= 0 else None
+    
+    def read_ready(self) -> List[Notification]:
+        try:
+            data = os.read(self.fd, self.buffer_size)
+        except BlockingIOError:
+            return []
+        return self._parse(data)
+    
+    def _parse(self, data: bytes) -> List[Notification]:
+        results: List[Notification] = []
+        offset = 0
+        while offset + self.EVENT_HEADER.size <= len(data):
+            wd, mask, _, name_len = self.EVENT_HEADER.unpack_from(data, offset)
+            offset += self.EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + name_len].rstrip(b'\0'))
+            offset += name_len
+            
+            if mask & self.IN_Q_OVERFLOW:
+                results.append((ACTION_OVERFLOW, ''))
+                continue
+            if mask & self.IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            if wd not in self.watches:
+                continue
+            
+            rel_path = os.path.join(self.watches[wd], name) if self.watches[wd] else name
+            if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                results.append((ACTION_ADDED, rel_path))
+                if mask & self.IN_ISDIR:
+                    self._add_tree(rel_path)
+            elif mask & (self.IN_DELETE | self.IN_MOVED_FROM):
+                results.append((ACTION_REMOVED, rel_path))
+            elif mask & (self.IN_MODIFY | self.IN_CLOSE_WRITE):
+                results.append((ACTION_MODIFIED, rel_path))
+        return results
+    
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+        self.watches.clear()
+
+
+class ReplayNotificationSource(NotificationSource):
+    """回放录制的事件轨迹
+    
+    轨迹文件每行一个JSON: {"t": 相对开始的秒数, "action": 1, "path": "dir\\\\file"}，
+    action为0表示一次缓冲区溢出；可选 "size"（文件字节数）/ "is_dir"。materialize为True时回放前在root_path下
+    真实创建对应的文件/目录，使下游的stat、扫描能拿到真实结果。
+    speed为回放倍速，0表示不等待、尽快回放。
+    """
+    
+    def __init__(self, root_path: str, trace_path: Optional[str] = None,
+                 records: Optional[List[dict]] = None,
+                 speed: float = 1.0, materialize: bool = True, batch_size: int = 64):
+        super().__init__(root_path)
+        self.trace_path = trace_path
+        self.records = records
+        self.speed = speed
+        self.materialize = materialize
+        self.batch_size = batch_size
+        self.position = 0
+        self.started_at = 0.0
+        self.exhausted = False
+    
+    def open(self):
+        if self.records is None:
+            with open(self.trace_path, 'r', encoding='utf-8') as f:  # type: ignore
+                self.records = [json.loads(line) for line in f if line.strip()]
+        self.position = 0
+        self.started_at = time.monotonic()
+    
+    def read(self, timeout: float) -> Optional[List[Notification]]:
+        records = self.records or []
+        if self.position >= len(records):
+            self.exhausted = True
+            time.sleep(timeout)
+            return None
+        
+        if self.speed > 0:
+            due = self.started_at + records[self.position].get('t', 0) / self.speed
+            wait = due - time.monotonic()
+            if wait > timeout:
+                time.sleep(timeout)
+                return None
+            if wait > 0:
+                time.sleep(wait)
+        
+        now = time.monotonic()
+        results: List[Notification] = []
+        while self.position < len(records) and len(results) < self.batch_size:
+            record = records[self.position]
+            if self.speed > 0 and self.started_at + record.get('t', 0) / self.speed > now:
+                break
+            rel_path = record.get('path', '').replace('\\', os.sep).replace('/', os.sep)
+            if self.materialize and rel_path:
+                self._materialize(record, rel_path)
+            results.append((int(record['action']), rel_path))
+            self.position += 1
+        return results
+    
+    def _materialize(self, record: dict, rel_path: str):
+        """在root_path下创建/删除轨迹中的文件"""
+        full_path = os.path.join(self.root_path, rel_path)
+        try:
+            if record['action'] in (ACTION_ADDED, ACTION_RENAMED_NEW):
+                if record.get('is_dir'):
+                    os.makedirs(full_path, exist_ok=True)
+                else:
+                    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+                    with open(full_path, 'wb') as f:
+                        f.truncate(int(record.get('size', 0)))
+            elif record['action'] in (ACTION_REMOVED, ACTION_RENAMED_OLD):
+                if os.path.isdir(full_path):
+                    os.rmdir(full_path)
+                elif os.path.exists(full_path):
+                    os.remove(full_path)
+        except OSError as e:
+            logger.debug(f"回放创建文件失败: {full_path}: {e}")
+    
+    def close(self):
+        pass
+
+
+def drive_trace_path(trace_path: str, root_path: str) -> str:
+    """每个驱动器单独的轨迹文件：trace.jsonl + E:\\ -> trace_E.jsonl"""
+    tag = re.sub(r'[^0-9A-Za-z]+', '_', root_path).strip('_') or 'root'
+    base, ext = os.path.splitext(trace_path)
+    return f'{base}_{tag}{ext}'
+
+
+class TraceRecorder(NotificationSource):
+    """录制包装器：透传内部通知源的事件，同时写入轨迹文件供回放
+    
+    同时监控多个驱动器时各自录制到drive_trace_path()给出的文件，互不覆盖。
+    """
+    
+    def __init__(self, source: NotificationSource, trace_path: str):
+        super().__init__(source.root_path)
+        self.source = source
+        self.trace_path = drive_trace_path(trace_path, source.root_path)
+        self.started_at = 0.0
+        self._file = None
+    
+    @property
+    def supports_completion_port(self):  # type: ignore
+        return self.source.supports_completion_port
+    
+    def open(self):
+        self.source.open()
+        self._start_trace()
+    
+    def prepare(self):
+        self.source.prepare()
+        self._start_trace()
+    
+    def _start_trace(self):
+        self._file = open(self.trace_path, 'w', encoding='utf-8')
+        self.started_at = time.monotonic()
+    
+    def attach(self, port, key: int):
+        self.source.attach(port, key)  # type: ignore
+    
+    def complete(self, num_bytes: int) -> List[Notification]:
+        return self._record(self.source.complete(num_bytes))  # type: ignore
+    
+    def fileno(self) -> Optional[int]:
+        return self.source.fileno()
+    
+    def read_ready(self) -> List[Notification]:
+        return self._record(self.source.read_ready())
+    
+    def read(self, timeout: float) -> Optional[List[Notification]]:
+        return self._record(self.source.read(timeout))
+    
+    def _record(self, results: Optional[List[Notification]]):
+        """把一批通知写入轨迹文件，原样返回"""
+        if results and self._file:
+            t = round(time.monotonic() - self.started_at, 6)
+            for action, rel_path in results:
+                record = {'t': t, 'action': action, 'path': rel_path}
+                full_path = os.path.join(self.root_path, rel_path)
+                if action in (ACTION_ADDED, ACTION_RENAMED_NEW) and os.path.isdir(full_path):
+                    record['is_dir'] = True
+                elif action in (ACTION_ADDED, ACTION_RENAMED_NEW) and os.path.exists(full_path):
+                    record['size'] = os.path.getsize(full_path)
+                self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self._file.flush()
+        return results
+    
+    def close(self):
+        self.source.close()
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+def create_notification_source(root_path: str) -> NotificationSource:
+    """按配置/平台创建通知源（notify_backend: auto / win32 / inotify / replay）"""
+    backend = str(config.get('notify_backend', 'auto')).lower()
+    if backend == 'auto':
+        backend = 'win32' if sys.platform == 'win32' else 'inotify'
+    
+    if backend == 'win32':
+        source: NotificationSource = Win32NotificationSource(root_path)
+    elif backend == 'inotify':
+        source = InotifyNotificationSource(root_path)
+    elif backend == 'replay':
+        # 优先回放该驱动器自己的录制轨迹
+        trace_path = str(config.get('notify_replay_trace', ''))
+        if os.path.exists(drive_trace_path(trace_path, root_path)):
+            trace_path = drive_trace_path(trace_path, root_path)
+        source = ReplayNotificationSource(
+            root_path,
+            trace_path=trace_path,
+            speed=float(config.get('notify_replay_speed', 1.0))  # type: ignore
+        )
+    else:
+        raise ValueError(f"未知的通知源类型: {backend}")
+    
+    record_path = config.get('notify_record_trace')
+    if record_path:
+        source = TraceRecorder(source, str(record_path))
+    return source
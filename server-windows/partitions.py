@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按月分区的事件归档
+
+hot_months大于0时，主库只保留最近hot_months个月的事件。更早的月份整月导出为独立的
+SQLite文件（事件、文件夹快照、全文索引），gzip压缩后存放在 database/archive/events_YYYY_MM.db.gz。
+hot_months默认为0：不归档，所有事件留在主库，需要时在config.json中开启。
+统计汇总表仍在主库，统计查询不需要打开归档。
+
+查询归档时把对应月份解压到缓存目录，以只读方式打开；缓存最多保留
+archive_cache_months个月，按最近使用淘汰。
+"""
+
+import gzip
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+def month_of(timestamp: str) -> str:
+    """ISO时间 -> 'YYYY-MM'"""
+    return timestamp[:7]
+
+
+def add_months(month: str, count: int) -> str:
+    """'YYYY-MM' 加减若干个月"""
+    year, mon = int(month[:4]), int(month[5:7])
+    index = year * 12 + (mon - 1) + count
+    return f'{index // 12:04d}-{index % 12 + 1:02d}'
+
+
+def current_month() -> str:
+    return datetime.now().strftime('%Y-%m')
+
+
+def month_range(month: str) -> Tuple[str, str]:
+    """月份 -> 时间范围 [开始, 结束)，可直接与ISO时间字符串比较"""
+    return f'{month}-01', f'{add_months(month, 1)}-01'
+
+
+class ArchiveStore:
+    """归档文件及其解压缓存"""
+    
+    def __init__(self, directory: Optional[Path] = None, cache_months: Optional[int] = None):
+        if directory is None:
+            directory = Path(__file__).parent / 'database' / 'archive'
+        self.directory = Path(directory)
+        self.cache_dir = self.directory / 'cache'
+        self.cache_months = cache_months or int(config.get('archive_cache_months', 6))  # type: ignore
+        self._lock = threading.Lock()
+        
+        self.cache_hits = 0
+        self.cache_misses = 0
+    
+    def path(self, month: str) -> Path:
+        return self.directory / f"events_{month.replace('-', '_')}.db.gz"
+    
+    def months(self) -> List[str]:
+        """已归档的月份（新 -> 旧）"""
+        if not self.directory.exists():
+            return []
+        months = [
+            p.name[len('events_'):len('events_') + 7].replace('_', '-')
+            for p in self.directory.glob('events_*.db.gz')
+        ]
+        return sorted(months, reverse=True)
+    
+    def exists(self, month: str) -> bool:
+        return self.path(month).exists()
+    
+    def store(self, month: str, db_path: Path) -> int:
+        """压缩SQLite文件保存为该月归档（原子替换），返回压缩后大小"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        target = self.path(month)
+        tmp = target.with_name(target.name + '.tmp')
+        with open(db_path, 'rb') as src, gzip.open(tmp, 'wb', compresslevel=6) as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        with open(tmp, 'rb') as f:
+            os.fsync(f.fileno())
+        os.replace(tmp, target)
+        self._drop_cache(month)
+        return target.stat().st_size
+    
+    def extract(self, month: str, db_path: Path):
+        """把归档解压为可写的SQLite文件（合并迟到的事件时使用）"""
+        with gzip.open(self.path(month), 'rb') as src, open(db_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    
+    def remove(self, month: str):
+        """删除该月归档及其缓存"""
+        self._drop_cache(month)
+        try:
+            self.path(month).unlink()
+        except FileNotFoundError:
+            pass
+    
+    def connect(self, month: str) -> sqlite3.Connection:
+        """以只读方式打开该月归档（必要时先解压到缓存），调用方负责关闭"""
+        cached = self._cached_file(month)
+        conn = sqlite3.connect(f'file:{cached.as_posix()}?mode=ro&immutable=1', uri=True, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        return conn
+    
+    def _cached_file(self, month: str) -> Path:
+        archive = self.path(month)
+        cached = self.cache_dir / f"events_{month.replace('-', '_')}.db"
+        with self._lock:
+            if cached.exists() and cached.stat().st_mtime >= archive.stat().st_mtime:
+                self.cache_hits += 1
+                os.utime(cached)  # 记录最近使用时间
+                return cached
+            
+            self.cache_misses += 1
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            start = time.perf_counter()
+            tmp = cached.with_name(cached.name + '.tmp')
+            with gzip.open(archive, 'rb') as src, open(tmp, 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.replace(tmp, cached)
+            logger.info(f"归档 {month} 已解压到缓存，用时 {time.perf_counter() - start:.2f}s")
+            self._evict(keep=cached)
+            return cached
+    
+    def _evict(self, keep: Path):
+        """缓存超过上限时删除最久未使用的文件（调用方持有_lock）"""
+        files = sorted(self.cache_dir.glob('events_*.db'), key=lambda p: p.stat().st_mtime, reverse=True)
+        for path in files[self.cache_months:]:
+            if path == keep:
+                continue
+            try:
+                path.unlink()
+            except OSError as e:
+                # Windows下仍被打开的文件无法删除，下次再淘汰
+                logger.debug(f"删除归档缓存失败: {path} - {e}")
+    
+    def _drop_cache(self, month: str):
+        with self._lock:
+            try:
+                (self.cache_dir / f"events_{month.replace('-', '_')}.db").unlink()
+            except OSError:
+                pass
+    
+    def get_stats(self) -> Dict:
+        months = self.months()
+        cached = list(self.cache_dir.glob('events_*.db')) if self.cache_dir.exists() else []
+        return {
+            'archived_months': months,
+            'archive_bytes': sum(self.path(m).stat().st_size for m in months),
+            'cached_months': len(cached),
+            'cache_bytes': sum(p.stat().st_size for p in cached),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses
+        }
+
+
+class PartitionMaintainer(threading.Thread):
+    """定期归档冷数据并执行保留策略"""
+    
+    def __init__(self, database, interval_hours: Optional[float] = None):
+        super().__init__(daemon=True, name='PartitionMaintainer')
+        self.db = database
+        self.interval = (interval_hours if interval_hours is not None
+                         else float(config.get('archive_interval_hours', 24))) * 3600  # type: ignore
+        self._stop_event = threading.Event()
+    
+    def start(self):
+        if self.interval <= 0 or (self.db.hot_months <= 0 and self.db.retention_months <= 0):
+            logger.info("自动归档已关闭")
+            return
+        super().start()
+    
+    def run(self):
+        # 启动后稍等片刻再执行第一次，避开启动时的写入高峰
+        delay = min(60.0, self.interval)
+        while not self._stop_event.wait(delay):
+            try:
+                self.db.archive_cold_months()
+                self.db.apply_retention()
+            except Exception as e:
+                logger.error(f"分区维护失败: {e}")
+            delay = self.interval
+    
+    def stop(self):
+        self._stop_event.set()
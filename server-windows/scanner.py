@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件夹结构扫描器 - 基于os.scandir，子目录在线程池中并行读取，结果按需逐个产出
+"""
+
+import os
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+def _scan_dir(dir_path: str) -> Tuple[List[Dict], List[str], List[str]]:
+    """读取单个目录：返回 (文件列表, 子文件夹名, 需要继续深入的子文件夹名)"""
+    files: List[Dict] = []
+    subfolders: List[str] = []
+    descend: List[str] = []
+    
+    try:
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        subfolders.append(entry.name)
+                        # 与os.walk一致：不进入符号链接目录
+                        if not entry.is_symlink():
+                            descend.append(entry.name)
+                    else:
+                        # Windows下DirEntry.stat()直接使用目录枚举时拿到的信息，无需再次访问文件
+                        files.append({
+                            'name': entry.name,
+                            'size': entry.stat().st_size,
+                            'type': os.path.splitext(entry.name)[1].lower() or '无'
+                        })
+                except OSError:
+                    pass
+    except OSError as e:
+        logger.debug(f"读取目录失败: {dir_path}: {e}")
+    
+    return files, subfolders, descend
+
+
+class FolderScanner:
+    """文件夹结构扫描器
+    
+    iter_structure()按与os.walk相同的先序顺序逐个产出目录信息
+    {'path', 'files', 'subfolders'}，调用方可以边扫描边统计、写日志。
+    后续子目录会提前提交到线程池读取（最多prefetch个在途），
+    max_entries/max_depth限制扫描规模，超出时truncated置为True。
+    """
+    
+    def __init__(self, max_workers: Optional[int] = None,
+                 max_entries: Optional[int] = None,
+                 max_depth: Optional[int] = None,
+                 prefetch: Optional[int] = None):
+        self.max_workers = max_workers or int(config.get('scan_max_workers', 4))  # type: ignore
+        self.max_entries = max_entries if max_entries is not None else int(config.get('scan_max_entries', 500000))  # type: ignore
+        self.max_depth = max_depth if max_depth is not None else int(config.get('scan_max_depth', 0))  # type: ignore
+        self.prefetch = prefetch or self.max_workers * 4
+        self.truncated = False
+        self.entries = 0
+    
+    def iter_structure(self, folder_path: str) -> Iterator[Dict]:
+        """逐个产出目录信息（0表示不限制条目数/深度）"""
+        self.truncated = False
+        self.entries = 0
+        
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='FolderScanner')
+        inflight = 1
+        # 栈元素: (相对路径, 深度, 预读任务或None)
+        stack: List[Tuple[str, int, Optional[Future]]] = [('', 0, pool.submit(_scan_dir, folder_path))]
+        
+        try:
+            while stack:
+                rel_path, depth, future = stack.pop()
+                if future is None:
+                    files, subfolders, descend = _scan_dir(os.path.join(folder_path, rel_path))
+                else:
+                    inflight -= 1
+                    files, subfolders, descend = future.result()
+                
+                # 条目数上限
+                if self.max_entries:
+                    remaining = self.max_entries - self.entries
+                    if len(files) + len(subfolders) > remaining:
+                        self.truncated = True
+                        files = files[:max(0, remaining)]
+                        subfolders = subfolders[:max(0, remaining - len(files))]
+                        descend = []
+                        stack.clear()
+                self.entries += len(files) + len(subfolders)
+                
+                yield {
+                    'path': rel_path,
+                    'files': files,
+                    'subfolders': subfolders
+                }
+                
+                # 深度上限
+                if self.max_depth and depth + 1 > self.max_depth:
+                    if descend:
+                        self.truncated = True
+                    continue
+                
+                children = []
+                for name in descend:
+                    child_path = os.path.join(rel_path, name)
+                    child_future = None
+                    if inflight < self.prefetch:
+                        child_future = pool.submit(_scan_dir, os.path.join(folder_path, child_path))
+                        inflight += 1
+                    children.append((child_path, depth + 1, child_future))
+                
+                # 逆序入栈，保证第一个子目录最先出栈
+                stack.extend(reversed(children))
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+    
+    def scan(self, folder_path: str, on_folder: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """完整扫描，返回结构和统计信息；每读完一个目录调用一次on_folder（如写结构日志）"""
+        structure = []
+        total_files = 0
+        total_folders = 0
+        total_size = 0
+        
+        try:
+            for folder_info in self.iter_structure(folder_path):
+                structure.append(folder_info)
+                if on_folder:
+                    on_folder(folder_info)
+                total_folders += len(folder_info['subfolders'])
+                total_files += len(folder_info['files'])
+                total_size += sum(f['size'] for f in folder_info['files'])
+        except Exception as e:
+            logger.error(f"扫描文件夹结构失败: {e}")
+        
+        return {
+            'structure': structure,
+            'total_files': total_files,
+            'total_folders': total_folders,
+            'total_size': total_size,
+            'truncated': self.truncated
+        }
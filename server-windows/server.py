@@ -5,118 +5,208 @@ USB监控核心服务 - 专注于文件拷入监控
 """
 
 import os
+import sys
 import time
 import threading
 import logging
-from typing import Dict
+from typing import Dict, List, Optional
 from datetime import datetime
 from pathlib import Path
 
-# Windows特定模块
-import win32api
-import win32file
-import win32con
-import win32event
-import wmi
+# Windows特定模块（其他平台上只有文件监控管线可用，便于测试和基准）
+# wmi导入较慢（会加载COM），只在判定固定磁盘时才导入
+if sys.platform == 'win32':
+    import win32api
+    import win32file
+else:
+    win32api = win32file = None
 
+from config import config
 from database import db
+from event_writer import EventWriter
+from event_bus import bus
+from scanner import FolderScanner
+from copy_tracker import CopyCompletionTracker
+from dedup import TimedDedupSet
+from multiplexer import MonitorHub
+from notify_sources import (ACTION_ADDED, ACTION_OVERFLOW, ACTION_REMOVED,
+                            Notification, NotificationSource, create_notification_source)
+from device_watch import DeviceWatcher, create_device_watcher
+from drive_cache import DriveClassificationCache
+from metrics import CallbackCounter, Counter, Gauge, Histogram
 
 logger = logging.getLogger(__name__)
 
+# 监控管线指标
+NOTIFICATIONS = Counter('usbmon_notifications_total', '收到的文件变化通知数', ['drive'])
+OVERFLOWS = Counter('usbmon_notification_overflows_total', '通知缓冲区溢出次数', ['drive'])
+COPY_INS = Counter('usbmon_copy_ins_total', '记录的拷入事件数', ['drive', 'kind'])
+COPY_SETTLE_SECONDS = Histogram('usbmon_copy_settle_seconds', '从发现拷入到拷贝完成的等待时间',
+                                buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600))
+COPY_HANDLE_SECONDS = Histogram('usbmon_copy_handle_seconds', '拷贝完成后处理（扫描、记录）耗时', ['kind'])
+SCAN_SECONDS = Histogram('usbmon_folder_scan_seconds', '文件夹结构扫描耗时')
+SCAN_FILES = Histogram('usbmon_folder_scan_files', '文件夹扫描到的文件数',
+                       buckets=(1, 10, 100, 1000, 10000, 100000, 1000000))
+SCAN_BYTES = Histogram('usbmon_folder_scan_bytes', '文件夹总大小（字节）',
+                       buckets=(2 ** 20, 2 ** 24, 2 ** 27, 2 ** 30, 2 ** 33, 2 ** 36, 2 ** 40))
+MONITOR_READY_SECONDS = Histogram('usbmon_insert_to_monitoring_seconds', '从检测到插入到开始监听拷入的耗时',
+                                  buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5))
+LOGIN_WAIT_SECONDS = Histogram('usbmon_login_wait_seconds', '从插入到登录完成（或超时、取消、拔出）的耗时',
+                               ['outcome'], buckets=(1, 2.5, 5, 10, 30, 60, 120, 300, 600))
 
-class FileMonitor(threading.Thread):
-    """文件系统监控器 - 只监控拷入操作"""
+
+class FileMonitor:
+    """文件系统监控器 - 只监控拷入操作
+    
+    不独占线程：通知由MonitorHub的复用线程统一等待，通知处理和拷贝完成后的
+    扫描、记录在共享工作线程池中按驱动器串行执行。没有指定hub时start()创建私有的hub。
+    """
     
-    def __init__(self, drive_letter: str, callback):
-        super().__init__(daemon=True)
+    def __init__(self, drive_letter: str, callback, root_path: Optional[str] = None,
+                 source: Optional[NotificationSource] = None, hub: Optional[MonitorHub] = None):
         self.drive_letter = drive_letter
-        self.drive_path = f"{drive_letter}:\\"
+        self.drive_path = root_path or f"{drive_letter}:\\"
         self.callback = callback
+        self.source = source  # 通知源，默认按平台创建
+        self.hub = hub
         self.running = False
-        self.processed_items = set()  # 防止重复处理
+        self.processed_items = TimedDedupSet()  # 防止重复处理（有界，超过时间窗口自动过期）
         self.pending_folders = {}  # 待处理的文件夹（用于合并子项）
         self.folder_wait_time = 1.0  # 文件夹等待时间（秒）
+        self.copy_tracker = hub.copy_tracker if hub else CopyCompletionTracker()  # 等待拷贝完成，不阻塞通知处理
+        self.known_items = set()  # 根目录现有的顶层项目（溢出后对账用）
+        self.notification_count = 0  # 收到的通知数
+        self.overflow_count = 0  # 通知缓冲区溢出次数
+        self.recovered_count = 0  # 溢出后对账找回的拷入项目数
+        self.started_at: Optional[float] = None  # start()调用时间（默认即检测到插入的时间）
+        self._owns_hub = False
     
-    def run(self):
-        """运行监控"""
+    def start(self, started_at: Optional[float] = None):
+        """开始监控（注册到hub后立即返回）"""
+        self.started_at = started_at or time.monotonic()
+        if self.hub is None:
+            self.hub = MonitorHub(workers=1, copy_tracker=self.copy_tracker)
+            self._owns_hub = True
         self.running = True
         logger.info(f"开始监控拷入: {self.drive_path}")
-        
+        self.hub.add(self)
+    
+    def _open_source(self) -> Optional[NotificationSource]:
+        """打开通知源并记录根目录基线（在工作线程中执行），失败返回None"""
+        source = self.source or create_notification_source(self.drive_path)
         try:
-            handle = win32file.CreateFile(
-                self.drive_path,
-                win32con.GENERIC_READ,
-                win32con.FILE_SHARE_READ | win32con.FILE_SHARE_WRITE | win32con.FILE_SHARE_DELETE,
-                None,
-                win32con.OPEN_EXISTING,
-                win32con.FILE_FLAG_BACKUP_SEMANTICS | win32con.FILE_FLAG_OVERLAPPED,
-                None
-            )
-            
-            overlapped = win32file.OVERLAPPED()
-            overlapped.hEvent = win32event.CreateEvent(None, False, False, None)
-            buffer = win32file.AllocateReadBuffer(8192)
-            
-            # 只监控文件创建（拷入）
-            win32file.ReadDirectoryChangesW(  # type: ignore
-                handle, buffer, True,  # type: ignore
-                win32con.FILE_NOTIFY_CHANGE_FILE_NAME |
-                win32con.FILE_NOTIFY_CHANGE_DIR_NAME,
-                overlapped
-            )
-            
-            while self.running:
-                result = win32event.WaitForSingleObject(overlapped.hEvent, 1000)
-                
-                if result == win32event.WAIT_OBJECT_0:
-                    num_bytes = win32file.GetOverlappedResult(handle, overlapped, True)  # type: ignore
-                    if num_bytes > 0:
-                        results = win32file.FILE_NOTIFY_INFORMATION(buffer, num_bytes)  # type: ignore
-                        
-                        for action, filename in results:
-                            # 只处理创建操作（action=1表示创建）
-                            if action == 1:
-                                self._handle_copy_in(filename)
-                        
-                        if self.running:
-                            win32file.ReadDirectoryChangesW(  # type: ignore
-                                handle, buffer, True,  # type: ignore
-                                win32con.FILE_NOTIFY_CHANGE_FILE_NAME |
-                                win32con.FILE_NOTIFY_CHANGE_DIR_NAME,
-                                overlapped
-                            )
-        
+            source.prepare()
         except Exception as e:
             logger.error(f"文件监控错误: {e}")
-        finally:
             try:
-                win32file.CancelIo(handle)  # type: ignore
-                win32file.CloseHandle(handle)  # type: ignore
-            except:
+                source.close()
+            except Exception:
                 pass
+            return None
+        
+        # 监听建立后再记录基线，之间新建的项目仍会收到通知
+        self.known_items = self._list_root()
+        if self.started_at is not None:
+            MONITOR_READY_SECONDS.observe(time.monotonic() - self.started_at)
+        return source
+    
+    def _on_notifications(self, results: List[Notification]):
+        """处理一批变化通知（同一驱动器的批次按到达顺序串行执行）"""
+        if not self.running:
+            return
+        for action, filename in results:
+            self._on_notification(action, filename)
+    
+    def _on_notification(self, action: int, filename: str):
+        """分发一条变化通知"""
+        self.notification_count += 1
+        NOTIFICATIONS.inc(self.drive_letter)
+        if action == ACTION_OVERFLOW:
+            self._recover_overflow()
+            return
+        
+        top_level = filename.split(os.sep, 1)[0]
+        
+        # 只有顶层项目的创建（action=1）才是一次拷入
+        if action == ACTION_ADDED and top_level == filename:
+            self.known_items.add(filename)
+            self._handle_copy_in(filename)
+        elif action == ACTION_REMOVED and top_level == filename:
+            # 顶层项目被删除，不再等待其拷贝完成；之后同名拷入重新记录
+            self.known_items.discard(filename)
+            self.processed_items.discard(os.path.join(self.drive_path, filename))
+            self.copy_tracker.discard(os.path.join(self.drive_path, filename))
+        else:
+            # 子项创建/大小变化/写入：顶层项目仍在拷贝中
+            self.copy_tracker.touch(os.path.join(self.drive_path, top_level))
+    
+    def _list_root(self) -> set:
+        """列出根目录下的顶层项目"""
+        try:
+            return set(os.listdir(self.drive_path))
+        except OSError as e:
+            logger.error(f"读取根目录失败: {e}")
+            return set()
+    
+    def _recover_overflow(self):
+        """通知缓冲区溢出：重新扫描根目录，把基线之外的新项目补记为拷入"""
+        self.overflow_count += 1
+        OVERFLOWS.inc(self.drive_letter)
+        current = self._list_root()
+        missed = current - self.known_items
+        self.known_items = current
+        logger.warning(f"⚠️ {self.drive_path} 通知缓冲区溢出，对账找回 {len(missed)} 个项目")
+        
+        for filename in sorted(missed):
+            self.recovered_count += 1
+            self._handle_copy_in(filename)
+    
+    def get_stats(self) -> Dict:
+        """监控器指标"""
+        return {
+            'drive': self.drive_letter,
+            'path': self.drive_path,
+            'running': self.running,
+            'notifications': self.notification_count,
+            'overflows': self.overflow_count,
+            'recovered_items': self.recovered_count,
+            'processed_items': len(self.processed_items),
+            'dedup': self.processed_items.get_stats(),
+            'pending_copies': self.copy_tracker.pending_count(self.drive_path)
+        }
     
     def _handle_copy_in(self, filename: str):
         """处理拷入操作 - 只处理顶层项目"""
         try:
             full_path = os.path.join(self.drive_path, filename)
             
-            # 防止重复处理
-            if full_path in self.processed_items:
+            # 关键：如果路径包含分隔符，说明是子项，直接忽略
+            if os.sep in filename:
                 return
             
-            # 关键：如果路径包含\\，说明是子项，直接忽略
-            if '\\' in filename:
+            # 防止重复处理（时间窗口内的重复通知）
+            if not self.processed_items.add(full_path):
                 return
             
-            self.processed_items.add(full_path)
-            
-            # 等待文件完全拷入
-            time.sleep(0.5)
-            
+            # 等待文件完全拷入（跟踪器在大小稳定后回调，扫描、记录回到本驱动器的串行队列执行）
+            tracked_at = time.monotonic()
+            self.copy_tracker.track(full_path, lambda: self.hub.dispatch(
+                self, self._on_copy_settled, full_path, filename, tracked_at))
+        
+        except Exception as e:
+            logger.error(f"处理拷入失败: {e}")
+    
+    def _on_copy_settled(self, full_path: str, filename: str, tracked_at: Optional[float] = None):
+        """拷贝完成后记录拷入事件"""
+        try:
             if not os.path.exists(full_path):
                 return
             
+            start = time.monotonic()
+            if tracked_at is not None:
+                COPY_SETTLE_SECONDS.observe(start - tracked_at)
             is_folder = os.path.isdir(full_path)
+            kind = 'folder' if is_folder else 'file'
             
             if is_folder:
                 # 处理文件夹拷入
@@ -124,6 +214,9 @@ class FileMonitor(threading.Thread):
             else:
                 # 处理文件拷入
                 self._handle_file(full_path, filename)
+            
+            COPY_HANDLE_SECONDS.observe(time.monotonic() - start, kind)
+            COPY_INS.inc(self.drive_letter, kind)
         
         except Exception as e:
             logger.error(f"处理拷入失败: {e}")
@@ -156,11 +249,8 @@ class FileMonitor(threading.Thread):
     def _handle_folder(self, full_path: str, foldername: str):
         """处理文件夹拷入 - 完整索引结构"""
         try:
-            # 扫描文件夹结构
-            structure = self._scan_folder_structure(full_path)
-            
-            # 创建日志文件，记录完整文件夹结构
-            self._create_folder_structure_log(foldername, full_path, structure)
+            # 边扫描边写结构日志，扫描完成即得到统计信息
+            structure = self._scan_and_log_folder(foldername, full_path)
             
             event = {
                 'timestamp': datetime.now().isoformat(),
@@ -177,137 +267,107 @@ class FileMonitor(threading.Thread):
             }
             
             self.callback(event)
-            logger.info(f"📁 文件夹拷入: {foldername} (文件:{structure['total_files']}, 文件夹:{structure['total_folders']}, {self._format_size(structure['total_size'])})")
+            truncated = " [已截断]" if structure['truncated'] else ""
+            logger.info(f"📁 文件夹拷入: {foldername} (文件:{structure['total_files']}, 文件夹:{structure['total_folders']}, {self._format_size(structure['total_size'])}){truncated}")
         
         except Exception as e:
             logger.error(f"处理文件夹失败: {e}")
     
-    def _scan_folder_structure(self, folder_path: str) -> Dict:
-        """扫描文件夹完整结构"""
-        structure = []
-        total_files = 0
-        total_folders = 0
-        total_size = 0
+    def _scan_and_log_folder(self, foldername: str, folder_path: str) -> Dict:
+        """流式扫描文件夹：每读完一个目录就写入结构日志，统计信息写在日志末尾"""
+        scanner = FolderScanner()
+        scan_start = time.monotonic()
         
+        log_file = None
+        f = None
         try:
-            for root, dirs, files in os.walk(folder_path):
-                # 相对路径
-                rel_path = os.path.relpath(root, folder_path)
-                if rel_path == '.':
-                    rel_path = ''
-                
-                # 文件夹信息
-                folder_info = {
-                    'path': rel_path,
-                    'files': [],
-                    'subfolders': dirs.copy()
-                }
-                
-                # 统计子文件夹
-                total_folders += len(dirs)
-                
-                # 文件信息
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    try:
-                        file_size = os.path.getsize(file_path)
-                        file_ext = os.path.splitext(file)[1].lower() or '无'
-                        
-                        folder_info['files'].append({
-                            'name': file,
-                            'size': file_size,
-                            'type': file_ext
-                        })
-                        
-                        total_files += 1
-                        total_size += file_size
-                    except:
-                        pass
-                
-                structure.append(folder_info)
-        
+            log_file = self._folder_log_path(foldername)
+            f = open(log_file, 'w', encoding='utf-8')
+            self._write_log_header(f, foldername, folder_path)
+            f.write("文件夹结构树:\n")
+            f.write("="*80 + "\n\n")
         except Exception as e:
-            logger.error(f"扫描文件夹结构失败: {e}")
+            logger.error(f"创建文件夹结构日志失败: {e}")
+            f = None
         
-        return {
-            'structure': structure,
-            'total_files': total_files,
-            'total_folders': total_folders,
-            'total_size': total_size
-        }
+        write_block = (lambda folder_info: self._write_folder_block(f, folder_info)) if f else None
+        result = scanner.scan(folder_path, on_folder=write_block)
+        SCAN_SECONDS.observe(time.monotonic() - scan_start)
+        SCAN_FILES.observe(result['total_files'])
+        SCAN_BYTES.observe(result['total_size'])
+        
+        if f:
+            try:
+                f.write("-"*80 + "\n")
+                self._write_log_stats(f, result)
+                f.close()
+                logger.info(f"✅ 文件夹结构日志已生成: {log_file}")
+            except Exception as e:
+                logger.error(f"创建文件夹结构日志失败: {e}")
+        
+        return result
     
-    def _create_folder_structure_log(self, foldername: str, folder_path: str, structure: Dict):
-        """创建文件夹结构日志文件"""
-        try:
-            # 日志文件目录
-            log_dir = Path(__file__).parent / 'logs' / 'folder_structures'
-            log_dir.mkdir(parents=True, exist_ok=True)
-            
-            # 日志文件名：时间戳_文件夹名.txt
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            safe_foldername = "".join(c for c in foldername if c.isalnum() or c in (' ', '-', '_')).strip()
-            log_filename = f"{timestamp}_{safe_foldername}.txt"
-            log_file = log_dir / log_filename
-            
-            # 写入日志
-            with open(log_file, 'w', encoding='utf-8') as f:
-                f.write("="*80 + "\n")
-                f.write(f"文件夹结构日志\n")
-                f.write("="*80 + "\n\n")
-                
-                f.write(f"文件夹名称: {foldername}\n")
-                f.write(f"完整路径: {folder_path}\n")
-                f.write(f"扫描时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"驱动器: {self.drive_letter}:\\\n")
-                f.write("\n" + "-"*80 + "\n")
-                f.write(f"统计信息:\n")
-                f.write(f"  总文件数: {structure['total_files']}\n")
-                f.write(f"  总文件夹数: {structure['total_folders']}\n")
-                f.write(f"  总大小: {self._format_size(structure['total_size'])}\n")
-                f.write("-"*80 + "\n\n")
-                
-                f.write("文件夹结构树:\n")
-                f.write("="*80 + "\n\n")
-                
-                # 绘制文件树
-                self._write_tree_structure(f, structure['structure'])
-            
-            logger.info(f"✅ 文件夹结构日志已生成: {log_file}")
+    def _folder_log_path(self, foldername: str) -> Path:
+        """文件夹结构日志文件路径：时间戳_文件夹名.txt"""
+        log_dir = Path(__file__).parent / 'logs' / 'folder_structures'
+        log_dir.mkdir(parents=True, exist_ok=True)
         
-        except Exception as e:
-            logger.error(f"创建文件夹结构日志失败: {e}")
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        safe_foldername = "".join(c for c in foldername if c.isalnum() or c in (' ', '-', '_')).strip()
+        return log_dir / f"{timestamp}_{safe_foldername}.txt"
     
-    def _write_tree_structure(self, file, structure_list):
-        """写入树形结构到文件"""
-        for folder_info in structure_list:
-            path = folder_info['path']
-            files = folder_info['files']
-            subfolders = folder_info['subfolders']
-            
-            # 计算缩进级别
-            if path == '':
-                indent = ''
-                display_path = '📁 [根目录]'
-            else:
-                level = path.count(os.sep)
-                indent = '  ' * level
-                folder_name = os.path.basename(path)
-                display_path = f"{indent}📂 {folder_name}/"
-            
-            file.write(f"{display_path}\n")
-            
-            # 写入文件
-            for file_info in files:
-                file_indent = indent + '  '
-                file_icon = self._get_file_icon(file_info['type'])
-                file.write(f"{file_indent}{file_icon} {file_info['name']} ({self._format_size(file_info['size'])})\n")
-            
-            # 如果有子文件夹，显示列表
-            if subfolders and not files:
-                for subfolder in subfolders:
-                    file.write(f"{indent}  📂 {subfolder}/\n")
-            
-            file.write("\n")
+    def _write_log_header(self, f, foldername: str, folder_path: str):
+        """写入日志头部"""
+        f.write("="*80 + "\n")
+        f.write(f"文件夹结构日志\n")
+        f.write("="*80 + "\n\n")
+        
+        f.write(f"文件夹名称: {foldername}\n")
+        f.write(f"完整路径: {folder_path}\n")
+        f.write(f"扫描时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write(f"驱动器: {self.drive_letter}:\\\n")
+        f.write("\n" + "-"*80 + "\n")
+    
+    def _write_log_stats(self, f, structure: Dict):
+        """写入统计信息"""
+        f.write(f"统计信息:\n")
+        f.write(f"  总文件数: {structure['total_files']}\n")
+        f.write(f"  总文件夹数: {structure['total_folders']}\n")
+        f.write(f"  总大小: {self._format_size(structure['total_size'])}\n")
+        if structure.get('truncated'):
+            f.write(f"  注意: 超出扫描上限，结构已截断\n")
+        f.write("-"*80 + "\n\n")
+    
+    def _write_folder_block(self, file, folder_info: Dict):
+        """写入单个目录的树形结构"""
+        path = folder_info['path']
+        files = folder_info['files']
+        subfolders = folder_info['subfolders']
+        
+        # 计算缩进级别
+        if path == '':
+            indent = ''
+            display_path = '📁 [根目录]'
+        else:
+            level = path.count(os.sep)
+            indent = '  ' * level
+            folder_name = os.path.basename(path)
+            display_path = f"{indent}📂 {folder_name}/"
+        
+        file.write(f"{display_path}\n")
+        
+        # 写入文件
+        for file_info in files:
+            file_indent = indent + '  '
+            file_icon = self._get_file_icon(file_info['type'])
+            file.write(f"{file_indent}{file_icon} {file_info['name']} ({self._format_size(file_info['size'])})\n")
+        
+        # 如果有子文件夹，显示列表
+        if subfolders and not files:
+            for subfolder in subfolders:
+                file.write(f"{indent}  📂 {subfolder}/\n")
+        
+        file.write("\n")
     
     def _get_file_icon(self, file_type: str) -> str:
         """根据文件类型返回图标"""
@@ -335,22 +395,69 @@ class FileMonitor(threading.Thread):
         return f"{size_float:.2f}TB"
     
     def stop(self):
-        """停止监控"""
+        """停止监控：通知源立即关闭，未完成的拷贝不再记录"""
         self.running = False
+        if self.hub:
+            self.hub.remove(self)
+            if self._owns_hub:
+                self.hub.stop()
+
+
+def _volume_serial(letter: str) -> Optional[int]:
+    """卷序列号（无介质或读取失败时返回None）"""
+    try:
+        return win32api.GetVolumeInformation(f"{letter}:\\")[1]
+    except Exception:
+        return None
+
+
+class LoginSession:
+    """一次插入对应的登录握手
+    
+    登录完成前，该驱动器的事件（包括插入事件本身）暂存在events中；
+    登录完成后补上用户名和login_id再落库，超时、取消或设备拔出则记为未登录用户。
+    """
+    
+    def __init__(self, drive: str, inserted_at: float):
+        self.drive = drive
+        self.inserted_at = inserted_at
+        self.resolved = False
+        self.username: Optional[str] = None
+        self.login_id: Optional[int] = None
+        self.outcome: Optional[str] = None
+        self.events: List[dict] = []
+        self.overflowed = 0  # 暂存已满、直接记为未登录用户的事件数
+        self.timer: Optional[threading.Timer] = None
+        self.cancel = None  # 登录回调返回的取消函数（关闭登录窗口）
 
 
 class USBMonitorService:
     """UUSB监控服务"""
     
-    def __init__(self):
+    def __init__(self, device_watcher: Optional[DeviceWatcher] = None):
         self.running = False
         self.monitor_thread = None
         self.file_monitors: Dict[str, FileMonitor] = {}
         self.user_sessions: Dict[str, tuple] = {}  # 驱动器 -> (用户名, login_id)
-        self.login_callback = None  # 登录回调函数
+        self.login_sessions: Dict[str, LoginSession] = {}  # 驱动器 -> 本次插入的登录握手
+        self.login_callback = None  # 登录回调函数（异步，见set_login_callback）
+        self.login_timeout = float(config.get('login_timeout', 120))  # type: ignore
+        self.login_pending_limit = int(config.get('login_pending_limit', 10000))  # type: ignore
+        self._session_lock = threading.RLock()
+        self.event_writer = None  # 事件异步写入器
+        self.hub: Optional[MonitorHub] = None  # 所有驱动器监控器共用的复用线程和工作线程池
+        self.device_watcher = device_watcher  # 设备插拔通知源，默认按平台创建
+        self.drive_scans = 0  # 枚举驱动器次数
+        self.device_events = 0  # 收到的设备变化通知数
+        self.drive_cache = DriveClassificationCache(self._classify_drive, _volume_serial)
     
     def set_login_callback(self, callback):
-        """设置登录回调函数"""
+        """设置登录回调函数
+        
+        callback(drive, done)必须立即返回，不能阻塞监控循环；登录完成后（在任意线程）调用
+        done(username, login_id)，取消时调用done(None, None)。返回值可以是一个无参函数，
+        设备在登录完成前被拔出时调用它关闭登录窗口。
+        """
         self.login_callback = callback
     
     def start(self):
@@ -359,6 +466,12 @@ class USBMonitorService:
             return
         
         self.running = True
+        self.event_writer = EventWriter(db, on_written=bus.publish)  # 落库后推送给实时订阅者
+        self.event_writer.start()
+        self.hub = MonitorHub()
+        self.hub.start()
+        if self.device_watcher is None:
+            self.device_watcher = create_device_watcher()
         self.monitor_thread = threading.Thread(target=self._monitor_loop, daemon=True)
         self.monitor_thread.start()
         logger.info("✅ USB监控服务已启动")
@@ -366,10 +479,20 @@ class USBMonitorService:
     def stop(self):
         """停止监控"""
         self.running = False
+        if self.device_watcher:
+            self.device_watcher.stop()
+        if self.monitor_thread:
+            self.monitor_thread.join(timeout=5)
         
         for monitor in list(self.file_monitors.values()):
             monitor.stop()
         self.file_monitors.clear()
+        if self.hub:
+            self.hub.stop()
+        
+        # 确保队列中的事件全部落库
+        if self.event_writer:
+            self.event_writer.stop()
         
         logger.info("❌ USB监控服务已停止")
     
@@ -378,12 +501,17 @@ class USBMonitorService:
         return self.running
     
     def _monitor_loop(self):
-        """监控循环"""
+        """监控循环：等待设备插拔通知后重新枚举驱动器，没有通知时按兜底间隔对账"""
+        watcher = self.device_watcher
+        watcher.start()
         previous_drives = set(self._get_usb_drives())
         
         while self.running:
             try:
-                time.sleep(0.5)
+                if watcher.wait(watcher.fallback_interval):
+                    self.device_events += 1
+                if not self.running:
+                    break
                 current_drives = set(self._get_usb_drives())
                 
                 # 新插入的U盘
@@ -401,20 +529,33 @@ class USBMonitorService:
     
     def _get_usb_drives(self) -> set:
         """获取USB驱动器"""
+        self.drive_scans += 1
+        if self.device_watcher:
+            drives = self.device_watcher.list_drives()
+            if drives is not None:
+                return drives
+        
         usb_drives = set()
+        if win32api is None:
+            return usb_drives
         
         try:
             bitmask = win32api.GetLogicalDrives()
-            for i, letter in enumerate("ABCDEFGHIJKLMNOPQRSTUVWXYZ"):
-                if bitmask & (1 << i):
-                    if self._is_usb_drive(letter):
-                        usb_drives.add(letter)
+            letters = [letter for i, letter in enumerate("ABCDEFGHIJKLMNOPQRSTUVWXYZ") if bitmask & (1 << i)]
+            self.drive_cache.retain(letters)
+            for letter in letters:
+                if self._is_usb_drive(letter):
+                    usb_drives.add(letter)
         except Exception as e:
             logger.error(f"获取USB驱动器失败: {e}")
         
         return usb_drives
     
     def _is_usb_drive(self, letter: str) -> bool:
+        """检查是否为USB设备（按盘符+卷序列号缓存判断结果）"""
+        return self.drive_cache.is_usb(letter)
+    
+    def _classify_drive(self, letter: str) -> bool:
         """检查是否为USB设备（包括U盘和移动硬盘）"""
         try:
             drive_path = f"{letter}:\\"
@@ -429,6 +570,7 @@ class USBMonitorService:
             if drive_type == win32file.DRIVE_FIXED:
                 # 方法1: WMI查询
                 try:
+                    import wmi
                     c = wmi.WMI()
                     for disk in c.Win32_LogicalDisk(DeviceID=f"{letter}:"):
                         for partition in disk.associators("Win32_LogicalDiskToPartition"):
@@ -461,55 +603,127 @@ class USBMonitorService:
             logger.error(f"检查{letter}:失败: {e}")
             return False
     
+    def _drive_root(self, drive: str) -> str:
+        """驱动器根路径"""
+        root = self.device_watcher.drive_root(drive) if self.device_watcher else None
+        return root or f"{drive}:\\"
+    
     def _on_usb_inserted(self, drive: str):
-        """UUSB插入事件"""
+        """UUSB插入事件：立即开始监控，登录在后台完成"""
+        inserted_at = time.monotonic()
         logger.info(f"🔵 USB插入: {drive}:")
         
-        # 弹出登录窗口（通过回调函数）
-        if self.login_callback:
-            username, login_id = self.login_callback(drive)
-            if username and login_id:
-                # 保存用户会话
-                self.user_sessions[drive] = (username, login_id)
-                logger.info(f"✅ 用户 {username} 登录成功 (驱动器: {drive}:)")
-            else:
-                logger.warning(f"⚠️ 用户取消登录 (驱动器: {drive}:)")
-                return
-        else:
-            # 没有登录回调，使用默认用户
-            self.user_sessions[drive] = ("未登录用户", 0)
+        session = LoginSession(drive, inserted_at)
+        with self._session_lock:
+            self.login_sessions[drive] = session
+            if not self.login_callback:
+                # 没有登录回调，使用默认用户
+                self._finish_login(session, "未登录用户", 0, 'default')
         
-        # 记录插入事件
-        username, login_id = self.user_sessions.get(drive, ("未知用户", 0))
+        # 记录插入事件（登录完成前暂存，完成后补上用户信息）
         event = {
             'timestamp': datetime.now().isoformat(),
             'machine_name': os.environ.get('COMPUTERNAME', 'Unknown'),
             'ip_address': '127.0.0.1',
-            'username': username,
-            'login_id': login_id,
             'drive_letter': drive,
             'file_name': '',
-            'file_path': f"{drive}:\\",
+            'file_path': self._drive_root(drive),
             'action': 'USB插入',
             'file_size': 0,
             'is_folder': False
         }
-        self._save_event(event)
+        self._save_event_with_user(event, drive)
         
-        # 启动文件拷入监控
-        monitor = FileMonitor(drive, lambda evt: self._save_event_with_user(evt, drive))
-        monitor.start()
+        # 启动文件拷入监控，不等待登录
+        monitor = FileMonitor(drive, lambda evt: self._save_event_with_user(evt, drive),
+                              root_path=self._drive_root(drive), hub=self.hub)
+        monitor.start(started_at=inserted_at)
         self.file_monitors[drive] = monitor
+        
+        if session.resolved:
+            return
+        
+        # 弹出登录窗口（回调只负责转交给界面线程，立即返回）
+        if self.login_timeout > 0:
+            session.timer = threading.Timer(self.login_timeout, self._on_login_timeout, args=(session,))
+            session.timer.daemon = True
+            session.timer.start()
+        try:
+            session.cancel = self.login_callback(
+                drive, lambda username, login_id: self._on_login_finished(session, username, login_id)
+            )
+        except Exception as e:
+            logger.error(f"弹出登录窗口失败: {e}")
+            self._on_login_finished(session, None, None)
+    
+    def _on_login_finished(self, session: LoginSession, username: Optional[str], login_id: Optional[int]):
+        """登录窗口关闭（任意线程调用）"""
+        with self._session_lock:
+            if session.resolved:
+                # 已超时：之后的事件记入登录的用户，已落库的仍为未登录用户
+                if username and login_id and self.login_sessions.get(session.drive) is session:
+                    self.user_sessions[session.drive] = (username, login_id)
+                    logger.info(f"✅ 用户 {username} 在超时后完成登录 (驱动器: {session.drive}:)")
+                return
+            if username and login_id:
+                logger.info(f"✅ 用户 {username} 登录成功 (驱动器: {session.drive}:)")
+                self._finish_login(session, username, login_id, 'login')
+            else:
+                logger.warning(f"⚠️ 用户取消登录，事件记为未登录用户 (驱动器: {session.drive}:)")
+                self._finish_login(session, "未登录用户", 0, 'cancelled')
+    
+    def _on_login_timeout(self, session: LoginSession):
+        with self._session_lock:
+            if session.resolved:
+                return
+            logger.warning(f"⚠️ 登录超时（{self.login_timeout:.0f}秒），事件记为未登录用户 (驱动器: {session.drive}:)")
+            self._finish_login(session, "未登录用户", 0, 'timeout')
+    
+    def _finish_login(self, session: LoginSession, username: str, login_id: int, outcome: str):
+        """确定该次插入的用户，补齐并落库暂存的事件（调用方持有_session_lock）"""
+        session.resolved = True
+        session.username, session.login_id, session.outcome = username, login_id, outcome
+        if session.timer:
+            session.timer.cancel()
+        if self.login_sessions.get(session.drive) is session:
+            self.user_sessions[session.drive] = (username, login_id)
+        
+        # 在锁内按原顺序落库，之后到达的事件不会插到暂存事件前面
+        events, session.events = session.events, []
+        for event in events:
+            event['username'] = username
+            event['login_id'] = login_id
+            self._save_event(event)
+        if outcome != 'default':
+            LOGIN_WAIT_SECONDS.observe(time.monotonic() - session.inserted_at, outcome)
     
     def _on_usb_removed(self, drive: str):
         """UUSB移除事件"""
         logger.info(f"🔴 USB移除: {drive}:")
         
+        # 设备已移除，根路径取自原监控器
+        monitor = self.file_monitors.get(drive)
+        drive_root = monitor.drive_path if monitor else self._drive_root(drive)
+        
+        self.drive_cache.invalidate(drive)
+        
         # 停止文件监控
         if drive in self.file_monitors:
             self.file_monitors[drive].stop()
             del self.file_monitors[drive]
         
+        # 登录尚未完成：关闭登录窗口，暂存的事件记为未登录用户
+        with self._session_lock:
+            session = self.login_sessions.get(drive)
+            pending = session is not None and not session.resolved
+            if pending:
+                self._finish_login(session, "未登录用户", 0, 'removed')  # type: ignore
+        if pending and session.cancel:  # type: ignore
+            try:
+                session.cancel()  # type: ignore
+            except Exception as e:
+                logger.error(f"关闭登录窗口失败: {e}")
+        
         # 记录移除事件
         username, login_id = self.user_sessions.get(drive, ("未知用户", 0))
         event = {
@@ -520,7 +734,7 @@ class USBMonitorService:
             'login_id': login_id,
             'drive_letter': drive,
             'file_name': '',
-            'file_path': f"{drive}:\\",
+            'file_path': drive_root,
             'action': 'USB移除',
             'file_size': 0,
             'is_folder': False
@@ -528,24 +742,113 @@ class USBMonitorService:
         self._save_event(event)
         
         # 清除用户会话
-        if drive in self.user_sessions:
-            del self.user_sessions[drive]
+        with self._session_lock:
+            if session is not None and self.login_sessions.get(drive) is session:
+                del self.login_sessions[drive]
+            self.user_sessions.pop(drive, None)
     
     def _save_event_with_user(self, event: dict, drive: str):
-        """保存事件到数据库（带用户信息）"""
-        # 添加用户信息
-        username, login_id = self.user_sessions.get(drive, ("未知用户", 0))
-        event['username'] = username
-        event['login_id'] = login_id
-        self._save_event(event)
+        """保存事件到数据库（带用户信息；登录完成前先暂存）"""
+        with self._session_lock:
+            session = self.login_sessions.get(drive)
+            if session is not None and not session.resolved:
+                if len(session.events) < self.login_pending_limit:
+                    session.events.append(event)
+                    return
+                # 暂存已满，不再等待登录结果
+                if not session.overflowed:
+                    logger.warning(f"⚠️ {drive}: 等待登录期间暂存事件超过{self.login_pending_limit}条，之后的事件记为未登录用户")
+                session.overflowed += 1
+                username, login_id = "未登录用户", 0
+            else:
+                username, login_id = self.user_sessions.get(drive, ("未知用户", 0))
+            event['username'] = username
+            event['login_id'] = login_id
+            self._save_event(event)
     
     def _save_event(self, event: dict):
-        """保存事件到数据库"""
+        """保存事件到数据库（经写入队列批量落库）"""
         try:
-            db.insert_event(event)
+            if self.event_writer:
+                self.event_writer.put(event)
+            else:
+                db.insert_event(event)
         except Exception as e:
             logger.error(f"保存事件失败: {e}")
+    
+    def get_monitor_stats(self) -> list:
+        """各驱动器文件监控器指标"""
+        return [monitor.get_stats() for monitor in list(self.file_monitors.values())]
+    
+    def get_hub_stats(self) -> dict:
+        """复用线程、工作线程池和拷贝跟踪器指标"""
+        if not self.hub:
+            return {'running': False}
+        return self.hub.get_stats()
+    
+    def get_device_stats(self) -> dict:
+        """设备插拔检测指标"""
+        watcher = self.device_watcher
+        return {
+            'backend': type(watcher).__name__ if watcher else None,
+            'fallback_interval': watcher.fallback_interval if watcher else None,
+            'drive_scans': self.drive_scans,
+            'device_events': self.device_events,
+            'drive_cache': self.drive_cache.get_stats(),
+            'drives': sorted(self.file_monitors)
+        }
+    
+    def get_login_stats(self) -> dict:
+        """登录握手指标"""
+        with self._session_lock:
+            pending = [session for session in self.login_sessions.values() if not session.resolved]
+            now = time.monotonic()
+            return {
+                'timeout': self.login_timeout,
+                'pending_logins': [
+                    {
+                        'drive': session.drive,
+                        'waiting_seconds': round(now - session.inserted_at, 3),
+                        'buffered_events': len(session.events),
+                        'overflowed_events': session.overflowed
+                    }
+                    for session in pending
+                ],
+                'sessions': {drive: {'username': username, 'login_id': login_id}
+                             for drive, (username, login_id) in self.user_sessions.items()}
+            }
+    
+    def get_writer_stats(self) -> dict:
+        """事件写入器指标"""
+        if not self.event_writer:
+            return {'running': False}
+        return self.event_writer.get_stats()
 
 
 # 全局服务实例
 usb_service = USBMonitorService()
+
+
+def register_service_metrics(service: USBMonitorService):
+    """登记监控服务的指标，只在运行USB监控的进程中调用一次
+    
+    external模式下API工作进程不运行监控，不登记这些指标；监控进程通过自己的指标端口导出。
+    """
+    Gauge('usbmon_active_monitors', '正在监控的驱动器数', lambda: len(service.file_monitors))
+    Gauge('usbmon_user_sessions', '当前登录会话数', lambda: len(service.user_sessions))
+    Gauge('usbmon_pending_logins', '等待登录完成的驱动器数',
+          lambda: sum(1 for s in list(service.login_sessions.values()) if not s.resolved))
+    Gauge('usbmon_pending_attribution_events', '等待登录结果、暂存未落库的事件数',
+          lambda: sum(len(s.events) for s in list(service.login_sessions.values()) if not s.resolved))
+    Gauge('usbmon_dedup_entries', '拷入去重集合中的条目数',
+          lambda: sum(len(m.processed_items) for m in list(service.file_monitors.values())))
+    Gauge('usbmon_pending_copies', '等待拷贝完成的项目数',
+          lambda: service.hub.copy_tracker.pending_count() if service.hub else 0)
+    Gauge('usbmon_monitor_queue_depth', '等待工作线程处理的监控任务数',
+          lambda: service.hub.dispatcher.pending_count() if service.hub else 0)
+    Gauge('usbmon_writer_queue_depth', '事件写入队列深度', lambda: service.get_writer_stats().get('queue_depth', 0))
+    CallbackCounter('usbmon_writer_events_written_total', '写入器已落库事件数',
+                    lambda: service.get_writer_stats().get('events_written', 0))
+    CallbackCounter('usbmon_writer_events_dropped_total', '写入队列已满被丢弃的事件数',
+                    lambda: service.get_writer_stats().get('events_dropped', 0))
+    CallbackCounter('usbmon_drive_scans_total', '枚举驱动器次数', lambda: service.drive_scans)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件夹结构快照编码 - 列式存储 + zlib压缩
+
+FolderScanner.scan输出的是 [{'path', 'files': [{'name', 'size', 'type'}], 'subfolders'}]
+这种逐目录嵌套的结构，文件名以外的键名、扩展名大量重复。这里把它转成列式：
+
+    dirs        目录相对路径列表
+    subfolders  每个目录的子文件夹名
+    types       扩展名字典
+    file_dir / file_name / file_size / file_type   每个文件一行的平行数组
+
+再整体zlib压缩。摘要取自规范化后的未压缩内容，相同的文件夹只存一份。
+"""
+
+import hashlib
+import json
+import zlib
+from typing import Dict, Iterator, List, Tuple
+
+ENCODING = 'columnar-zlib-v1'
+
+
+def encode_structure(structure: List[Dict]) -> Tuple[str, bytes, Dict]:
+    """文件夹结构 -> (摘要, 压缩数据, 统计信息)"""
+    dirs: List[str] = []
+    subfolders: List[List[str]] = []
+    types: List[str] = []
+    type_index: Dict[str, int] = {}
+    file_dir: List[int] = []
+    file_name: List[str] = []
+    file_size: List[int] = []
+    file_type: List[int] = []
+    
+    for dir_index, folder_info in enumerate(structure):
+        dirs.append(folder_info.get('path', ''))
+        subfolders.append(list(folder_info.get('subfolders', [])))
+        for file_info in folder_info.get('files', []):
+            ext = file_info.get('type', '')
+            if ext not in type_index:
+                type_index[ext] = len(types)
+                types.append(ext)
+            file_dir.append(dir_index)
+            file_name.append(file_info.get('name', ''))
+            file_size.append(int(file_info.get('size', 0)))
+            file_type.append(type_index[ext])
+    
+    payload = json.dumps({
+        'dirs': dirs,
+        'subfolders': subfolders,
+        'types': types,
+        'file_dir': file_dir,
+        'file_name': file_name,
+        'file_size': file_size,
+        'file_type': file_type
+    }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    
+    digest = hashlib.sha256(payload).hexdigest()
+    info = {
+        'folder_count': len(dirs),
+        'file_count': len(file_name),
+        'total_size': sum(file_size),
+        'raw_size': len(payload)
+    }
+    return digest, zlib.compress(payload, 6), info
+
+
+def decode_structure(data: bytes, encoding: str = ENCODING) -> List[Dict]:
+    """压缩数据 -> 与FolderScanner.scan相同格式的文件夹结构"""
+    if encoding != ENCODING:
+        raise ValueError(f"不支持的快照编码: {encoding}")
+    
+    columns = json.loads(zlib.decompress(data))
+    structure = [
+        {'path': path, 'files': [], 'subfolders': subfolders}
+        for path, subfolders in zip(columns['dirs'], columns['subfolders'])
+    ]
+    types = columns['types']
+    for dir_index, name, size, type_index in zip(
+        columns['file_dir'], columns['file_name'], columns['file_size'], columns['file_type']
+    ):
+        structure[dir_index]['files'].append({
+            'name': name,
+            'size': size,
+            'type': types[type_index]
+        })
+    return structure
+
+
+def structure_names(structure: List[Dict]) -> Iterator[str]:
+    """文件夹结构中的目录相对路径和文件名（供全文索引）"""
+    for folder_info in structure:
+        if folder_info.get('path'):
+            yield folder_info['path']
+        for file_info in folder_info.get('files', []):
+            if file_info.get('name'):
+                yield file_info['name']
+
+
+def iter_file_names(data: bytes, encoding: str = ENCODING) -> Iterator[str]:
+    """压缩数据 -> 目录相对路径和文件名，直接读取列，不重建嵌套结构"""
+    if encoding != ENCODING:
+        raise ValueError(f"不支持的快照编码: {encoding}")
+    
+    columns = json.loads(zlib.decompress(data))
+    for path in columns['dirs']:
+        if path:
+            yield path
+    for name in columns['file_name']:
+        if name:
+            yield name
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+启动耗时统计 - 记录各模块的导入耗时和启动阶段，跟踪冷启动时间
+
+    enable_import_timing()  在sys.meta_path最前面插入计时finder，之后首次导入的每个模块
+                            记录累计耗时（含其导入的子模块）和自身耗时
+    mark(name)              记录一个启动阶段（相对本模块导入的时间）
+    finish()                启动完成：输出汇总日志，配置了report_path时写入JSON
+
+本模块只依赖标准库，应当作为入口脚本导入的第一个模块。
+"""
+
+import json
+import sys
+import threading
+import time
+import logging
+from importlib.abc import MetaPathFinder
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+STARTED_AT = time.perf_counter()
+
+report_path: Optional[str] = None  # 启动完成后写入报告的JSON文件
+
+_marks: List[Tuple[str, float]] = []
+
+
+class _TimingLoader:
+    """包装原loader，只计时exec_module；模块上的__loader__仍为原loader"""
+    
+    def __init__(self, loader, timer: 'ImportTimer'):
+        self._loader = loader
+        self._timer = timer
+    
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+    
+    def exec_module(self, module):
+        module.__loader__ = self._loader
+        if getattr(module, '__spec__', None) is not None:
+            module.__spec__.loader = self._loader
+        self._timer._exec(self._loader, module)
+
+
+class ImportTimer(MetaPathFinder):
+    """模块导入计时：查找交给后面的finder，执行模块时计时"""
+    
+    def __init__(self):
+        self.records: Dict[str, Tuple[float, float]] = {}  # 模块 -> (累计秒数, 自身秒数)
+        self._local = threading.local()
+    
+    def find_spec(self, fullname, path, target=None):
+        if getattr(self._local, 'finding', False):
+            return None
+        self._local.finding = True
+        try:
+            spec = None
+            for finder in sys.meta_path:
+                find = getattr(finder, 'find_spec', None)
+                if finder is self or find is None:
+                    continue
+                spec = find(fullname, path, target)
+                if spec is not None:
+                    break
+        finally:
+            self._local.finding = False
+        
+        if spec is not None and hasattr(spec.loader, 'exec_module'):
+            spec.loader = _TimingLoader(spec.loader, self)
+        return spec
+    
+    def _exec(self, loader, module):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        stack.append(0.0)  # 子模块耗时
+        start = time.perf_counter()
+        try:
+            loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            self.records[module.__name__] = (elapsed, elapsed - children)
+
+
+_timer: Optional[ImportTimer] = None
+
+
+def enable_import_timing() -> ImportTimer:
+    """开始记录模块导入耗时（只对之后首次导入的模块生效）"""
+    global _timer
+    if _timer is None:
+        _timer = ImportTimer()
+        sys.meta_path.insert(0, _timer)
+    return _timer
+
+
+def mark(name: str):
+    """记录启动阶段"""
+    _marks.append((name, time.perf_counter() - STARTED_AT))
+
+
+def get_report(top: int = 30) -> Dict:
+    """启动耗时汇总"""
+    records = dict(_timer.records) if _timer else {}
+    slowest = sorted(records.items(), key=lambda item: item[1][1], reverse=True)[:top]
+    return {
+        'uptime_s': round(time.perf_counter() - STARTED_AT, 3),
+        'phases': [{'name': name, 'at_ms': round(at * 1000, 1)} for name, at in _marks],
+        'imports': {
+            'modules': len(records),
+            'total_ms': round(sum(self_time for _, self_time in records.values()) * 1000, 1),
+            'slowest': [
+                {'module': name, 'self_ms': round(self_time * 1000, 2), 'cumulative_ms': round(total * 1000, 2)}
+                for name, (total, self_time) in slowest
+            ]
+        }
+    }
+
+
+def finish(top: int = 15):
+    """启动完成：记录ready阶段，输出汇总，写入报告文件"""
+    mark('ready')
+    report = get_report()
+    phases = ', '.join(f"{p['name']}={p['at_ms']:.0f}ms" for p in report['phases'])
+    logger.info(f"🚀 启动完成: {phases}；导入 {report['imports']['modules']} 个模块共 {report['imports']['total_ms']:.0f}ms")
+    for item in report['imports']['slowest'][:top]:
+        logger.info(f"   {item['self_ms']:8.1f}ms  {item['cumulative_ms']:8.1f}ms  {item['module']}")
+    
+    if report_path:
+        try:
+            with open(report_path, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+        except OSError as e:
+            logger.error(f"写入启动报告失败: {e}")
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""测试公共配置：让测试可以直接导入server-windows下的模块，并提供临时数据库和合成事件"""
+
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+if str(SERVER_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVER_DIR))
+
+
+@pytest.fixture
+def database(tmp_path):
+    """临时目录中的独立数据库"""
+    from database import DatabaseManager
+    manager = DatabaseManager(tmp_path / 'test.db')
+    yield manager
+    manager.close_all()
+
+
+@pytest.fixture
+def make_event():
+    """生成第i条合成事件（时间从base_time往前每条递减1秒）"""
+    def factory(i, base_time=None, **overrides):
+        base_time = base_time or datetime(2026, 10, 1, 12, 0, 0)
+        event = {
+            'timestamp': (base_time - timedelta(seconds=i)).isoformat(),
+            'machine_name': f'PC{i % 3:03d}',
+            'ip_address': '127.0.0.1',
+            'username': ['张三', '李四'][i % 2],
+            'login_id': i % 5,
+            'drive_letter': 'EF'[i % 2],
+            'file_name': f'file_{i}.dat',
+            'file_path': f'E:\\file_{i}.dat',
+            'action': ['拷入文件 (.docx)', 'USB插入'][i % 2],
+            'file_size': i * 10,
+            'is_folder': False
+        }
+        event.update(overrides)
+        return event
+    return factory
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""批量接收事件：逐条结果、条数截断和单行/请求体大小上限"""
+
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip('fastapi')
+
+import api  # noqa: E402
+from config import config  # noqa: E402
+
+
+class FakeRequest:
+    """按给定分块交出请求体"""
+    
+    def __init__(self, chunks, content_type='application/x-ndjson'):
+        self.chunks = list(chunks)
+        self.headers = {'content-type': content_type}
+    
+    async def stream(self):
+        for chunk in self.chunks:
+            yield chunk
+
+
+@pytest.fixture
+def batch_api(database, monkeypatch):
+    monkeypatch.setattr(api, 'db', database)
+    monkeypatch.setitem(config.config, 'batch_chunk_size', 2)
+    return database
+
+
+def post(request):
+    authorization = f"Bearer {config.get('api_key', '')}"
+    return asyncio.run(api.post_events_batch(request, authorization))
+
+
+def ndjson(lines):
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def collect(stream, max_line_bytes):
+    async def run():
+        return [item async for item in api.iter_ndjson(stream, max_line_bytes)]
+    return asyncio.run(run())
+
+
+async def chunked(data, size):
+    for start in range(0, len(data), size):
+        yield data[start:start + size]
+
+
+def test_iter_ndjson_splits_lines_across_chunks():
+    data = b'{"a": 1}\n\n{"a": 2}\r\n{"a": 3}'
+    items = collect(chunked(data, 3), 1024)
+    assert [index for index, _ in items] == [0, 1, 2]
+    assert [raw['a'] for _, raw in items] == [1, 2, 3]
+
+
+def test_iter_ndjson_stops_at_line_too_long():
+    data = b'{"a": 1}\n' + b'x' * 100 + b'\n{"a": 2}\n'
+    items = collect(chunked(data, 16), 50)
+    assert items[0] == (0, {'a': 1})
+    assert isinstance(items[1][1], api.LineTooLong)
+    assert len(items) == 2
+    
+    # 没有换行的超长数据在缓冲区超限时就停止，不会读完
+    items = collect(chunked(b'y' * 1000, 10), 50)
+    assert len(items) == 1 and isinstance(items[0][1], api.LineTooLong)
+
+
+def test_batch_reports_partial_failures(batch_api, make_event):
+    lines = [json.dumps(make_event(0)), '{bad json', json.dumps([1, 2]),
+             json.dumps(make_event(1)), json.dumps(make_event(2))]
+    result = post(FakeRequest([ndjson(lines)]))
+    
+    assert result['total'] == 5
+    assert result['accepted'] == 3
+    assert result['rejected'] == 2
+    assert result['truncated'] is False
+    statuses = [(r['index'], r['status']) for r in result['results']]
+    assert statuses == [(0, 'ok'), (1, 'error'), (2, 'error'), (3, 'ok'), (4, 'ok')]
+    assert 'JSON解析失败' in result['results'][1]['error']
+    
+    stored = batch_api.get_events(limit=10)
+    assert sorted(e['id'] for e in stored) == sorted(r['id'] for r in result['results'] if r['status'] == 'ok')
+
+
+def test_ndjson_truncates_at_max_events(batch_api, make_event, monkeypatch):
+    monkeypatch.setitem(config.config, 'batch_max_events', 3)
+    lines = [json.dumps(make_event(i)) for i in range(5)]
+    result = post(FakeRequest([ndjson(lines)]))
+    
+    assert result['truncated'] is True
+    assert result['total'] == 3
+    assert result['accepted'] == 3
+
+
+def test_ndjson_line_too_long_keeps_earlier_events(batch_api, make_event, monkeypatch):
+    monkeypatch.setitem(config.config, 'batch_max_line_bytes', 512)
+    lines = [json.dumps(make_event(0)), json.dumps(make_event(1, file_name='x' * 1000)),
+             json.dumps(make_event(2))]
+    result = post(FakeRequest([ndjson(lines)]))
+    
+    assert result['truncated'] is True
+    assert result['accepted'] == 1
+    assert [r['status'] for r in result['results']] == ['ok', 'error']
+
+
+def test_json_array_over_limits_is_rejected(batch_api, make_event, monkeypatch):
+    body = json.dumps([make_event(i) for i in range(4)]).encode('utf-8')
+    
+    monkeypatch.setitem(config.config, 'batch_max_events', 3)
+    with pytest.raises(api.HTTPException) as exc:
+        post(FakeRequest([body], content_type='application/json'))
+    assert exc.value.status_code == 413
+    
+    monkeypatch.setitem(config.config, 'batch_max_events', 100)
+    monkeypatch.setitem(config.config, 'batch_max_body_bytes', 256)
+    with pytest.raises(api.HTTPException) as exc:
+        post(FakeRequest([body[:200], body[200:]], content_type='application/json'))
+    assert exc.value.status_code == 413
+    assert batch_api.get_events(limit=10) == []
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""响应缓存：数据版本变化或超过TTL即失效，ETag一致时返回304"""
+
+import asyncio
+
+import pytest
+
+from cache import VersionedTTLCache, etag_matches
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+def test_entry_invalidated_by_version_and_ttl():
+    clock = FakeClock()
+    cache = VersionedTTLCache(ttl=30, clock=clock)
+    
+    assert cache.get('stats', 1) is None
+    entry = cache.put('stats', 1, {'total_events': 5})
+    assert cache.get('stats', 1) is entry
+    assert entry.body == b'{"total_events":5}'
+    
+    assert cache.get('stats', 2) is None  # 有新写入
+    cache.put('stats', 2, {'total_events': 6})
+    clock.now = 30
+    assert cache.get('stats', 2) is None  # 超过TTL
+    
+    stats = cache.get_stats()
+    assert (stats['hits'], stats['misses'], stats['stale'], stats['expired']) == (1, 3, 1, 1)
+
+
+def test_older_result_does_not_replace_newer():
+    cache = VersionedTTLCache(ttl=30)
+    cache.put('users', 5, ['新'])
+    cache.put('users', 4, ['旧'])  # 计算较慢的并发请求晚到
+    assert cache.get('users', 5).body == '["新"]'.encode('utf-8')
+
+
+def test_etag_matching():
+    etag = '"abc"'
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('W/"abc"', etag)
+    assert etag_matches('"x", "abc"', etag)
+    assert etag_matches('*', etag)
+    assert not etag_matches('"abcd"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_writes_bump_data_version(database, make_event):
+    events_version = database.data_version('events')
+    users_version = database.data_version('users')
+    
+    database.insert_events([make_event(0), make_event(1)])
+    after_insert = database.data_version('events')
+    assert after_insert > events_version
+    
+    database.rebuild_rollups()
+    assert database.data_version('events') > after_insert
+    
+    database.add_user('王五')
+    assert database.data_version('users') > users_version
+
+
+def test_cached_response_recomputes_after_write(database, make_event, monkeypatch):
+    pytest.importorskip('fastapi')
+    import api
+    
+    cache = VersionedTTLCache(ttl=300)
+    monkeypatch.setattr(api, 'db', database)
+    monkeypatch.setattr(api, 'response_cache', cache)
+    calls = []
+    
+    async def compute():
+        calls.append(1)
+        return database.get_statistics()
+    
+    class FakeRequest:
+        def __init__(self, if_none_match=None):
+            self.headers = {'if-none-match': if_none_match} if if_none_match else {}
+    
+    def get(if_none_match=None):
+        return asyncio.run(api.cached_response(FakeRequest(if_none_match), 'stats', 'events', compute))
+    
+    first = get()
+    assert get().body == first.body
+    assert len(calls) == 1
+    
+    not_modified = get(first.headers['ETag'])
+    assert not_modified.status_code == 304
+    
+    database.insert_events([make_event(0)])
+    second = get(first.headers['ETag'])
+    assert len(calls) == 2
+    assert second.status_code == 200
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert b'"total_events":1' in second.body
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""跨进程变更追踪：按ID追踪新事件、数据版本号同步"""
+
+from change_feed import ChangeFeed
+from database import DatabaseManager
+
+
+def make_feed(database, published, batch_size=1000):
+    feed = ChangeFeed(database, published.extend, poll_interval=0.01, batch_size=batch_size)
+    feed.last_id = database.max_event_id()
+    database.data_changed()  # 记下当前的data_version
+    return feed
+
+
+def test_feed_publishes_events_written_by_another_process(database, make_event, tmp_path):
+    published = []
+    feed = make_feed(database, published)
+    assert feed.poll() == 0
+    
+    # 另一个DatabaseManager代表监控进程：独立的连接写入同一个数据库文件
+    writer = DatabaseManager(tmp_path / 'test.db')
+    try:
+        writer.insert_events([make_event(i) for i in range(3)])
+    finally:
+        writer.close_all()
+    
+    assert feed.poll() == 3
+    assert [e['file_name'] for e in published] == ['file_0.dat', 'file_1.dat', 'file_2.dat']
+    assert feed.last_id == database.max_event_id()
+    # 没有新的提交时不查询
+    assert feed.poll() == 0
+    assert feed.get_stats()['wakeups'] == 1
+
+
+def test_feed_sees_writes_made_through_the_local_pool(database, make_event):
+    published = []
+    feed = make_feed(database, published)
+    
+    # 本进程经连接池写入（池中的连接也被追踪线程使用过）
+    database.insert_events([make_event(0)])
+    assert feed.poll() == 1
+    database.insert_events([make_event(1)])
+    assert feed.poll() == 1
+    assert len(published) == 2
+
+
+def test_feed_pages_through_large_backlogs(database, make_event):
+    published = []
+    feed = make_feed(database, published, batch_size=4)
+    database.insert_events([make_event(i) for i in range(10)])
+    
+    assert feed.poll() == 10
+    ids = [e['id'] for e in published]
+    assert ids == sorted(ids) and len(set(ids)) == 10
+
+
+def test_feed_refreshes_data_versions(database, make_event, tmp_path):
+    feed = make_feed(database, [])
+    before = database.data_version('events')
+    
+    writer = DatabaseManager(tmp_path / 'test.db')
+    try:
+        writer.insert_events([make_event(0)])
+    finally:
+        writer.close_all()
+    
+    assert database.data_version('events') == before  # 本进程还不知道
+    feed.poll()
+    assert database.data_version('events') > before
@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""拷贝完成跟踪：用假时钟、假文件状态和假通知源驱动，不依赖Windows"""
+
+from copy_tracker import CopyCompletionTracker
+from notify_sources import ACTION_ADDED, NotificationSource
+from server import FileMonitor
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+class FakeSource(NotificationSource):
+    """按顺序交出预先排好的通知批次"""
+    
+    def __init__(self, root_path, batches):
+        super().__init__(root_path)
+        self.batches = list(batches)
+    
+    def open(self):
+        pass
+    
+    def read_ready(self):
+        return self.read(0) or []
+    
+    def read(self, timeout):
+        return self.batches.pop(0) if self.batches else None
+    
+    def close(self):
+        pass
+
+
+class InlineHub:
+    """代替MonitorHub：派发的任务在当前线程立即执行"""
+    
+    def __init__(self, copy_tracker):
+        self.copy_tracker = copy_tracker
+    
+    def dispatch(self, monitor, fn, *args):
+        fn(*args)
+
+
+def make_tracker(clock, signatures):
+    return CopyCompletionTracker(settle_time=0.5, poll_interval=0.1, max_wait=60,
+                                 clock=clock, stat=signatures.get)
+
+
+def test_tracker_waits_until_size_and_mtime_settle():
+    clock = FakeClock()
+    signatures = {'E:/a.bin': (100, 1)}
+    tracker = make_tracker(clock, signatures)
+    settled = []
+    tracker.track('E:/a.bin', lambda: settled.append(clock.now))
+    
+    assert tracker.poll() == 0
+    
+    # 拷贝仍在进行：大小和修改时间不断变化
+    for step in range(1, 5):
+        clock.now = step * 0.2
+        signatures['E:/a.bin'] = (100 + step, 1 + step)
+        assert tracker.poll() == 0
+    
+    # 最后一次变化在0.8秒，稳定0.5秒之前不上报
+    clock.now = 1.2
+    assert tracker.poll() == 0
+    clock.now = 1.3
+    assert tracker.poll() == 1
+    assert settled == [1.3]
+    assert tracker.pending_count() == 0
+
+
+def test_tracker_touch_restarts_settle_time():
+    clock = FakeClock()
+    tracker = make_tracker(clock, {'E:/dir': (0, 0)})
+    settled = []
+    tracker.track('E:/dir', lambda: settled.append(clock.now))
+    tracker.poll()
+    
+    clock.now = 0.4
+    tracker.touch('E:/dir')  # 文件夹内仍有子项在写入
+    clock.now = 0.6
+    assert tracker.poll() == 0
+    clock.now = 0.9
+    assert tracker.poll() == 1
+    assert settled == [0.9]
+
+
+def test_tracker_drops_vanished_path():
+    clock = FakeClock()
+    signatures = {'E:/tmp.part': (1, 1)}
+    tracker = make_tracker(clock, signatures)
+    tracker.track('E:/tmp.part', lambda: None)
+    del signatures['E:/tmp.part']
+    
+    clock.now = 1.0
+    assert tracker.poll() == 0
+    assert tracker.get_stats()['vanished'] == 1
+
+
+def test_file_monitor_records_copy_only_after_settle(tmp_path):
+    clock = FakeClock()
+    path = tmp_path / 'report.docx'
+    path.write_bytes(b'x' * 10)
+    signatures = {str(path): (10, 1)}
+    tracker = make_tracker(clock, signatures)
+    
+    events = []
+    source = FakeSource(str(tmp_path), [[(ACTION_ADDED, 'report.docx')]])
+    monitor = FileMonitor('E', events.append, root_path=str(tmp_path), source=source, hub=InlineHub(tracker))
+    monitor.running = True
+    
+    # 复用线程读到通知后交给监控器
+    monitor._on_notifications(source.read(0))
+    assert tracker.pending_count() == 1
+    assert events == []
+    
+    clock.now = 0.3
+    path.write_bytes(b'x' * 20)
+    signatures[str(path)] = (20, 2)
+    tracker.poll()
+    assert events == []
+    
+    clock.now = 0.7
+    tracker.poll()
+    assert events == []
+    
+    clock.now = 0.8
+    tracker.poll()
+    assert len(events) == 1
+    assert events[0]['file_name'] == 'report.docx'
+    assert events[0]['file_size'] == 20
+    
+    # 同一文件的重复通知不会再次记录
+    monitor._on_notifications([(ACTION_ADDED, 'report.docx')])
+    clock.now = 2.0
+    tracker.poll()
+    assert len(events) == 1
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""数据库连接池：借出/归还、嵌套获取、容量上限与收回"""
+
+import sqlite3
+import threading
+
+
+def test_nested_get_returns_same_connection_until_outermost_release(database):
+    outer = database.get_connection()
+    inner = database.get_connection()
+    assert inner is outer
+    
+    database.release_connection(inner)
+    assert database._borrowed  # 外层还没有归还
+    database.release_connection(outer)
+    assert not database._borrowed
+    assert database._idle == [outer]
+    
+    # 归还后再次借出复用同一条连接
+    again = database.get_connection()
+    assert again is outer
+    database.release_connection(again)
+
+
+def test_release_rolls_back_uncommitted_transaction(database):
+    conn = database.get_connection()
+    conn.execute('INSERT INTO user_logins (username, login_time) VALUES (?, ?)', ('张三', '2026-10-01T00:00:00'))
+    assert conn.in_transaction
+    database.release_connection(conn)
+    
+    conn = database.get_connection()
+    try:
+        assert not conn.in_transaction
+        assert conn.execute('SELECT COUNT(*) FROM user_logins').fetchone()[0] == 0
+    finally:
+        database.release_connection(conn)
+
+
+def test_pool_is_bounded_and_waits_for_release(database):
+    database.pool_size = 2
+    held = [database.get_connection()]
+    
+    other_ready = threading.Event()
+    other_done = threading.Event()
+    
+    def hold_one():
+        conn = database.get_connection()
+        other_ready.set()
+        other_done.wait(5)
+        database.release_connection(conn)
+    
+    holder = threading.Thread(target=hold_one)
+    holder.start()
+    assert other_ready.wait(5)
+    
+    # 两条连接都已借出：第三个线程等到有连接归还
+    got = []
+    
+    def borrow():
+        conn = database.get_connection()
+        got.append(conn)
+        database.release_connection(conn)
+    
+    waiter = threading.Thread(target=borrow)
+    waiter.start()
+    waiter.join(0.2)
+    assert not got
+    
+    other_done.set()
+    holder.join(5)
+    waiter.join(5)
+    assert len(got) == 1
+    assert len(database._idle) + len(database._borrowed) <= 2
+    database.release_connection(held[0])
+
+
+def test_pool_exhausted_times_out(database):
+    database.pool_size = 1
+    database.busy_timeout_ms = 100
+    conn = database.get_connection()
+    errors = []
+    
+    def borrow():
+        try:
+            database.get_connection()
+        except sqlite3.OperationalError as e:
+            errors.append(e)
+    
+    thread = threading.Thread(target=borrow)
+    thread.start()
+    thread.join(5)
+    assert len(errors) == 1
+    database.release_connection(conn)
+
+
+def test_connection_of_exited_thread_is_reclaimed(database):
+    database.pool_size = 1
+    
+    # 线程借出连接后没有归还就退出了
+    thread = threading.Thread(target=database.get_connection)
+    thread.start()
+    thread.join()
+    
+    conn = database.get_connection()
+    try:
+        assert conn.execute('SELECT 1').fetchone()[0] == 1
+    finally:
+        database.release_connection(conn)
+
+
+def test_concurrent_writers_share_the_pool(database, make_event):
+    database.pool_size = 3
+    workers = 8
+    errors = []
+    
+    def write(worker_id):
+        try:
+            for i in range(20):
+                database.insert_event(make_event(worker_id * 100 + i))
+        except Exception as e:
+            errors.append(e)
+    
+    threads = [threading.Thread(target=write, args=(w,)) for w in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    
+    assert not errors
+    assert len(database._idle) + len(database._borrowed) <= 3
+    assert database.get_statistics()['total_events'] == workers * 20
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""时间窗口去重集合：过期、容量上限和内存估算"""
+
+from dedup import TimedDedupSet
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    
+    def __call__(self):
+        return self.now
+
+
+def test_duplicates_within_window_and_expiry():
+    clock = FakeClock()
+    seen = TimedDedupSet(capacity=10, ttl=5, clock=clock)
+    
+    assert seen.add('E:/a.txt')
+    clock.now = 4.9
+    assert not seen.add('E:/a.txt')  # 重复不刷新加入时间
+    assert 'E:/a.txt' in seen
+    
+    clock.now = 5.0
+    assert 'E:/a.txt' not in seen
+    assert len(seen) == 1  # 查询不清理
+    assert seen.add('E:/a.txt')
+    assert len(seen) == 1
+    assert seen.get_stats()['duplicates'] == 1
+    assert seen.get_stats()['expired'] == 1
+
+
+def test_expiry_clears_only_old_entries():
+    clock = FakeClock()
+    seen = TimedDedupSet(capacity=100, ttl=10, clock=clock)
+    for i in range(20):
+        clock.now = i
+        seen.add(i)
+    
+    clock.now = 25
+    seen.add('new')
+    assert len(seen) == 5  # 剩下16..19和new，0..15已过期（25 - 15 = 10）
+    assert 15 not in seen and 16 in seen
+
+
+def test_capacity_evicts_oldest():
+    clock = FakeClock()
+    seen = TimedDedupSet(capacity=3, ttl=60, clock=clock)
+    for key in 'abcde':
+        seen.add(key)
+    
+    assert len(seen) == 3
+    assert 'a' not in seen and 'b' not in seen
+    assert all(key in seen for key in 'cde')
+    assert seen.get_stats()['evicted'] == 2
+    assert seen.add('a')  # 被淘汰的key重新出现时视为新条目
+
+
+def test_discard_and_memory_tracking():
+    seen = TimedDedupSet(capacity=1000, ttl=60)
+    empty = seen.memory_bytes()
+    for i in range(500):
+        seen.add(f'E:/folder/file_{i}.dat')
+    full = seen.memory_bytes()
+    assert full > empty
+    
+    for i in range(500):
+        seen.discard(f'E:/folder/file_{i}.dat')
+    seen.discard('missing')
+    assert len(seen) == 0
+    assert seen._key_bytes == 0
+    
+    # 长时间运行后内存不随加入次数增长
+    bounded = TimedDedupSet(capacity=100, ttl=60)
+    for i in range(10000):
+        bounded.add(i)
+    assert len(bounded) == 100
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""实时推送：推送的事件与落库后查询出的行一致，过滤和慢订阅者的处理"""
+
+import asyncio
+
+from event_bus import EventBus, EventFilter
+from event_writer import EventWriter
+
+STRUCTURE = [
+    {'path': '', 'files': [{'name': 'a.docx', 'size': 10, 'type': '.docx'}], 'subfolders': ['sub']},
+    {'path': 'sub', 'files': [{'name': 'b.pdf', 'size': 20, 'type': '.pdf'}], 'subfolders': []}
+]
+
+
+async def drain(subscription):
+    await asyncio.sleep(0)  # 让call_soon_threadsafe投递的回调执行
+    events = []
+    while not subscription.queue.empty():
+        events.append(subscription.queue.get_nowait())
+    return events
+
+
+def test_pushed_events_match_stored_rows(database, make_event):
+    bus = EventBus(queue_size=100)
+    writer = EventWriter(database, on_written=bus.publish)  # 未启动：同步写入
+    
+    async def scenario():
+        subscription = bus.subscribe()
+        writer.put(make_event(0, is_folder=True, folder_structure=STRUCTURE))
+        writer.put(make_event(1))
+        return await drain(subscription)
+    
+    pushed = asyncio.run(scenario())
+    stored = database.get_events_page(10)['events']
+    
+    assert len(pushed) == 2
+    stored_by_id = {row['id']: row for row in stored}
+    for event in pushed:
+        row = stored_by_id[event['id']]
+        for key, value in event.items():
+            assert row[key] == value, key
+    
+    folder = next(e for e in pushed if e['is_folder'])
+    assert folder['snapshot_id'] is not None
+    assert folder['has_folder_structure'] == 1
+
+
+def test_subscription_filter_and_overflow(database, make_event):
+    bus = EventBus(queue_size=2)
+    
+    async def scenario():
+        subscription = bus.subscribe(EventFilter(username='张三', action='拷入*'))
+        events = [make_event(i) for i in range(10)]
+        bus.publish(events, list(range(1, 11)))
+        await asyncio.sleep(0)
+        return subscription
+    
+    subscription = asyncio.run(scenario())
+    # 张三的事件都是"拷入文件"，5条匹配，队列只能放2条
+    assert subscription.delivered == 2
+    assert subscription.dropped == 3
+    assert subscription.lagging
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""事件写入器：按条数/时间批量落库、停止时写完队列、坏事件逐条隔离"""
+
+import threading
+import time
+
+from event_writer import EventWriter
+
+
+class RecordingDatabase:
+    """包装真实数据库：记录每次写入的批大小，file_name为bad的事件整批失败"""
+    
+    def __init__(self, database):
+        self.database = database
+        self.batches = []
+        self.gate = threading.Event()
+        self.gate.set()
+    
+    def insert_events(self, events):
+        self.gate.wait()
+        self.batches.append(len(events))
+        if any(event['file_name'] == 'bad' for event in events):
+            raise ValueError('bad event')
+        return self.database.insert_events(events)
+
+
+def wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def stored_count(database):
+    return len(database.get_events(limit=10000))
+
+
+def test_flushes_when_batch_is_full(database, make_event):
+    recorder = RecordingDatabase(database)
+    writer = EventWriter(recorder, batch_size=5, flush_interval=30, queue_size=100)
+    writer.start()
+    try:
+        for i in range(5):
+            assert writer.put(make_event(i))
+        # 攒满batch_size立即写入，不等flush_interval
+        assert wait_until(lambda: writer.events_written == 5)
+        assert recorder.batches == [5]
+    finally:
+        writer.stop()
+    assert stored_count(database) == 5
+
+
+def test_flushes_partial_batch_after_interval(database, make_event):
+    recorder = RecordingDatabase(database)
+    writer = EventWriter(recorder, batch_size=1000, flush_interval=0.05, queue_size=100)
+    writer.start()
+    try:
+        for i in range(3):
+            writer.put(make_event(i))
+        assert wait_until(lambda: writer.events_written == 3)
+        assert sum(recorder.batches) == 3
+    finally:
+        writer.stop()
+
+
+def test_stop_drains_queue_before_exit(database, make_event):
+    recorder = RecordingDatabase(database)
+    writer = EventWriter(recorder, batch_size=10, flush_interval=30, queue_size=1000)
+    writer.start()
+    
+    # 写线程卡在第一批上，其余事件堆积在队列中
+    recorder.gate.clear()
+    for i in range(95):
+        writer.put(make_event(i))
+    assert wait_until(lambda: len(recorder.batches) == 0 and writer.queue.qsize() < 95)
+    
+    threading.Timer(0.1, recorder.gate.set).start()
+    start = time.monotonic()
+    writer.stop(timeout=10)
+    
+    assert time.monotonic() - start < 5  # 不等flush_interval
+    assert not writer.is_alive()
+    assert writer.events_written == 95
+    assert stored_count(database) == 95
+    
+    # 停止后put()同步写入
+    assert writer.put(make_event(95))
+    assert stored_count(database) == 96
+
+
+def test_failed_batch_retries_events_one_by_one(database, make_event):
+    recorder = RecordingDatabase(database)
+    writer = EventWriter(recorder, batch_size=3, flush_interval=30, queue_size=100)
+    writer.start()
+    try:
+        writer.put(make_event(0))
+        writer.put(make_event(1, file_name='bad'))
+        writer.put(make_event(2))
+        assert wait_until(lambda: writer.events_written + writer.events_failed == 3)
+    finally:
+        writer.stop()
+    
+    assert writer.events_written == 2
+    assert writer.events_failed == 1
+    assert recorder.batches == [3, 1, 1, 1]
+    assert sorted(e['file_name'] for e in database.get_events(limit=10)) == ['file_0.dat', 'file_2.dat']
+
+
+def test_full_queue_drops_after_put_timeout(database, make_event):
+    recorder = RecordingDatabase(database)
+    recorder.gate.clear()
+    writer = EventWriter(recorder, batch_size=1, flush_interval=30, queue_size=2, put_timeout=0.05)
+    writer.start()
+    try:
+        writer.put(make_event(0))
+        assert wait_until(lambda: writer.queue.empty())  # 写线程已取走第一条并阻塞
+        assert writer.put(make_event(1))
+        assert writer.put(make_event(2))
+        assert not writer.put(make_event(3))
+        assert writer.get_stats()['events_dropped'] == 1
+    finally:
+        recorder.gate.set()
+        writer.stop()
+    assert stored_count(database) == 3
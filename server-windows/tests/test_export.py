@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""事件导出：中断后续传的结果与一次导出完全一致，格式或过滤条件不同时拒绝续传"""
+
+import csv
+
+import pytest
+
+from export import export_to_file, iter_columnar
+
+
+@pytest.fixture
+def seeded(database, make_event):
+    database.insert_events([make_event(i) for i in range(20)])
+    return database
+
+
+def read_ids(path, fmt):
+    if fmt == 'columnar':
+        with open(path, 'rb') as f:
+            return [row['id'] for row in iter_columnar(f)]
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        return [int(row['id']) for row in csv.DictReader(f)]
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'columnar'])
+def test_resume_after_interruption_matches_full_export(seeded, tmp_path, fmt):
+    full = tmp_path / f'full.{fmt}'
+    result = export_to_file(seeded, full, fmt, chunk_size=4)
+    assert result['complete'] and result['rows'] == 20
+    expected = read_ids(full, fmt)
+    assert sorted(expected) == list(range(1, 21))
+    
+    partial = tmp_path / f'partial.{fmt}'
+    result = export_to_file(seeded, partial, fmt, chunk_size=3, max_rows=7)
+    assert not result['complete'] and result['rows'] == 7
+    state_path = tmp_path / f'partial.{fmt}.cursor'
+    assert state_path.exists()
+    
+    # 模拟中断时写了一半的数据块
+    with open(partial, 'ab') as f:
+        f.write(b'B\x00\x00\x10\x00half-written')
+    
+    result = export_to_file(seeded, partial, fmt, chunk_size=3, resume=True)
+    assert result['complete'] and result['rows'] == 20
+    assert not state_path.exists()
+    assert read_ids(partial, fmt) == expected
+
+
+def test_resume_keeps_filters(seeded, tmp_path):
+    output = tmp_path / 'zhang.evcol'
+    export_to_file(seeded, output, 'columnar', chunk_size=2, max_rows=4, username='张三')
+    result = export_to_file(seeded, output, 'columnar', chunk_size=2, resume=True, username='张三')
+    
+    assert result['complete'] and result['rows'] == 10
+    with open(output, 'rb') as f:
+        assert {row['username'] for row in iter_columnar(f)} == {'张三'}
+
+
+def test_resume_rejects_different_filters_or_format(seeded, tmp_path):
+    output = tmp_path / 'events.csv'
+    export_to_file(seeded, output, 'csv', chunk_size=2, max_rows=4, username='张三')
+    
+    with pytest.raises(ValueError):
+        export_to_file(seeded, output, 'csv', resume=True)
+    with pytest.raises(ValueError):
+        export_to_file(seeded, output, 'csv', resume=True, username='李四')
+    with pytest.raises(ValueError):
+        export_to_file(seeded, output, 'columnar', resume=True, username='张三')
+    
+    # 拒绝续传时不改动已导出的部分
+    assert len(read_ids(output, 'csv')) == 4
+    assert export_to_file(seeded, output, 'csv', resume=True, username='张三')['rows'] == 10
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""文件夹拷入：边扫描边写结构日志，统计信息在日志末尾"""
+
+from scanner import FolderScanner
+from server import FileMonitor
+
+
+def make_tree(root):
+    (root / 'docs' / 'old').mkdir(parents=True)
+    (root / 'a.txt').write_bytes(b'x' * 10)
+    (root / 'docs' / 'b.docx').write_bytes(b'x' * 20)
+    (root / 'docs' / 'old' / 'c.pdf').write_bytes(b'x' * 30)
+
+
+def test_scan_and_log_folder_streams_blocks_then_stats(tmp_path):
+    root = tmp_path / 'tree'
+    make_tree(root)
+    log_file = tmp_path / 'tree.txt'
+    monitor = FileMonitor('X', lambda event: None, root_path=str(tmp_path))
+    monitor._folder_log_path = lambda name: log_file
+    
+    result = monitor._scan_and_log_folder('tree', str(root))
+    
+    assert result['total_files'] == 3
+    assert result['total_folders'] == 2
+    assert result['total_size'] == 60
+    assert result['truncated'] is False
+    assert result == FolderScanner().scan(str(root))
+    
+    text = log_file.read_text(encoding='utf-8')
+    assert text.index('a.txt') < text.index('b.docx') < text.index('c.pdf') < text.index('统计信息')
+    assert '总文件数: 3' in text
+
+
+def test_scan_calls_on_folder_in_walk_order(tmp_path):
+    make_tree(tmp_path)
+    seen = []
+    
+    result = FolderScanner(max_workers=2).scan(str(tmp_path), on_folder=lambda info: seen.append(info['path']))
+    
+    assert seen == [info['path'] for info in result['structure']]
+    assert seen[0] == ''
+    assert len(seen) == 3
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""非阻塞登录握手：插入后立即开始监控，登录结果在后台补到暂存的事件上"""
+
+import threading
+import time
+
+import pytest
+
+import server
+from server import USBMonitorService
+
+
+class FakeMonitor:
+    """代替FileMonitor：记录回调，不访问文件系统"""
+    
+    def __init__(self, drive, callback, root_path=None, **kwargs):
+        self.drive = drive
+        self.callback = callback
+        self.drive_path = root_path
+        self.started = False
+        self.stopped = False
+    
+    def start(self, started_at=None):
+        self.started = True
+    
+    def stop(self):
+        self.stopped = True
+    
+    def copy_in(self, name):
+        self.callback({'timestamp': '2026-10-01T12:00:00', 'drive_letter': self.drive,
+                       'file_name': name, 'action': '拷入文件 (.txt)'})
+
+
+class LoginWindow:
+    """代替界面线程：记下done回调，由测试决定何时登录"""
+    
+    def __init__(self, fail=False):
+        self.requests = []
+        self.cancelled = []
+        self.fail = fail
+    
+    def __call__(self, drive, done):
+        if self.fail:
+            raise RuntimeError('界面未启动')
+        self.requests.append((drive, done))
+        return lambda: self.cancelled.append(drive)
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(server, 'FileMonitor', FakeMonitor)
+    service = USBMonitorService()
+    service.login_timeout = 0
+    saved = []
+    monkeypatch.setattr(service, '_save_event', saved.append)
+    service.saved = saved
+    return service
+
+
+def users(saved):
+    return [(event['action'], event['username'], event['login_id']) for event in saved]
+
+
+def test_insert_returns_before_login_and_backfills_user(service):
+    window = LoginWindow()
+    service.set_login_callback(window)
+    
+    start = time.monotonic()
+    service._on_usb_inserted('E')
+    assert time.monotonic() - start < 0.5
+    assert service.file_monitors['E'].started
+    assert window.requests[0][0] == 'E'
+    
+    # 登录完成前的事件暂存，不落库
+    service.file_monitors['E'].copy_in('a.txt')
+    assert service.saved == []
+    assert service.get_login_stats()['pending_logins'][0]['buffered_events'] == 2
+    
+    done = window.requests[0][1]
+    worker = threading.Thread(target=done, args=('张三', 7))
+    worker.start()
+    worker.join()
+    assert users(service.saved) == [('USB插入', '张三', 7), ('拷入文件 (.txt)', '张三', 7)]
+    
+    service.file_monitors['E'].copy_in('b.txt')
+    assert users(service.saved)[-1] == ('拷入文件 (.txt)', '张三', 7)
+    assert service.get_login_stats()['pending_logins'] == []
+
+
+def test_cancel_or_failed_callback_records_anonymous_user(service):
+    window = LoginWindow()
+    service.set_login_callback(window)
+    service._on_usb_inserted('E')
+    window.requests[0][1](None, None)
+    assert users(service.saved) == [('USB插入', '未登录用户', 0)]
+    
+    service.set_login_callback(LoginWindow(fail=True))
+    service._on_usb_inserted('F')
+    assert users(service.saved)[-1] == ('USB插入', '未登录用户', 0)
+    assert service.login_sessions['F'].outcome == 'cancelled'
+
+
+def test_timeout_then_late_login(service):
+    window = LoginWindow()
+    service.set_login_callback(window)
+    service.login_timeout = 0.05
+    service._on_usb_inserted('E')
+    
+    deadline = time.monotonic() + 5
+    while not service.saved and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert users(service.saved) == [('USB插入', '未登录用户', 0)]
+    assert service.login_sessions['E'].outcome == 'timeout'
+    
+    # 超时后才登录：已落库的不变，之后的事件记入登录用户
+    window.requests[0][1]('李四', 9)
+    service.file_monitors['E'].copy_in('a.txt')
+    assert users(service.saved)[-1] == ('拷入文件 (.txt)', '李四', 9)
+
+
+def test_removed_before_login_closes_window(service):
+    window = LoginWindow()
+    service.set_login_callback(window)
+    service._on_usb_inserted('E')
+    monitor = service.file_monitors['E']
+    monitor.copy_in('a.txt')
+    
+    service._on_usb_removed('E')
+    assert window.cancelled == ['E']
+    assert monitor.stopped
+    assert users(service.saved) == [
+        ('USB插入', '未登录用户', 0), ('拷入文件 (.txt)', '未登录用户', 0), ('USB移除', '未登录用户', 0)
+    ]
+    assert 'E' not in service.login_sessions and 'E' not in service.user_sessions
+    
+    # 窗口关闭后才返回的结果不影响已结束的会话
+    window.requests[0][1]('张三', 7)
+    assert 'E' not in service.user_sessions
+
+
+def test_pending_limit_stops_buffering(service):
+    window = LoginWindow()
+    service.set_login_callback(window)
+    service.login_pending_limit = 2
+    service._on_usb_inserted('E')
+    for name in ('a.txt', 'b.txt', 'c.txt'):
+        service.file_monitors['E'].copy_in(name)
+    
+    # 插入事件和a.txt暂存，之后的直接记为未登录用户
+    assert [event['file_name'] for event in service.saved] == ['b.txt', 'c.txt']
+    window.requests[0][1]('张三', 7)
+    assert [event['username'] for event in service.saved] == ['未登录用户', '未登录用户', '张三', '张三']
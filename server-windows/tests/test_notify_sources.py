@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""通知源：录制/回放轨迹、按驱动器分开录制、inotify"""
+
+import os
+import sys
+
+import pytest
+
+from notify_sources import (ACTION_ADDED, ACTION_REMOVED, InotifyNotificationSource, NotificationSource,
+                            ReplayNotificationSource, TraceRecorder, drive_trace_path)
+
+
+class ListSource(NotificationSource):
+    """按顺序交出预先排好的通知批次"""
+    
+    def __init__(self, root_path, batches):
+        super().__init__(root_path)
+        self.batches = list(batches)
+    
+    def open(self):
+        pass
+    
+    def read(self, timeout):
+        return self.batches.pop(0) if self.batches else None
+    
+    def close(self):
+        pass
+
+
+def test_incomplete_source_cannot_be_instantiated():
+    class NoRead(NotificationSource):
+        def open(self):
+            pass
+        
+        def close(self):
+            pass
+    
+    with pytest.raises(TypeError):
+        NoRead('E:\\')
+
+
+def test_read_ready_defaults_to_non_blocking_read():
+    source = ListSource('E:\\', [[(ACTION_ADDED, 'a.txt')]])
+    assert source.read_ready() == [(ACTION_ADDED, 'a.txt')]
+    assert source.read_ready() == []
+
+
+def test_drive_trace_path_is_per_drive():
+    assert drive_trace_path('trace.jsonl', 'E:\\') == 'trace_E.jsonl'
+    assert drive_trace_path('trace.jsonl', 'F:\\') == 'trace_F.jsonl'
+    assert drive_trace_path('/tmp/t.jsonl', '/media/usb0') == '/tmp/t_media_usb0.jsonl'
+
+
+def test_recorders_for_two_drives_do_not_overwrite_each_other(tmp_path):
+    trace = str(tmp_path / 'trace.jsonl')
+    recorders = [
+        TraceRecorder(ListSource(str(tmp_path / drive), [[(ACTION_ADDED, f'{drive}.txt')]]), trace)
+        for drive in ('E', 'F')
+    ]
+    for recorder in recorders:
+        recorder.open()
+    for recorder in recorders:
+        recorder.read(0)
+        recorder.close()
+    
+    paths = {recorder.trace_path for recorder in recorders}
+    assert len(paths) == 2
+    
+    # 每个轨迹文件回放出本驱动器的通知
+    for recorder, drive in zip(recorders, ('E', 'F')):
+        replay = ReplayNotificationSource(recorder.root_path, trace_path=recorder.trace_path,
+                                          speed=0, materialize=False)
+        replay.open()
+        assert replay.read(0) == [(ACTION_ADDED, f'{drive}.txt')]
+        assert replay.read(0) is None
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='inotify只在Linux上可用')
+def test_inotify_reports_created_and_removed_files(tmp_path):
+    source = InotifyNotificationSource(str(tmp_path))
+    source.open()
+    try:
+        (tmp_path / 'new.txt').write_bytes(b'x')
+        os.remove(tmp_path / 'new.txt')
+        notifications = []
+        for _ in range(10):
+            batch = source.read(0.2)
+            if batch:
+                notifications.extend(batch)
+            if (ACTION_REMOVED, 'new.txt') in notifications:
+                break
+        assert (ACTION_ADDED, 'new.txt') in notifications
+        assert (ACTION_REMOVED, 'new.txt') in notifications
+    finally:
+        source.close()
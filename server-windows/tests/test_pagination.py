@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""游标分页：翻页期间写入新事件不产生重复或遗漏，过滤条件与limit边界"""
+
+from datetime import datetime
+
+import pytest
+
+from database import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor('2026-10-01T12:00:00', 42)
+    assert decode_cursor(cursor) == ('2026-10-01T12:00:00', 42)
+    with pytest.raises(ValueError):
+        decode_cursor('not-a-cursor')
+
+
+def test_pages_are_stable_while_new_events_arrive(database, make_event):
+    database.insert_events([make_event(i) for i in range(20)])
+    
+    first = database.get_events_page(5)
+    seen = [e['id'] for e in first['events']]
+    
+    # 翻页期间有更新的事件写入（时间更晚），以及同一时间戳的事件
+    newer = datetime(2026, 10, 2, 12, 0, 0)
+    database.insert_events([make_event(i, newer) for i in range(10)])
+    database.insert_events([make_event(0)])
+    
+    cursor = first['next_cursor']
+    while cursor:
+        page = database.get_events_page(5, cursor)
+        seen.extend(e['id'] for e in page['events'])
+        cursor = page['next_cursor']
+    
+    assert len(seen) == len(set(seen)) == 20
+    assert sorted(seen) == list(range(1, 21))
+
+
+def test_ties_on_timestamp_are_ordered_by_id(database, make_event):
+    same_time = datetime(2026, 10, 1, 12, 0, 0)
+    database.insert_events([make_event(0, same_time) for _ in range(7)])
+    
+    ids, cursor = [], None
+    while True:
+        page = database.get_events_page(3, cursor)
+        ids.extend(e['id'] for e in page['events'])
+        cursor = page['next_cursor']
+        if not cursor:
+            break
+    assert ids == list(range(7, 0, -1))
+
+
+def test_filters(database, make_event):
+    database.insert_events([make_event(i) for i in range(12)])
+    
+    events = database.get_events_page(100, username='张三')['events']
+    assert len(events) == 6 and all(e['username'] == '张三' for e in events)
+    
+    events = database.get_events_page(100, action='拷入*')['events']
+    assert len(events) == 6 and all(e['action'].startswith('拷入') for e in events)
+    
+    events = database.get_events_page(100, drive_letter='e:')['events']
+    assert len(events) == 6 and all(e['drive_letter'] == 'E' for e in events)
+    
+    # 时间范围为 [start_time, end_time)
+    start = datetime(2026, 10, 1, 11, 59, 55).isoformat()
+    end = datetime(2026, 10, 1, 12, 0, 0).isoformat()
+    events = database.get_events_page(100, start_time=start, end_time=end)['events']
+    assert len(events) == 5
+
+
+@pytest.mark.parametrize('limit, expected', [(-1, 1), (0, 1), (3, 3), (10 ** 9, 5)])
+def test_limit_is_clamped(database, make_event, limit, expected):
+    database.insert_events([make_event(i) for i in range(5)])
+    assert len(database.get_events_page(limit)['events']) == expected
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""按月归档与保留策略：归档后查询跨主库和归档合并，汇总与文件夹结构不丢失"""
+
+from datetime import datetime
+
+import pytest
+
+OLD = datetime(2024, 1, 20, 12, 0, 0)
+OLDER = datetime(2023, 12, 20, 12, 0, 0)
+RECENT = datetime(2026, 10, 1, 12, 0, 0)
+
+STRUCTURE = [{'path': '', 'files': [{'name': '合同.docx', 'size': 10, 'type': '.docx'}], 'subfolders': []}]
+
+
+def all_pages(database, limit, **filters):
+    """按游标翻完所有页"""
+    events, cursor = [], None
+    while True:
+        page = database.get_events_page(limit, cursor, **filters)
+        events.extend(page['events'])
+        cursor = page['next_cursor']
+        if not cursor:
+            return events
+
+
+@pytest.fixture
+def partitioned(database, make_event):
+    """2023-12、2024-01各10条已归档，近期10条在主库"""
+    database.insert_events(
+        [make_event(i, OLDER) for i in range(10)] +
+        [make_event(i, OLD) for i in range(10)] +
+        [make_event(i, RECENT) for i in range(10)]
+    )
+    assert database.archive_month('2023-12') == 10
+    assert database.archive_month('2024-01') == 10
+    return database
+
+
+def test_queries_merge_main_and_archives(partitioned):
+    events = all_pages(partitioned, 7)
+    assert len(events) == 30
+    assert len({e['id'] for e in events}) == 30
+    keys = [(e['timestamp'], e['id']) for e in events]
+    assert keys == sorted(keys, reverse=True)
+    
+    # 过滤条件同样作用于归档
+    zhang = all_pages(partitioned, 4, username='张三')
+    assert len(zhang) == 15
+    window = all_pages(partitioned, 100, start_time='2024-01-01', end_time='2024-02-01')
+    assert len(window) == 10
+    
+    conn = partitioned.get_connection()
+    try:
+        assert conn.execute('SELECT COUNT(*) FROM events').fetchone()[0] == 10
+    finally:
+        partitioned.release_connection(conn)
+
+
+def test_rollups_survive_archival_and_rebuild(partitioned):
+    assert partitioned.get_statistics()['total_events'] == 30
+    partitioned.rebuild_rollups()
+    assert partitioned.get_statistics()['total_events'] == 30
+
+
+def test_retention_removes_old_archives_and_rollups(partitioned):
+    result = partitioned.apply_retention(retention_months=12)
+    assert result['archives_removed'] == ['2023-12', '2024-01']
+    assert len(all_pages(partitioned, 50)) == 10
+    assert partitioned.get_statistics()['total_events'] == 10
+    assert partitioned.get_partition_stats()['archives'] == []
+
+
+def test_event_present_in_main_and_archive_is_returned_once(partitioned, make_event):
+    # 归档过程中：事件已复制到归档、尚未从主库删除
+    archived = all_pages(partitioned, 100, start_time='2024-01-01', end_time='2024-02-01')[0]
+    conn = partitioned.get_connection()
+    try:
+        with conn:
+            conn.execute(
+                'INSERT INTO events (id, timestamp, username, action, file_name, file_path) VALUES (?, ?, ?, ?, ?, ?)',
+                (archived['id'], archived['timestamp'], archived['username'], archived['action'],
+                 archived['file_name'], archived['file_path'])
+            )
+    finally:
+        partitioned.release_connection(conn)
+    
+    ids = [e['id'] for e in all_pages(partitioned, 6)]
+    assert len(ids) == len(set(ids)) == 30
+
+
+def test_late_event_with_known_snapshot_keeps_its_structure(database, make_event):
+    first = database.insert_events([make_event(0, OLD, is_folder=True, folder_structure=STRUCTURE)])[0]
+    database.archive_month('2024-01')
+    
+    # 归档后同样的文件夹结构再次出现在迟到的事件中：主库以新ID保存同一摘要的快照
+    late = database.insert_events([make_event(1, OLD, is_folder=True, folder_structure=STRUCTURE)])[0]
+    assert database.archive_month('2024-01') == 2
+    
+    assert database.get_event_folder_structure(first) == STRUCTURE
+    assert database.get_event_folder_structure(late) == STRUCTURE
+    conn = database.get_connection()
+    try:
+        # 主库中不再被引用的快照随归档移出
+        assert conn.execute('SELECT COUNT(*) FROM folder_snapshots').fetchone()[0] == 0
+    finally:
+        database.release_connection(conn)
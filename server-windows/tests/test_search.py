@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""全文检索：检索词转义为安全的MATCH表达式，特殊字符不会产生FTS5语法错误"""
+
+import pytest
+
+from database import build_match_query
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('合同 2024', '"合同" "2024"'),
+    ('report OR 合同', '"report" OR "合同"'),
+    ('"年度 报告"', '"年度 报告"'),
+    ('a"b', '"ab"'),
+    ('NEAR(a b) AND -x ^y col:z', '"NEAR(a" "b)" "AND" "-x" "^y" "col:z"'),
+    ('OR foo OR OR bar OR', '"foo" OR "bar"'),
+])
+def test_terms_are_quoted(query, expected):
+    assert build_match_query(query) == (expected, [])
+
+
+def test_prefix_only_for_word_tokenizer():
+    assert build_match_query('contr* *tail') == ('"contr"* "tail"', [])
+    assert build_match_query('"年度 报"*') == ('"年度 报"*', [])
+    assert build_match_query('contr* *tail', trigram=True) == ('"contr" "tail"', [])
+
+
+def test_trigram_short_terms_fall_back_to_like():
+    assert build_match_query('合同 ab', trigram=True) == ('', ['合同', 'ab'])
+    assert build_match_query('contract ab', trigram=True) == ('"contract"', ['ab'])
+    with pytest.raises(ValueError):
+        build_match_query('contract OR ab', trigram=True)
+
+
+@pytest.mark.parametrize('query', ['', '   ', '""', '*', 'OR', '" "*'])
+def test_empty_query_is_rejected(query):
+    with pytest.raises(ValueError):
+        build_match_query(query)
+
+
+def test_search_with_special_characters(database, make_event):
+    database.insert_events([
+        make_event(0, file_name='采购合同2024.docx', file_path='E:\\合同\\采购合同2024.docx'),
+        make_event(1, file_name='NEAR(a b).txt', file_path='E:\\NEAR(a b).txt'),
+        make_event(2, file_name='100%_done.txt', file_path='E:\\100%_done.txt'),
+    ])
+    
+    assert [e['file_name'] for e in database.search_events('合同')['events']] == ['采购合同2024.docx']
+    assert [e['file_name'] for e in database.search_events('NEAR(a')['events']] == ['NEAR(a b).txt']
+    if database.fts_trigram:
+        # 短词走LIKE，%和_按字面匹配
+        assert [e['file_name'] for e in database.search_events('%_')['events']] == ['100%_done.txt']
+        assert database.search_events('_x')['events'] == []
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""文件夹结构快照：列式编码往返一致、相同结构只存一份"""
+
+import json
+
+import pytest
+
+from snapshots import ENCODING, decode_structure, encode_structure
+
+STRUCTURE = [
+    {'path': '', 'files': [{'name': '说明.txt', 'size': 12, 'type': '.txt'}], 'subfolders': ['docs', 'empty']},
+    {'path': 'docs', 'files': [
+        {'name': 'a.docx', 'size': 2048, 'type': '.docx'},
+        {'name': 'b.docx', 'size': 0, 'type': '.docx'},
+        {'name': 'README', 'size': 7, 'type': '无'}
+    ], 'subfolders': []},
+    {'path': 'empty', 'files': [], 'subfolders': []},
+]
+
+
+def test_encode_decode_round_trip():
+    digest, data, info = encode_structure(STRUCTURE)
+    
+    assert decode_structure(data) == STRUCTURE
+    assert info == {'folder_count': 3, 'file_count': 4, 'total_size': 2067, 'raw_size': info['raw_size']}
+    assert len(data) < info['raw_size']
+    
+    # 摘要只取决于内容
+    assert encode_structure([dict(folder) for folder in STRUCTURE])[0] == digest
+    assert encode_structure(STRUCTURE[:2])[0] != digest
+
+
+def test_empty_structure_and_unknown_encoding():
+    digest, data, info = encode_structure([])
+    assert decode_structure(data) == []
+    assert info['file_count'] == 0
+    
+    with pytest.raises(ValueError):
+        decode_structure(data, 'json-v0')
+
+
+def test_events_share_one_snapshot(database, make_event):
+    ids = database.insert_events([
+        make_event(0, is_folder=True, folder_structure=STRUCTURE),
+        make_event(1, is_folder=True, folder_structure=STRUCTURE),
+        make_event(2)
+    ])
+    
+    events = {event['id']: event for event in database.get_events(limit=10)}
+    assert events[ids[0]]['snapshot_id'] == events[ids[1]]['snapshot_id'] is not None
+    assert events[ids[2]]['snapshot_id'] is None
+    
+    assert database.get_event_folder_structure(ids[0]) == STRUCTURE
+    snapshot = database.get_snapshot(events[ids[0]]['snapshot_id'])
+    assert snapshot['encoding'] == ENCODING
+    assert snapshot['structure'] == STRUCTURE
+    assert snapshot['file_count'] == 4
+
+
+def test_migrate_inline_structures(database, make_event):
+    ids = database.insert_events([make_event(0, is_folder=True), make_event(1, is_folder=True)])
+    conn = database.get_connection()
+    try:
+        with conn:
+            conn.execute('UPDATE events SET folder_structure = ? WHERE id = ?', (json.dumps(STRUCTURE), ids[0]))
+            conn.execute("UPDATE events SET folder_structure = '{broken' WHERE id = ?", (ids[1],))
+    finally:
+        database.release_connection(conn)
+    
+    assert database.get_event_folder_structure(ids[0]) == STRUCTURE  # 迁移前读取内联JSON
+    assert database.migrate_inline_structures(chunk_size=1) == 2
+    
+    events = {event['id']: event for event in database.get_events(limit=10)}
+    assert events[ids[0]]['snapshot_id'] is not None
+    assert events[ids[1]]['snapshot_id'] is None
+    assert database.get_event_folder_structure(ids[0]) == STRUCTURE
+    assert database.migrate_inline_structures() == 0
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""统计汇总表：触发器增量维护的结果与对events表全量重算一致"""
+
+from datetime import datetime, timedelta
+
+
+def recount(database, sql, params=()):
+    conn = database.get_connection()
+    try:
+        return conn.execute(sql, params).fetchall()
+    finally:
+        database.release_connection(conn)
+
+
+def rollup_rows(database):
+    return recount(database, 'SELECT bucket, action, username, count FROM event_rollups WHERE count > 0 ORDER BY 1, 2, 3')
+
+
+def seed(database, make_event):
+    """今天和前几天、不同小时/用户/类型的事件"""
+    now = datetime.now().replace(minute=30, second=0, microsecond=0)
+    events = [make_event(i, base_time=now - timedelta(hours=i * 7)) for i in range(40)]
+    events.append(make_event(40, base_time=now, action='USB拔出', username='王五'))
+    database.insert_events(events)
+    for i in range(41, 45):
+        database.insert_event(make_event(i, base_time=now))
+
+
+def test_statistics_match_full_recount(database, make_event):
+    seed(database, make_event)
+    stats = database.get_statistics()
+    
+    assert stats['total_events'] == recount(database, 'SELECT COUNT(*) FROM events')[0][0] == 45
+    today = datetime.now().date().isoformat()
+    assert stats['today_events'] == recount(
+        database, 'SELECT COUNT(*) FROM events WHERE substr(timestamp, 1, 10) = ?', (today,))[0][0]
+    expected = dict(recount(database, "SELECT COALESCE(action, ''), COUNT(*) FROM events GROUP BY 1"))
+    assert stats['action_stats'] == expected
+
+
+def test_timeline_matches_full_recount(database, make_event):
+    seed(database, make_event)
+    
+    for granularity, width in (('day', 10), ('hour', 13)):
+        timeline = database.get_stats_timeline(granularity)
+        expected = recount(database, f'SELECT substr(timestamp, 1, {width}), COUNT(*) FROM events GROUP BY 1 ORDER BY 1')
+        assert [(row['period'], row['count']) for row in timeline] == [tuple(row) for row in expected]
+    
+    timeline = database.get_stats_timeline('day', username='张三', action='拷入文件 (.docx)')
+    expected = recount(database, '''
+        SELECT substr(timestamp, 1, 10), COUNT(*) FROM events
+        WHERE username = ? AND action = ? GROUP BY 1 ORDER BY 1
+    ''', ('张三', '拷入文件 (.docx)'))
+    assert [(row['period'], row['count']) for row in timeline] == [tuple(row) for row in expected]
+
+
+def test_delete_trigger_and_rebuild_agree(database, make_event):
+    seed(database, make_event)
+    conn = database.get_connection()
+    try:
+        with conn:
+            conn.execute("DELETE FROM events WHERE username = '李四'")
+    finally:
+        database.release_connection(conn)
+    
+    incremental = rollup_rows(database)
+    assert sum(row[3] for row in incremental) == database.get_statistics()['total_events']
+    database.rebuild_rollups()
+    assert rollup_rows(database) == incremental
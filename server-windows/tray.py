@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+系统托盘和登录窗口桥接 - 只在图形界面模式下由main.py导入
+作者：董明照
+"""
+
+import webbrowser
+from PySide6.QtWidgets import QApplication, QSystemTrayIcon, QMenu, QMessageBox
+from PySide6.QtGui import QAction
+from PySide6.QtCore import QObject, Signal
+from config import config
+
+
+class TrayApp:
+    """系统托盘应用"""
+    
+    def __init__(self, qt_app):
+        self.qt_app = qt_app
+        self.host = str(config.get('host', 'localhost'))
+        port_value = config.get('port', 8888)
+        self.port = int(port_value) if port_value is not None else 8888
+        
+        # 创建托盘图标
+        self.tray = QSystemTrayIcon()
+        icon = qt_app.style().standardIcon(QApplication.style().StandardPixmap.SP_ComputerIcon)
+        self.tray.setIcon(icon)
+        self.tray.setToolTip("USB监控后端")
+        
+        # 创建菜单
+        menu = QMenu()
+        
+        status_action = QAction("🟢 服务运行中", menu)
+        status_action.setEnabled(False)
+        menu.addAction(status_action)
+        
+        menu.addSeparator()
+        
+        api_action = QAction("📖 打开API文档", menu)
+        api_action.triggered.connect(self.open_api_docs)
+        menu.addAction(api_action)
+        
+        logs_action = QAction("📂 打开日志目录", menu)
+        logs_action.triggered.connect(self.open_logs)
+        menu.addAction(logs_action)
+        
+        menu.addSeparator()
+        
+        about_action = QAction("ℹ️ 关于", menu)
+        about_action.triggered.connect(self.show_about)
+        menu.addAction(about_action)
+        
+        quit_action = QAction("❌ 退出", menu)
+        quit_action.triggered.connect(self.quit_app)
+        menu.addAction(quit_action)
+        
+        self.tray.setContextMenu(menu)
+        self.tray.show()
+        
+        # 显示启动消息
+        self.tray.showMessage(
+            "USB监控后端",
+            f"服务已启动\n地址: http://{self.host}:{self.port}",
+            QSystemTrayIcon.MessageIcon.Information,
+            3000
+        )
+    
+    def open_api_docs(self):
+        """打开API文档"""
+        webbrowser.open(f"http://{self.host}:{self.port}/docs")
+    
+    def open_logs(self):
+        """打开日志目录"""
+        import os
+        from pathlib import Path
+        logs_dir = Path(__file__).parent / 'logs'
+        logs_dir.mkdir(exist_ok=True)
+        os.startfile(str(logs_dir))
+    
+    def show_about(self):
+        """显示关于信息"""
+        QMessageBox.information(
+            None,
+            "关于 USB监控后端",
+            f"USB监控后端服务\n\n"
+            f"服务地址: http://{self.host}:{self.port}\n"
+            f"API文档: http://{self.host}:{self.port}/docs\n\n"
+            f"作者: 董明照"
+        )
+    
+    def quit_app(self):
+        """退出应用"""
+        reply = QMessageBox.question(
+            None,
+            "确认退出",
+            "确定要退出USB监控后端吗？\n服务将停止运行。",
+            QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            QMessageBox.StandardButton.No
+        )
+        
+        if reply == QMessageBox.StandardButton.Yes:
+            self.tray.hide()
+            self.qt_app.quit()
+
+
+class LoginBridge(QObject):
+    """把登录请求转交给Qt界面线程
+    
+    监控线程调用request()后立即返回；界面线程收到信号后以非阻塞方式open()登录窗口，
+    窗口关闭时通过done回调把结果交回监控服务。必须在界面线程中创建。
+    """
+    
+    requested = Signal(str, object)
+    cancelled = Signal(str)
+    
+    def __init__(self):
+        super().__init__()
+        self.dialogs = {}  # 驱动器 -> 正在显示的登录窗口
+        self.requested.connect(self._show_login_dialog)
+        self.cancelled.connect(self._close_login_dialog)
+    
+    def request(self, drive_letter: str, done):
+        """登录回调（任意线程）：返回取消函数，设备拔出时关闭登录窗口"""
+        if QApplication.instance() is None:
+            done("未知用户", 0)
+            return None
+        self.requested.emit(drive_letter, done)
+        return lambda: self.cancelled.emit(drive_letter)
+    
+    def _show_login_dialog(self, drive_letter: str, done):
+        """显示登录对话框（界面线程）"""
+        from login_dialog import LoginDialog
+        
+        dialog = LoginDialog(drive_letter)
+        self.dialogs[drive_letter] = dialog
+        
+        def on_finished(result):
+            if self.dialogs.get(drive_letter) is dialog:
+                del self.dialogs[drive_letter]
+            if result == dialog.DialogCode.Accepted:
+                done(dialog.username, dialog.login_id)
+            else:
+                done(None, None)
+            dialog.deleteLater()
+        
+        dialog.finished.connect(on_finished)
+        dialog.open()
+    
+    def _close_login_dialog(self, drive_letter: str):
+        """设备已拔出，关闭尚未完成的登录窗口（界面线程）"""
+        dialog = self.dialogs.pop(drive_letter, None)
+        if dialog is not None:
+            dialog.reject()